@@ -8,23 +8,32 @@ Flow:
   4. Frontend stores token in localStorage, sends it as Authorization: Bearer on all requests
   5. All /api/* routes call get_current_user() which validates the JWT from cookie OR Bearer header
 """
+import hmac
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Optional
 
-from cryptography.fernet import Fernet
 from dotenv import load_dotenv
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response, status
-from google.auth.transport.requests import Request as GoogleRequest
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from fastapi import APIRouter, Cookie, Depends, Header, HTTPException, Request, Response, status
 from jose import JWTError, jwt
 from sqlmodel import Session, select
 
-from database import get_session
+from database import engine, get_session
 from models import User, UserRead
+from services import metrics, sync_schedule
+
+# Google client libraries and cryptography are only needed for login and sync,
+# not for authenticating API requests — they are imported where they're used
+# so the API process starts without them.
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import Flow
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -37,7 +46,14 @@ BACKEND_URL          = os.getenv("BACKEND_URL", "http://localhost:8000")
 JWT_SECRET           = os.getenv("JWT_SECRET", "change-me-in-production-use-openssl-rand-hex-32")
 JWT_ALGORITHM        = "HS256"
 JWT_EXPIRE_DAYS      = 30
+# Lifetime of the stream-only ticket passed in the /api/events URL
+STREAM_TICKET_TTL_S  = int(os.getenv("STREAM_TICKET_TTL_S", "60"))
+STREAM_TICKET_SCOPE  = "events"
 FERNET_KEY           = os.getenv("FERNET_KEY", "")   # base64 32-byte key
+# Per-user Google credentials / Gmail clients kept between syncs (services/sync_schedule.py:
+# active users are synced every 30 min–24 h)
+GOOGLE_CLIENT_CACHE_TTL = int(os.getenv("GOOGLE_CLIENT_CACHE_TTL", str(7 * 3600)))
+GOOGLE_CLIENT_CACHE_MAX = int(os.getenv("GOOGLE_CLIENT_CACHE_MAX", "1000"))
 
 # Gmail scope required to read bank notification emails
 SCOPES = [
@@ -51,7 +67,10 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 # ── Fernet encryption for storing OAuth tokens ────────────────────────────────
-def _get_fernet() -> Fernet:
+@lru_cache(maxsize=1)
+def _get_fernet() -> "Fernet":
+    from cryptography.fernet import Fernet
+
     key = FERNET_KEY
     if not key:
         # Auto-generate one on first run (dev only — set FERNET_KEY in prod)
@@ -71,7 +90,9 @@ def decrypt_token(encrypted: str) -> str:
 
 
 # ── OAuth2 Flow helpers ───────────────────────────────────────────────────────
-def _build_flow(state: Optional[str] = None) -> Flow:
+def _build_flow(state: Optional[str] = None) -> "Flow":
+    from google_auth_oauthlib.flow import Flow
+
     client_config = {
         "web": {
             "client_id": GOOGLE_CLIENT_ID,
@@ -98,6 +119,27 @@ def create_jwt(user_id: int) -> str:
 
 def decode_jwt(token: str) -> int:
     payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    if "scope" in payload:
+        # A scoped ticket (e.g. the event stream's) is not a session
+        raise JWTError("scoped token used as a session")
+    return int(payload["sub"])
+
+
+def create_stream_ticket(user_id: int) -> str:
+    """Short-lived token that only opens the event stream. It goes in the
+    EventSource URL (no headers there), where the session JWT must not:
+    URLs end up in access logs and browser history."""
+    expire = datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_TTL_S)
+    return jwt.encode(
+        {"sub": str(user_id), "exp": expire, "scope": STREAM_TICKET_SCOPE},
+        JWT_SECRET, algorithm=JWT_ALGORITHM,
+    )
+
+
+def decode_stream_ticket(ticket: str) -> int:
+    payload = jwt.decode(ticket, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    if payload.get("scope") != STREAM_TICKET_SCOPE:
+        raise JWTError("not a stream ticket")
     return int(payload["sub"])
 
 
@@ -122,9 +164,19 @@ def get_current_user(
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    sync_schedule.touch(user.id)   # activity stretches/shrinks the sync interval
     return user
 
 
+# ── Operator dependency — process-wide or fleet-wide data, not per user ───────
+def require_metrics_token(authorization: str = Header(default="")) -> None:
+    """Open when METRICS_TOKEN is empty (keep such a deployment off the
+    public internet)."""
+    token = metrics.METRICS_TOKEN
+    if token and not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+
+
 # ── Supabase dependency — composable with get_current_user ───────────────────
 def get_current_supabase(
     current_user: User = Depends(get_current_user),
@@ -141,22 +193,137 @@ def get_current_supabase(
 
 
 # ── Gmail credentials helper (used by sync_job) ───────────────────────────────
-def get_user_gmail_credentials(user: User) -> Optional[Credentials]:
-    """Return a valid Credentials object for the user, refreshing if needed."""
+class _GoogleClientCache:
+    """
+    Per-user decrypted Credentials and Gmail service objects.
+
+    Entries are keyed on the stored encrypted refresh token, so a re-login
+    (new tokens) never reuses stale credentials. An expired access token is
+    refreshed in place and written back to the User row; entries idle for
+    longer than GOOGLE_CLIENT_CACHE_TTL, or whose refresh fails, are evicted.
+    Gmail service objects wrap an httplib2.Http, which isn't thread-safe, so
+    they are cached per (user, thread).
+    """
+
+    def __init__(self, ttl: int = GOOGLE_CLIENT_CACHE_TTL, max_entries: int = GOOGLE_CLIENT_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._creds: "OrderedDict[int, tuple[str, Credentials, float]]" = OrderedDict()
+        self._services: "OrderedDict[tuple[int, int], tuple[Credentials, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.builds = 0
+
+    def _trim(self, entries: OrderedDict, now: float) -> None:
+        while entries and (
+            len(entries) > self.max_entries or now - next(iter(entries.values()))[2] > self.ttl
+        ):
+            entries.popitem(last=False)
+
+    def get_credentials(self, user_id: int, fingerprint: str) -> Optional["Credentials"]:
+        with self._lock:
+            entry = self._creds.get(user_id)
+            if entry is None or entry[0] != fingerprint or time.monotonic() - entry[2] > self.ttl:
+                return None
+            self._creds[user_id] = (entry[0], entry[1], time.monotonic())
+            self._creds.move_to_end(user_id)
+            return entry[1]
+
+    def put_credentials(self, user_id: int, fingerprint: str, creds: "Credentials") -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._creds[user_id] = (fingerprint, creds, now)
+            self._creds.move_to_end(user_id)
+            self._trim(self._creds, now)
+
+    def gmail_service(self, user_id: int, creds: "Credentials"):
+        key = (user_id, threading.get_ident())
+        with self._lock:
+            entry = self._services.get(key)
+            if entry is not None and entry[0] is creds:
+                self._services[key] = (creds, entry[1], time.monotonic())
+                self._services.move_to_end(key)
+                return entry[1]
+        from googleapiclient.discovery import build
+
+        service = build("gmail", "v1", credentials=creds, cache_discovery=False)
+        with self._lock:
+            now = time.monotonic()
+            self.builds += 1
+            self._services[key] = (creds, service, now)
+            self._services.move_to_end(key)
+            self._trim(self._services, now)
+        return service
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._creds.pop(user_id, None)
+            for key in [k for k in self._services if k[0] == user_id]:
+                del self._services[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "credentials": len(self._creds),
+                "services":    len(self._services),
+                "refreshes":   self.refreshes,
+                "builds":      self.builds,
+            }
+
+
+google_clients = _GoogleClientCache()
+
+
+def _persist_refreshed_token(user_id: int, creds: "Credentials") -> None:
+    """Write the refreshed access token and expiry back so restarts don't refresh again."""
+    try:
+        with Session(engine) as session:
+            db_user = session.get(User, user_id)
+            if db_user is None:
+                return
+            db_user.encrypted_access_token = encrypt_token(creds.token)
+            db_user.token_expiry = creds.expiry
+            stored = decrypt_token(db_user.encrypted_refresh_token) if db_user.encrypted_refresh_token else None
+            if creds.refresh_token and creds.refresh_token != stored:   # Google rotated it
+                db_user.encrypted_refresh_token = encrypt_token(creds.refresh_token)
+            session.add(db_user)
+            session.commit()
+    except Exception as exc:
+        logger.error("Failed to persist refreshed token for user %d: %s", user_id, exc)
+
+
+class TokenRefreshFailed(Exception):
+    """Google couldn't refresh the access token right now (network error,
+    5xx) — the refresh token itself may still be good."""
+
+
+def get_user_gmail_credentials(user: User) -> Optional["Credentials"]:
+    """Return a valid Credentials object for the user, refreshing if needed.
+    None means there is no usable refresh token (never connected, revoked);
+    a transient refresh failure raises TokenRefreshFailed instead."""
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request as GoogleRequest
+    from google.oauth2.credentials import Credentials
+
     if not user.encrypted_refresh_token:
         return None
 
-    refresh_token = decrypt_token(user.encrypted_refresh_token)
-    access_token  = decrypt_token(user.encrypted_access_token) if user.encrypted_access_token else None
-
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        scopes=SCOPES,
-    )
+    creds = google_clients.get_credentials(user.id, user.encrypted_refresh_token)
+    if creds is None:
+        refresh_token = decrypt_token(user.encrypted_refresh_token)
+        access_token  = decrypt_token(user.encrypted_access_token) if user.encrypted_access_token else None
+
+        creds = Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=GOOGLE_CLIENT_ID,
+            client_secret=GOOGLE_CLIENT_SECRET,
+            scopes=SCOPES,
+            # google-auth compares against naive UTC, which is how token_expiry is stored
+            expiry=user.token_expiry.replace(tzinfo=None) if user.token_expiry else None,
+        )
+        google_clients.put_credentials(user.id, user.encrypted_refresh_token, creds)
 
     # Refresh if expired
     if not creds.valid:
@@ -164,11 +331,21 @@ def get_user_gmail_credentials(user: User) -> Optional[Credentials]:
             creds.refresh(GoogleRequest())
         except Exception as exc:
             logger.error("Failed to refresh token for user %d: %s", user.id, exc)
-            return None
+            google_clients.invalidate(user.id)
+            if isinstance(exc, RefreshError) and not exc.retryable:
+                return None   # invalid_grant etc.: revoked or expired for good
+            raise TokenRefreshFailed(str(exc)) from exc
+        google_clients.refreshes += 1
+        _persist_refreshed_token(user.id, creds)
 
     return creds
 
 
+def get_user_gmail_service(user: User, creds: "Credentials"):
+    """Gmail API client for the user, reused across syncs while creds are unchanged."""
+    return google_clients.gmail_service(user.id, creds)
+
+
 # ── Routes ────────────────────────────────────────────────────────────────────
 
 @router.get("/login")
@@ -192,6 +369,7 @@ def callback(
 ):
     """Handle Google's redirect, exchange code for tokens, set session cookie."""
     from fastapi.responses import RedirectResponse
+    from googleapiclient.discovery import build
     from supabase_client import get_base_client
 
     try:
@@ -236,6 +414,9 @@ def callback(
         ).execute()
         user_id = result.data[0]["id"]
 
+    # New tokens: drop any cached credentials / Gmail client for this user
+    google_clients.invalidate(user_id)
+
     # Issue JWT — pass via URL query param so cross-domain frontends can store it in localStorage
     token = create_jwt(user_id)
     return RedirectResponse(url=f"{FRONTEND_URL}/login?token={token}")
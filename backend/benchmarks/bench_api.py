@@ -0,0 +1,393 @@
+"""
+HTTP load test of the dashboard and transactions APIs against a local
+PostgREST stand-in (benchmarks.fake_postgrest) on seeded SQLite data.
+
+The real app runs under uvicorn on 127.0.0.1; SUPABASE_URL points at the
+fake, which adds --rtt-ms to every call to model the app ↔ Supabase network
+hop. Each scenario (one endpoint) is driven by --concurrency client threads
+for --requests requests and reports p50/p95/p99 latency, throughput and
+PostgREST round trips per API request — the number that dominates latency in
+production.
+
+The dashboard result cache is disabled by default so every request does its
+real queries; --cache turns it back on (repeat reads then become hits).
+
+--backend postgres serves dashboard/report reads through the direct pooled
+path (postgres_client.py) on the same SQLite file instead; --rtt-ms is then
+added to every direct query too, so the two backends pay the same network
+cost per round trip and differ only in how many they make and in the HTTP +
+JSON work around them. Run once per backend with --out/--compare to diff.
+
+The fake scopes set_config to the keep-alive connection it arrived on, so with
+several users and concurrency > 1 the shared Supabase client can run a query
+under another user's id — reported as non-2xx statuses per scenario.
+
+Usage (from backend/):
+    python -m benchmarks.bench_api [--users 5] [--txns 3000] [--concurrency 8]
+        [--requests 200] [--rtt-ms 10] [--scenarios summary,list] [--cache]
+        [--backend postgrest|postgres] [--out results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+
+def _configure_env(args, db_path: str) -> None:
+    """Must run before any app module is imported (engine and cache sizes are module-level)."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "bench"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["DATA_BACKEND"] = args.backend
+    if not args.cache:
+        os.environ["DASHBOARD_CACHE_MAX_ENTRIES"] = "0"
+
+
+# ── Seed data ─────────────────────────────────────────────────────────────────
+
+_BANKS = ["BCP", "Interbank", "BBVA", "Scotiabank"]
+_BUDGET_CATEGORIES = ["food", "transport", "shopping", "entertainment", "utilities"]
+
+
+def _seed(args) -> list[dict]:
+    """Users, merchants, transactions over the last --months, budgets, merchantstat."""
+    import sqlalchemy as sa
+    from sqlmodel import Session, select
+
+    import models
+    from benchmarks.bench_categorizer import _SYNTHETIC
+    from database import create_db_and_tables, engine
+    from services.merchants import normalize_key
+
+    create_db_and_tables()
+    rng = random.Random(args.seed)
+    today = date.today()
+    now = datetime.utcnow()
+
+    with Session(engine) as session:
+        session.add_all(models.User(email=f"bench{i}@example.com", google_id=f"bench-{i}")
+                        for i in range(args.users))
+        session.add_all(models.Merchant(name=name, key=normalize_key(name) or name.lower())
+                        for name in _SYNTHETIC)
+        session.add(models.ExchangeRate(from_currency="PEN", to_currency="USD", rate=0.27))
+        session.add(models.ExchangeRate(from_currency="USD", to_currency="PEN", rate=3.72))
+        session.commit()
+        users = session.exec(select(models.User)).all()
+        merchants = {m.name: m.id for m in session.exec(select(models.Merchant)).all()}
+
+        span_days = args.months * 30
+        rows = []
+        for u in users:
+            for _ in range(args.txns):
+                name = rng.choice(list(_SYNTHETIC))
+                category = _SYNTHETIC[name]
+                usd = rng.random() < 0.15
+                amount = round(rng.uniform(3, 120 if usd else 900), 2)
+                rows.append({
+                    "user_id": u.id, "date": today - timedelta(days=rng.randrange(span_days)),
+                    "description": name, "amount": amount if category == "salary" else -amount,
+                    "currency": "USD" if usd else "PEN", "category": category,
+                    "bank": rng.choice(_BANKS), "email_id": f"bench-{rng.getrandbits(48):x}",
+                    "merchant_id": merchants[name], "created_at": now,
+                })
+            session.add_all(models.Budget(user_id=u.id, category=c,
+                                          monthly_limit=rng.choice([200, 500, 1000]))
+                            for c in _BUDGET_CATEGORIES)
+        session.execute(sa.insert(models.Transaction.__table__), rows)
+        # Postgres keeps merchantstat current with a trigger (migrations/0004)
+        session.execute(sa.text(
+            "INSERT INTO merchantstat (user_id, merchant_id, month, currency, txn_count, spent) "
+            "SELECT user_id, merchant_id, strftime('%Y-%m-01', date), currency, count(*), sum(-amount) "
+            'FROM "transaction" WHERE amount < 0 AND merchant_id IS NOT NULL '
+            "GROUP BY user_id, merchant_id, strftime('%Y-%m-01', date), currency"
+        ))
+        session.commit()
+
+        from auth import create_jwt
+        out = []
+        for u in users:
+            ids = session.exec(select(models.Transaction.id)
+                               .where(models.Transaction.user_id == u.id)).all()
+            # The delete scenario only removes rows the benchmark created or
+            # set aside here, never ones "update" may still pick
+            spare = min(args.requests + 1, len(ids) // 2)
+            out.append({
+                "id": u.id,
+                "token": create_jwt(u.id),
+                "txn_ids": ids[spare:],
+                "created": ids[:spare],
+            })
+        return out
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────────
+# Each returns (method, path, json body) for one request by `user`.
+
+def _recent_month(rng: random.Random, months: int) -> tuple[int, int]:
+    d = date.today().replace(day=1)
+    for _ in range(rng.randrange(months)):
+        d = (d - timedelta(days=1)).replace(day=1)
+    return d.month, d.year
+
+
+def _scenarios(args) -> dict:
+    def month_query(rng):
+        m, y = _recent_month(rng, args.months)
+        return f"month={m}&year={y}"
+
+    def update(rng, user):
+        txn_id = rng.choice(user["txn_ids"])
+        return "PUT", f"/api/transactions/{txn_id}", {"category": rng.choice(_BUDGET_CATEGORIES)}
+
+    def create(rng, user):
+        return "POST", "/api/transactions", {
+            "date": str(date.today()), "description": "Bench manual entry",
+            "amount": -round(rng.uniform(1, 100), 2), "category": "other", "bank": "Manual",
+        }
+
+    def delete(rng, user):
+        txn_id = user["created"].pop()
+        return "DELETE", f"/api/transactions/{txn_id}", None
+
+    today = date.today()
+    return {
+        "summary":       lambda rng, u: ("GET", f"/api/dashboard/summary?{month_query(rng)}", None),
+        "by-category":   lambda rng, u: ("GET", f"/api/dashboard/by-category?{month_query(rng)}", None),
+        "monthly-trend": lambda rng, u: ("GET", f"/api/dashboard/monthly-trend?year={today.year}", None),
+        "budget-status": lambda rng, u: ("GET", f"/api/dashboard/budget-status?{month_query(rng)}", None),
+        "top-merchants": lambda rng, u: ("GET", f"/api/dashboard/top-merchants?{month_query(rng)}", None),
+        "aggregate":     lambda rng, u: ("GET", f"/api/dashboard/aggregate?from={today - timedelta(days=365)}"
+                                                f"&to={today}&bucket=month&group_by=category", None),
+        "list":          lambda rng, u: ("GET", f"/api/transactions?{month_query(rng)}&limit=50", None),
+        "search":        lambda rng, u: ("GET", f"/api/transactions?q={rng.choice(['wong', 'uber', 'netflix', 'tambo'])}"
+                                                f"&limit=20", None),
+        "create":        create,
+        "update":        update,
+        "delete":        delete,
+    }
+
+
+# ── Load generation ───────────────────────────────────────────────────────────
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_app(port: int):
+    import uvicorn
+
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port,
+                                           log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+class _DirectReads:
+    """Counts (and delays by --rtt-ms) the direct backend's queries, like the fake does."""
+
+    def __init__(self, latency: float):
+        from sqlalchemy import event
+
+        from postgres_client import get_read_engine
+
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        event.listen(get_read_engine(), "before_cursor_execute", self._on_query)
+
+    def _on_query(self, *_) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.calls = 0
+
+
+def _run_scenario(name, make_request, users, base_url, pg, args, direct=None) -> dict:
+    import httpx
+
+    local = threading.local()
+    rng_lock = threading.Lock()
+    rng = random.Random(f"{args.seed}-{name}")
+
+    def one(_):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base_url, timeout=60)
+        with rng_lock:
+            user = rng.choice(users)
+            method, path, body = make_request(rng, user)
+        headers = {"Authorization": f"Bearer {user['token']}", "Accept-Encoding": "identity"}
+        t0 = time.perf_counter()
+        try:
+            resp = client.request(method, path, json=body, headers=headers)
+        except httpx.TransportError:
+            local.client = None   # server dropped the connection (unhandled app error)
+            return time.perf_counter() - t0, 0
+        elapsed = time.perf_counter() - t0
+        if method == "POST" and resp.status_code == 201:
+            user["created"].append(resp.json()["id"])
+        return elapsed, resp.status_code
+
+    pg.reset_counts()
+    if direct is not None:
+        direct.reset_counts()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - t0
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses = Counter(str(code) for _, code in results)
+    round_trips = dict(pg.by_route)
+    if direct is not None and direct.calls:
+        round_trips["direct"] = direct.calls
+    calls = sum(round_trips.values())
+    return {
+        "requests":           len(results),
+        "errors":             sum(n for code, n in statuses.items() if not code.startswith("2")),
+        "statuses":           dict(statuses),
+        "p50_ms":             round(_percentile(latencies, 50), 2),
+        "p95_ms":             round(_percentile(latencies, 95), 2),
+        "p99_ms":             round(_percentile(latencies, 99), 2),
+        "max_ms":             round(latencies[-1], 2) if latencies else 0.0,
+        "requests_per_second": round(len(results) / wall, 1) if wall else None,
+        "round_trips_per_request": round(calls / len(results), 2) if results else 0.0,
+        "round_trips":        round_trips,
+    }
+
+
+def run(args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_api_"), "bench.db")
+    _configure_env(args, db_path)
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    from benchmarks.bench_sync import _git_commit
+    from benchmarks.fake_postgrest import FakePostgREST
+
+    users = _seed(args)
+    scenarios = _scenarios(args)
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+    unknown = [s for s in selected if s not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    with FakePostgREST(db_path, latency=args.rtt_ms / 1000) as pg:
+        os.environ["SUPABASE_URL"] = pg.url
+        port = _free_port()
+        server, thread = _start_app(port)
+        base_url = f"http://127.0.0.1:{port}"
+        direct = _DirectReads(args.rtt_ms / 1000) if args.backend == "postgres" else None
+        try:
+            # First request per scenario pays for lazy imports and client setup
+            warm = argparse.Namespace(**{**vars(args), "requests": 1, "concurrency": 1})
+            for name in selected:
+                _run_scenario(name, scenarios[name], users, base_url, pg, warm, direct)
+            results = {name: _run_scenario(name, scenarios[name], users, base_url, pg, args, direct)
+                       for name in selected}
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    return {
+        "meta": {
+            "commit":    _git_commit(),
+            "python":    platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params":    {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "results": results,
+    }
+
+
+def _print_report(report: dict) -> None:
+    p = report["meta"]["params"]
+    print(f"{p['users']} user(s) × {p['txns']:,} txns, concurrency {p['concurrency']}, "
+          f"{p['requests']} request(s)/scenario, RTT {p['rtt_ms']} ms, "
+          f"cache {'on' if p['cache'] else 'off'}, reads via {p.get('backend', 'postgrest')}\n")
+    print(f"  {'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} "
+          f"{'RT/req':>7} {'errors':>7}")
+    for name, r in report["results"].items():
+        print(f"  {name:<14} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+              f"{r['requests_per_second']:8.1f} {r['round_trips_per_request']:7.2f} {r['errors']:7d}")
+    failed = {name: r["statuses"] for name, r in report["results"].items() if r["errors"]}
+    if failed:
+        print(f"\nNon-2xx responses (status 0 = connection dropped): {failed}")
+        print("Rerun with --users 1 or --concurrency 1: errors that go away come from set_config "
+              "and the query taking different pooled connections (CAVEAT in supabase_client.py); "
+              "the rest are real failures — check the server log.")
+
+
+def _compare(report: dict, path: str) -> None:
+    with open(path) as f:
+        old = json.load(f)["results"]
+    print(f"\nvs {path}")
+    for name, r in report["results"].items():
+        prev = old.get(name)
+        if not prev:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "round_trips_per_request"):
+            a, b = prev.get(key), r.get(key)
+            if a:
+                print(f"  {name:<14} {key:<24} {a:>9} → {b:>9}  ({(b - a) / a:+.1%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--txns", type=int, default=3000, help="transactions per user")
+    parser.add_argument("--months", type=int, default=12, help="history spread over this many months")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--rtt-ms", type=float, default=10.0, help="added to every PostgREST call")
+    parser.add_argument("--scenarios", default=None, help="comma-separated subset (default: all)")
+    parser.add_argument("--cache", action="store_true", help="keep the dashboard result cache on")
+    parser.add_argument("--backend", choices=("postgrest", "postgres"), default="postgrest",
+                        help="DATA_BACKEND for dashboard/report reads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", default=None, help="previous JSON report to diff against")
+    args = parser.parse_args()
+
+    report = run(args)
+    _print_report(report)
+    if args.compare:
+        _compare(report, args.compare)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Held-out accuracy and latency of the local categorizer (services.categorizer).
+
+By default trains/evaluates on the real (user_id, description, category)
+triples in DATABASE_URL. --synthetic uses generated merchant strings instead,
+which is only useful as a latency check.
+
+Usage (from backend/):
+    python -m benchmarks.bench_categorizer [--holdout 0.2] [--synthetic 20000]
+"""
+import argparse
+import json
+import random
+
+from services.categorizer import MIN_CONFIDENCE, evaluate, load_pairs
+
+# merchant stem → category, with noisy variants generated around each stem
+_SYNTHETIC = {
+    "WONG": "groceries", "PLAZA VEA": "groceries", "TOTTUS": "groceries", "METRO": "groceries",
+    "UBER": "transport", "CABIFY": "transport", "REPSOL": "transport", "PRIMAX": "transport",
+    "RAPPI": "restaurants", "STARBUCKS": "restaurants", "PEDIDOSYA": "restaurants",
+    "NETFLIX": "entertainment", "SPOTIFY": "entertainment", "CINEPLANET": "entertainment",
+    "LUZ DEL SUR": "utilities", "SEDAPAL": "utilities", "CLARO": "utilities",
+    "INKAFARMA": "health", "MIFARMA": "health", "CLINICA RICARDO PALMA": "health",
+    "SAGA FALABELLA": "shopping", "RIPLEY": "shopping", "AMAZON": "shopping",
+    "UPC": "education", "COURSERA": "education",
+    "TRANSF YAPE": "transfer", "PLIN": "transfer", "ABONO HABERES": "salary",
+}
+_SUFFIXES = ["", " SAN ISIDRO", " MIRAFLORES", ".PE", " LIMA PE", " *", " 0231", " SURCO"]
+
+
+def synthetic_pairs(n: int, users: int = 50, seed: int = 0) -> list[tuple[int, str, str]]:
+    rng = random.Random(seed)
+    stems = list(_SYNTHETIC)
+    return [
+        (rng.randrange(users), stem + rng.choice(_SUFFIXES), _SYNTHETIC[stem])
+        for stem in (rng.choice(stems) for _ in range(n))
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="evaluate on N generated pairs instead of the database")
+    args = parser.parse_args()
+
+    pairs = synthetic_pairs(args.synthetic) if args.synthetic else load_pairs()
+    source = "synthetic" if args.synthetic else "database"
+    print(f"Evaluating on {len(pairs):,} {source} pair(s), holdout {args.holdout:.0%}, "
+          f"confidence threshold {MIN_CONFIDENCE}")
+    print(json.dumps(evaluate(pairs, holdout=args.holdout), indent=2))
+
+
+if __name__ == "__main__":
+    main()
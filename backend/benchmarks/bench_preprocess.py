@@ -0,0 +1,143 @@
+"""
+Email preprocessing benchmark: parse time and estimated input tokens.
+
+Compares the old path (BeautifulSoup html.parser, whole text sent to Claude)
+with services.email_preprocess (lxml or stdlib HTML → text, boilerplate
+stripping, whitespace collapsing, truncation).
+
+By default runs on generated bank-style HTML alerts; --dir points at a folder
+of saved .html/.txt email bodies instead (sender is taken from the file name,
+e.g. bcp.com.pe_0001.html).
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocess [--emails 500] [--dir samples/]
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from services.email_preprocess import (
+    _html_to_text_stdlib, clean_body, estimate_tokens, html_to_text, lxml,
+)
+
+# sender → (greeting, card line, security line, legal entity line); each
+# footer opens with the lines that bank's own SENDER_RULES cut on, so every
+# rule set is exercised, not just BCP's
+BANKS = {
+    "alertas@bcp.com.pe": (
+        "Hola,", "Realizaste un consumo con tu Tarjeta de Crédito   BCP   Visa",
+        "Recuerda que BCP nunca te solicitará tus claves por correo, teléfono o SMS.",
+        "Banco de Crédito del Perú — Todos los derechos reservados.",
+    ),
+    "notificaciones@interbank.pe": (
+        "Hola", "Se realizó un consumo con tu Tarjeta de Débito Interbank",
+        "Interbank nunca te pedirá tus claves ni datos de tu tarjeta.",
+        "Banco Internacional del Perú S.A.A. — Interbank.",
+    ),
+    "avisos@bbva.pe": (
+        "Estimado cliente:", "Te informamos que se realizó una compra con tu Tarjeta BBVA",
+        "BBVA nunca te solicitará tus claves por correo electrónico.",
+        "BBVA Perú, todos los derechos reservados.",
+    ),
+    "alertas@scotiabank.com.pe": (
+        "Estimado cliente", "Se registró un consumo con tu Tarjeta Scotiabank",
+        "Scotiabank nunca te pedirá información confidencial por este medio.",
+        "Scotiabank Perú S.A.A. Todos los derechos reservados.",
+    ),
+}
+SENDERS = list(BANKS)
+MERCHANTS = ["WONG SAN ISIDRO", "PLAZA VEA", "UBER TRIP", "RAPPI", "NETFLIX.COM", "TAMBO+"]
+
+_FOOTER = """
+<table class="footer"><tr><td>
+<p>{security}</p>
+<p>Este correo es generado automáticamente, por favor no respondas a este mensaje.</p>
+<p>La información contenida en este mensaje es confidencial y está dirigida
+únicamente a su destinatario. Si usted no es el destinatario, le rogamos
+eliminarlo y comunicarlo al remitente. {filler}</p>
+<p>Síguenos en</p><p>Facebook</p><p>Instagram</p><p>LinkedIn</p>
+<p>{entity}</p>
+</td></tr></table>
+"""
+
+
+def make_email(rng: random.Random) -> tuple[str, str]:
+    sender = rng.choice(SENDERS)
+    greeting, card, security, entity = BANKS[sender]
+    amount = f"{rng.uniform(5, 900):,.2f}"
+    filler = " ".join(["Texto legal adicional."] * rng.randint(10, 60))
+    html = f"""<html><head><title>Alerta</title>
+<style>td {{ font-family: Arial; }} .x {{ color: #333; }}</style></head>
+<body><table width="600"><tr><td><img src="logo.png"></td></tr>
+<tr><td><p>Ver este correo en el navegador</p><p>{greeting}</p>
+<p>{card}</p>
+<table><tr><td>Monto</td><td>S/ {amount}</td></tr>
+<tr><td>Comercio</td><td>{rng.choice(MERCHANTS)}</td></tr>
+<tr><td>Fecha y hora</td><td>{rng.randint(1, 28):02d}/05/2025 - 14:32</td></tr>
+<tr><td>Número de operación</td><td>{rng.randint(100000, 999999)}</td></tr></table>
+</td></tr></table>{_FOOTER.format(security=security, entity=entity, filler=filler)}</body></html>"""
+    return sender, html
+
+
+def load_dir(path: Path) -> list[tuple[str, str]]:
+    emails = []
+    for f in sorted(path.glob("*")):
+        if f.suffix in (".html", ".htm", ".txt"):
+            emails.append((f.stem.split("_")[0], f.read_text(errors="replace")))
+    return emails
+
+
+def timed(fn, items) -> tuple[list, float]:
+    t0 = time.perf_counter()
+    out = [fn(x) for x in items]
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    emails = load_dir(args.dir) if args.dir else [
+        make_email(random.Random(i)) for i in range(args.emails)
+    ]
+    senders = [s for s, _ in emails]
+    bodies = [b for _, b in emails]
+    print(f"{len(emails)} email(s), avg {sum(map(len, bodies)) / max(1, len(bodies)):,.0f} chars of HTML")
+
+    old_text, t_bs4 = timed(lambda h: BeautifulSoup(h, "html.parser").get_text(separator="\n"), bodies)
+    _, t_stdlib = timed(_html_to_text_stdlib, bodies)
+    new_text, t_fast = timed(html_to_text, bodies)
+    cleaned, t_clean = timed(lambda p: clean_body(*p), zip(new_text, senders))
+
+    n = max(1, len(emails))
+    print("\nHTML → text (ms/email)")
+    print(f"  BeautifulSoup html.parser  {t_bs4 / n * 1e3:8.3f}")
+    print(f"  stdlib HTMLParser          {t_stdlib / n * 1e3:8.3f}")
+    label = f"html_to_text ({'lxml' if lxml else 'stdlib'})"
+    print(f"  {label:<27}{t_fast / n * 1e3:8.3f}")
+    print(f"  clean_body                 {t_clean / n * 1e3:8.3f}")
+
+    before = sum(estimate_tokens(t) for t in old_text)
+    after = sum(estimate_tokens(t) for t in cleaned)
+    print("\nEstimated input tokens per email (~4 chars/token)")
+    print(f"  before  {before / n:8.0f}")
+    print(f"  after   {after / n:8.0f}   ({1 - after / max(1, before):.0%} fewer)")
+    by_sender: dict[str, list[int]] = {}
+    for sender, old, new in zip(senders, old_text, cleaned):
+        totals = by_sender.setdefault(sender, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += estimate_tokens(old)
+        totals[2] += estimate_tokens(new)
+    for sender, (count, b, a) in sorted(by_sender.items()):
+        print(f"    {sender:<30} {count:5d} email(s)  {b / count:6.0f} → {a / count:4.0f}"
+              f"  ({1 - a / max(1, b):.0%} fewer)")
+    print("\nSample cleaned body:\n" + "-" * 40 + f"\n{cleaned[0] if cleaned else ''}\n" + "-" * 40)
+
+
+if __name__ == "__main__":
+    main()
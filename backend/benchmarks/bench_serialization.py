@@ -0,0 +1,102 @@
+"""
+Serialization benchmark for large list responses.
+
+Compares the old path (response_model=list[TransactionRead] revalidation +
+jsonable_encoder + stdlib json) with services.fast_response (orjson, no
+revalidation), and reports bytes on the wire for identity / gzip / brotli.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models import CATEGORIES, TransactionRead
+from services.fast_response import BROTLI_LEVEL, GZIP_LEVEL, brotli
+
+BANKS = ["BCP", "Interbank", "BBVA", "Scotiabank"]
+MERCHANTS = ["WONG SAN ISIDRO", "PLAZA VEA", "UBER TRIP", "RAPPI", "NETFLIX.COM",
+             "TAMBO+", "INKAFARMA", "CINEPLANET", "LUZ DEL SUR", "STARBUCKS"]
+
+
+def make_rows(n: int, seed: int = 42) -> list[dict]:
+    """Rows shaped exactly like PostgREST's `select("*")` output."""
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    rows = []
+    for i in range(n):
+        d = start + timedelta(days=rng.randrange(730))
+        rows.append({
+            "id":          i + 1,
+            "user_id":     1,
+            "date":        d.isoformat(),
+            "description": rng.choice(MERCHANTS),
+            "amount":      round(-rng.uniform(1, 500), 2),
+            "currency":    rng.choice(("PEN", "PEN", "PEN", "USD")),
+            "category":    rng.choice(CATEGORIES),
+            "bank":        rng.choice(BANKS),
+            "email_id":    f"18c{rng.getrandbits(48):012x}",
+            "created_at":  datetime(2024, 1, 1, 12, 0, 0).isoformat(),
+        })
+    return rows
+
+
+_adapter = TypeAdapter(list[TransactionRead])
+
+
+def pydantic_path(rows: list[dict]) -> bytes:
+    validated = _adapter.validate_python(rows)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def orjson_path(rows: list[dict]) -> bytes:
+    return orjson.dumps(rows)
+
+
+def _best_of(fn, arg, repeat: int) -> tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"Rows: {args.rows:,}  (best of {args.repeat})\n")
+
+    print(f"{'path':<34}{'time (ms)':>12}")
+    t_old, body = _best_of(pydantic_path, rows, args.repeat)
+    t_new, fast = _best_of(orjson_path, rows, args.repeat)
+    print(f"{'response_model + stdlib json':<34}{t_old * 1000:>12.1f}")
+    print(f"{'orjson, no revalidation':<34}{t_new * 1000:>12.1f}")
+    print(f"{'speedup':<34}{t_old / t_new:>11.1f}x\n")
+
+    print(f"{'encoding':<34}{'bytes':>12}{'time (ms)':>12}")
+    print(f"{'identity':<34}{len(fast):>12,}{0.0:>12.1f}")
+    t_gz, gz = _best_of(lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL), fast, args.repeat)
+    print(f"{f'gzip (level {GZIP_LEVEL})':<34}{len(gz):>12,}{t_gz * 1000:>12.1f}")
+    if brotli is not None:
+        t_br, br = _best_of(lambda b: brotli.compress(b, quality=BROTLI_LEVEL), fast, args.repeat)
+        print(f"{f'brotli (quality {BROTLI_LEVEL})':<34}{len(br):>12,}{t_br * 1000:>12.1f}")
+    else:
+        print(f"{'brotli':<34}{'(brotli package not installed)':>24}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cold-start import budget for the API process.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, reports
+the median cumulative import time of main plus the slowest modules, and exits
+non-zero when the median is over budget or when a sync/login-only module
+(Gmail/Anthropic clients, APScheduler, ...) is imported on the request path.
+Meant to run in CI next to the linters.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--budget-ms 1500] [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Must only be imported lazily (sync, login or scheduler code paths)
+LAZY_MODULES = [
+    "anthropic", "googleapiclient", "google_auth_oauthlib", "google.oauth2",
+    "bs4", "lxml", "apscheduler", "supabase", "sync_job", "extract_transactions",
+    "fetch_emails",
+]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def run_once(env: dict) -> tuple[int, dict[str, int]]:
+    """Returns (cumulative µs for main, {module: self µs})."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import main failed:\n{proc.stderr[-2000:]}")
+    total, self_times = 0, {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, _, module = int(m[1]), int(m[2]), m[3], m[4]
+        self_times[module] = self_us
+        if module == "main":
+            total = cumulative_us
+    return total, self_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    totals, self_times = [], {}
+    run_once(env)   # warm the OS page cache / bytecode so runs are comparable
+    for _ in range(args.runs):
+        total, self_times = run_once(env)
+        totals.append(total / 1000)
+
+    median = statistics.median(totals)
+    print(f"import main: median {median:.0f} ms, min {min(totals):.0f} ms over {args.runs} run(s)"
+          f" (budget {args.budget_ms:.0f} ms)")
+
+    print(f"\nSlowest {args.top} modules by self time (last run)")
+    for module, us in sorted(self_times.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {module}")
+
+    eager = sorted({
+        lazy for lazy in LAZY_MODULES
+        for module in self_times
+        if module == lazy or module.startswith(lazy + ".")
+    })
+    failed = False
+    if eager:
+        print(f"\nFAIL: sync/login-only modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFAIL: cold start {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Local stand-in for Supabase's PostgREST endpoint, backed by SQLite.
+
+Implements the slice of the REST protocol our routers use through
+supabase-py, against the SQLModel tables in a SQLite file:
+
+  GET    /rest/v1/<table>   select=cols (+ one-level embeds like merchant(name)),
+                            eq/neq/gt/gte/lt/lte/like/ilike/is/in filters,
+                            order=a.desc,b, limit/offset
+  POST   /rest/v1/<table>   insert (object or list), Prefer: return=representation
+  PATCH  /rest/v1/<table>   update rows matching the filters
+  DELETE /rest/v1/<table>   delete rows matching the filters
+  POST   /rest/v1/rpc/set_config            records app.current_user_id
+  POST   /rest/v1/rpc/search_transactions   LIKE-based approximation of the
+                                            tsquery/trigram function
+
+set_config is remembered per keep-alive connection and, once set, restricts
+every table with a user_id column to that user — the same isolation the RLS
+policies give, with the same "GUC lives on the connection" caveat.
+
+Every request sleeps `latency` seconds first (the app ↔ Supabase network round
+trip we cannot reproduce locally) and is counted, so callers can report round
+trips per API request. Usage:
+
+    with FakePostgREST("/tmp/bench.db", latency=0.01) as pg:
+        os.environ["SUPABASE_URL"] = pg.url
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+_RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_EMBED = re.compile(r"^(?:(\w+):)?(\w+)(?:!\w+)?\((.*)\)$")
+
+
+class PostgRESTError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def _split_top_level(text: str) -> list[str]:
+    """'a,b,merchant(name,id)' → ['a', 'b', 'merchant(name,id)']"""
+    parts, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current += ch
+    if current:
+        parts.append(current)
+    return [p.strip() for p in parts if p.strip()]
+
+
+class _Store:
+    """SQLite access with per-thread connections and cached table schemas."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schemas: dict[str, dict[str, dict]] = {}
+        self._schema_lock = threading.Lock()
+        self.conn().execute("PRAGMA journal_mode=WAL")
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def columns(self, table: str) -> dict[str, dict]:
+        with self._schema_lock:
+            cols = self._schemas.get(table)
+            if cols is None:
+                info = self.conn().execute(f'PRAGMA table_info("{table}")').fetchall()
+                if not info:
+                    raise PostgRESTError(404, "42P01", f'relation "public.{table}" does not exist')
+                cols = {r["name"]: {"notnull": bool(r["notnull"]), "default": r["dflt_value"],
+                                    "pk": bool(r["pk"])} for r in info}
+                self._schemas[table] = cols
+            return cols
+
+    def column(self, table: str, name: str) -> str:
+        if name not in self.columns(table):
+            raise PostgRESTError(400, "42703", f"column {table}.{name} does not exist")
+        return f'"{name}"'
+
+
+class _Query:
+    """One table request parsed from the query string."""
+
+    def __init__(self, store: _Store, table: str, params: list[tuple[str, str]],
+                 user_id: Optional[int]):
+        self.store, self.table = store, table
+        self.columns = store.columns(table)
+        self.where: list[str] = []
+        self.args: list[Any] = []
+        self.select = "*"
+        self.order: list[str] = []
+        self.limit: Optional[int] = None
+        self.offset = 0
+
+        if user_id is not None and "user_id" in self.columns:
+            self.where.append('"user_id" = ?')
+            self.args.append(user_id)
+
+        for key, value in params:
+            if key == "select":
+                self.select = value
+            elif key == "order":
+                self._parse_order(value)
+            elif key == "limit":
+                self.limit = int(value)
+            elif key == "offset":
+                self.offset = int(value)
+            elif key not in _RESERVED:
+                self._parse_filter(key, value)
+
+    def _parse_order(self, value: str) -> None:
+        for term in value.split(","):
+            name, *mods = term.split(".")
+            col = self.store.column(self.table, name)
+            clause = f"{col} DESC" if "desc" in mods else col
+            if "nullsfirst" in mods:
+                clause = f"{col} IS NOT NULL, {clause}"
+            elif "nullslast" in mods:
+                clause = f"{col} IS NULL, {clause}"
+            self.order.append(clause)
+
+    def _parse_filter(self, key: str, value: str) -> None:
+        col = self.store.column(self.table, key)
+        negate = value.startswith("not.")
+        if negate:
+            value = value[4:]
+        op, _, operand = value.partition(".")
+        if op in _OPS:
+            clause, args = f"{col} {_OPS[op]} ?", [operand]
+        elif op in ("like", "ilike"):
+            pattern = operand.replace("*", "%")
+            clause = f"{col} LIKE ?" if op == "ilike" else f"{col} GLOB ?"
+            if op == "like":
+                pattern = pattern.replace("%", "*").replace("_", "?")
+            args = [pattern]
+        elif op == "is":
+            literal = {"null": "NULL", "true": "1", "false": "0"}.get(operand.lower())
+            if literal is None:
+                raise PostgRESTError(400, "PGRST100", f"invalid is. operand: {operand}")
+            clause, args = f"{col} IS {literal}", []
+        elif op == "in":
+            items = [i.strip().strip('"') for i in operand.strip("()").split(",") if i.strip()]
+            clause, args = f"{col} IN ({','.join('?' * len(items)) or 'NULL'})", items
+        else:
+            raise PostgRESTError(400, "PGRST100", f"unsupported operator: {op}")
+        self.where.append(f"NOT ({clause})" if negate else clause)
+        self.args.extend(args)
+
+    def where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self.where)}" if self.where else ""
+
+    def rows(self) -> list[dict]:
+        fields = _split_top_level(self.select)
+        plain = [f for f in fields if not _EMBED.match(f)]
+        embeds = [_EMBED.match(f).groups() for f in fields if _EMBED.match(f)]
+
+        if not plain or "*" in plain:
+            cols_sql = "*"
+        else:
+            cols_sql = ", ".join(self.store.column(self.table, c) for c in plain)
+        # embeds need the foreign key even when it was not selected
+        fk_cols = [f"{rel}_id" for _, rel, _ in embeds]
+        if cols_sql != "*":
+            cols_sql += "".join(f", {self.store.column(self.table, fk)}" for fk in fk_cols
+                                if fk not in plain)
+
+        sql = f'SELECT {cols_sql} FROM "{self.table}"{self.where_sql()}'
+        if self.order:
+            sql += f" ORDER BY {', '.join(self.order)}"
+        if self.limit is not None or self.offset:
+            sql += f" LIMIT {self.limit if self.limit is not None else -1} OFFSET {self.offset}"
+        rows = [dict(r) for r in self.store.conn().execute(sql, self.args)]
+
+        for alias, rel, sub in embeds:
+            fk = f"{rel}_id"
+            self._embed(rows, alias or rel, rel, sub, fk)
+            if cols_sql != "*" and fk not in plain:
+                for r in rows:
+                    r.pop(fk, None)
+        return rows
+
+    def _embed(self, rows: list[dict], key: str, rel: str, sub: str, fk: str) -> None:
+        """Many-to-one embed: each row gets rel's row (or None) via rel_id."""
+        ids = sorted({r[fk] for r in rows if r.get(fk) is not None})
+        related: dict[Any, dict] = {}
+        if ids:
+            wanted = _split_top_level(sub) or ["*"]
+            cols = "*" if "*" in wanted else ", ".join(self.store.column(rel, c) for c in wanted)
+            sql = f'SELECT id AS "__id", {cols} FROM "{rel}" WHERE id IN ({",".join("?" * len(ids))})'
+            for r in self.store.conn().execute(sql, ids):
+                d = dict(r)
+                related[d.pop("__id")] = d
+        for r in rows:
+            r[key] = related.get(r.get(fk))
+
+
+def _search_transactions(store: _Store, args: dict, user_id: Optional[int]) -> list[dict]:
+    """Every term must appear in description or bank; newest first."""
+    where, params = [], []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    for term in re.findall(r"[^\W_]+", (args.get("q") or "").lower()):
+        where.append("(lower(description) LIKE ? OR lower(bank) LIKE ?)")
+        params += [f"%{term}%", f"%{term}%"]
+    for column, key, op in (("date", "date_from", ">="), ("date", "date_to", "<"),
+                            ("category", "category_filter", "="), ("bank", "bank_filter", "=")):
+        if args.get(key) is not None:
+            where.append(f"{column} {op} ?")
+            params.append(args[key])
+    if args.get("month_filter") is not None:
+        where.append("CAST(strftime('%m', date) AS INTEGER) = ?")
+        params.append(args["month_filter"])
+    sql = 'SELECT * FROM "transaction"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY date DESC, id DESC LIMIT ? OFFSET ?"
+    params += [args.get("result_limit") or 50, args.get("result_offset") or 0]
+    return [dict(r) for r in store.conn().execute(sql, params)]
+
+
+class FakePostgREST:
+    """Threaded HTTP server on 127.0.0.1; .url goes in SUPABASE_URL."""
+
+    def __init__(self, db_path: str, latency: float = 0.0):
+        self.latency = latency
+        self.store = _Store(db_path)
+        self.calls = 0
+        self.by_route: Counter = Counter()
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like PostgREST behind Kong
+            disable_nagle_algorithm = True   # headers + body go out as separate writes
+            user_id: Optional[int] = None
+
+            def _handle(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                path = unquote(parts.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if fake.latency:
+                    time.sleep(fake.latency)
+                try:
+                    if not path.startswith("/rest/v1/"):
+                        raise PostgRESTError(404, "PGRST000", f"unknown path {path}")
+                    resource = path[len("/rest/v1/"):].strip("/")
+                    fake._count(f"{method} {resource}")
+                    params = parse_qsl(parts.query, keep_blank_values=True)
+                    payload = json.loads(body) if body else None
+                    prefer = self.headers.get("Prefer", "")
+                    if resource.startswith("rpc/"):
+                        status, data = fake._rpc(self, resource[4:], payload or {})
+                    else:
+                        status, data = fake._table(method, resource, params, payload, prefer,
+                                                   self.user_id)
+                except PostgRESTError as exc:
+                    status, data = exc.status, {"code": exc.code, "message": str(exc),
+                                                "details": None, "hint": None}
+                except (sqlite3.Error, ValueError) as exc:
+                    code = "23505" if isinstance(exc, sqlite3.IntegrityError) else "XX000"
+                    status, data = 400, {"code": code, "message": str(exc),
+                                         "details": None, "hint": None}
+                out = b"" if data is None else json.dumps(data, default=str).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                if isinstance(data, list):
+                    self.send_header("Content-Range", f"0-{max(len(data) - 1, 0)}/*")
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _count(self, route: str) -> None:
+        with self._lock:
+            self.calls += 1
+            self.by_route[route] += 1
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.by_route.clear()
+
+    # ── Handlers ──────────────────────────────────────────────────────────────
+
+    def _rpc(self, handler, name: str, args: dict) -> tuple[int, Any]:
+        if name == "set_config":
+            if args.get("setting_name") == "app.current_user_id":
+                handler.user_id = int(args["new_value"])
+            return 200, args.get("new_value")
+        if name == "search_transactions":
+            return 200, _search_transactions(self.store, args, handler.user_id)
+        raise PostgRESTError(404, "PGRST202", f"Could not find the function public.{name}")
+
+    def _table(self, method: str, table: str, params, payload, prefer: str,
+               user_id: Optional[int]) -> tuple[int, Any]:
+        query = _Query(self.store, table, params, user_id)
+        returning = "return=representation" in prefer
+        conn = self.store.conn()
+
+        if method == "GET":
+            return 200, query.rows()
+
+        if method == "POST":
+            items = payload if isinstance(payload, list) else [payload or {}]
+            ids = [self._insert(conn, table, query.columns, item) for item in items]
+            if not returning:
+                return 201, None
+            marks = ",".join("?" * len(ids))
+            rows = conn.execute(f'SELECT * FROM "{table}" WHERE rowid IN ({marks})', ids)
+            return 201, [dict(r) for r in rows]
+
+        if method == "PATCH":
+            sets = [f"{self.store.column(table, k)} = ?" for k in (payload or {})]
+            if not sets:
+                raise PostgRESTError(400, "PGRST102", "Empty or invalid json")
+            rowids = [r[0] for r in conn.execute(f'SELECT rowid FROM "{table}"{query.where_sql()}',
+                                                 query.args)]
+            if rowids:
+                marks = ",".join("?" * len(rowids))
+                conn.execute(f'UPDATE "{table}" SET {", ".join(sets)} WHERE rowid IN ({marks})',
+                             [*payload.values(), *rowids])
+            if not returning:
+                return 204, None
+            rows = conn.execute(f'SELECT * FROM "{table}" WHERE rowid IN ({",".join("?" * len(rowids))})',
+                                rowids) if rowids else []
+            return 200, [dict(r) for r in rows]
+
+        if method == "DELETE":
+            rows = [dict(r) for r in conn.execute(f'SELECT * FROM "{table}"{query.where_sql()}',
+                                                  query.args)] if returning else []
+            conn.execute(f'DELETE FROM "{table}"{query.where_sql()}', query.args)
+            return (200, rows) if returning else (204, None)
+
+        raise PostgRESTError(405, "PGRST000", f"{method} not supported")
+
+    def _insert(self, conn: sqlite3.Connection, table: str, columns: dict, item: dict) -> int:
+        row = {k: v for k, v in item.items() if k in columns}
+        unknown = set(item) - set(columns)
+        if unknown:
+            raise PostgRESTError(400, "PGRST204", f"Could not find the '{sorted(unknown)[0]}' column "
+                                                  f"of '{table}' in the schema cache")
+        # Postgres would fill these from column defaults; SQLModel sets them in Python
+        for name, col in columns.items():
+            if name not in row and col["notnull"] and col["default"] is None and not col["pk"] \
+                    and name.endswith("_at"):
+                row[name] = datetime.utcnow().isoformat(sep=" ")
+        names = ", ".join(f'"{k}"' for k in row)
+        cur = conn.execute(f'INSERT INTO "{table}" ({names}) VALUES ({",".join("?" * len(row))})',
+                           list(row.values()))
+        return cur.lastrowid
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,289 @@
+"""
+Local stand-ins for the external services the sync pipeline talks to, plus a
+synthetic bank-email generator. Used by bench_sync (and bench_api's seeding).
+
+  FakeGmail      users().messages().list/get + new_batch_http_request,
+                 serving generated emails for one user
+  FakeAnthropic  messages.create that "extracts" the ground truth embedded in
+                 the generated email (regexes, no model)
+  FxServer       tiny HTTP server speaking the open.er-api.com response shape
+
+All three take a latency (seconds per call) and an error rate; injected
+errors are the retryable kind (429 with Retry-After) so they exercise
+services.rate_limit rather than dropping emails.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+import types
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_categorizer import _SYNTHETIC
+
+# ── Synthetic emails ──────────────────────────────────────────────────────────
+
+_BANK_NAMES = {
+    "bcp": "BCP", "interbank": "Interbank", "bbva": "BBVA", "scotiabank": "Scotiabank",
+    "agora": "Agora", "io.pe": "iO",
+}
+
+_ALERT = """<html><head><style>td {{ font-family: Arial; }}</style></head><body>
+<table width="600"><tr><td><p>Ver este correo en el navegador</p><p>Hola,</p>
+<p>Realizaste un {kind} con tu tarjeta {bank}</p>
+<table><tr><td>Monto</td><td>{symbol} {amount:,.2f}</td></tr>
+<tr><td>Comercio</td><td>{merchant}</td></tr>
+<tr><td>Fecha</td><td>{day:%d/%m/%Y} - 14:32</td></tr>
+<tr><td>Número de operación</td><td>{op}</td></tr></table></td></tr></table>
+<p>Este correo es generado automáticamente, por favor no respondas a este mensaje.</p>
+<p>La información contenida en este mensaje es confidencial. {filler}</p>
+<p>© 2025 {bank}. Todos los derechos reservados.</p></body></html>"""
+
+_PROMO = """<html><body><h1>¡Promoción exclusiva!</h1>
+<p>Gana premios este mes con tu tarjeta. {filler}</p></body></html>"""
+
+
+def _bank_name(sender: str) -> str:
+    return next((name for key, name in _BANK_NAMES.items() if key in sender), "BCP")
+
+
+def make_emails(user_id: int, count: int, senders: list[str], promo_ratio: float = 0.2,
+                seed: int = 0) -> list[dict]:
+    """count Gmail-shaped messages for one user; ~promo_ratio are marketing."""
+    rng = random.Random(seed * 100_003 + user_id)
+    merchants = list(_SYNTHETIC)
+    today = date.today()
+    emails = []
+    for i in range(count):
+        sender = rng.choice(senders)
+        bank = _bank_name(sender)
+        filler = " ".join(["Texto legal adicional."] * rng.randint(5, 40))
+        if rng.random() < promo_ratio:
+            subject, html = "Promoción: descuentos de temporada", _PROMO.format(filler=filler)
+        else:
+            merchant = rng.choice(merchants)
+            usd = rng.random() < 0.15
+            kind = "abono" if _SYNTHETIC[merchant] == "salary" else "consumo"
+            subject = f"Constancia de {kind} - {bank}"
+            html = _ALERT.format(
+                kind=kind, bank=bank, symbol="US$" if usd else "S/",
+                amount=rng.uniform(3, 900 if not usd else 120), merchant=merchant,
+                day=today - timedelta(days=rng.randint(0, 6)), op=rng.randint(100000, 999999),
+                filler=filler,
+            )
+        emails.append({
+            "id": f"u{user_id}-m{i:06d}",
+            "snippet": re.sub(r"<[^>]+>", " ", html)[:160],
+            "payload": {
+                "mimeType": "text/html",
+                "headers": [
+                    {"name": "From", "value": sender},
+                    {"name": "Subject", "value": subject},
+                    {"name": "Date", "value": today.isoformat()},
+                ],
+                "body": {"data": base64.urlsafe_b64encode(html.encode()).decode()},
+            },
+        })
+    return emails
+
+
+# ── Error helpers ─────────────────────────────────────────────────────────────
+
+def _gmail_429():
+    import httplib2
+    from googleapiclient.errors import HttpError
+    resp = httplib2.Response({"status": 429, "retry-after": "0"})
+    return HttpError(resp, b'{"error": {"message": "rateLimitExceeded"}}')
+
+
+def _anthropic_429():
+    import anthropic
+    import httpx
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return anthropic.RateLimitError("rate_limit_error", response=response, body=None)
+
+
+class _Injector:
+    def __init__(self, latency: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def hit(self) -> bool:
+        """Sleep the configured latency; True when this call should fail."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.error_rate
+            self.errors += fail
+        return fail
+
+
+# ── Gmail ─────────────────────────────────────────────────────────────────────
+
+class _Request:
+    def __init__(self, gmail: "FakeGmail", fn):
+        self._gmail, self.fn = gmail, fn
+
+    def execute(self):
+        if self._gmail.injector.hit():
+            raise _gmail_429()
+        return self.fn()
+
+
+class _Batch:
+    def __init__(self, gmail: "FakeGmail", callback):
+        self._gmail, self._callback, self._items = gmail, callback, []
+
+    def add(self, request, request_id):
+        self._items.append((request_id, request))
+
+    def execute(self):
+        injector = self._gmail.injector
+        injector.hit()   # one round trip for the whole batch; failures are per item
+        for request_id, request in self._items:
+            if injector.error_rate and injector._rng.random() < injector.error_rate:
+                self._callback(request_id, None, _gmail_429())
+            else:
+                self._callback(request_id, request.fn(), None)
+
+
+class FakeGmail:
+    """Just enough of the discovery client for fetch_emails."""
+
+    def __init__(self, emails: list[dict], latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0, page_size: int = 100):
+        self._emails = {e["id"]: e for e in emails}
+        self._order = [e["id"] for e in emails]
+        self.page_size = page_size
+        self.injector = _Injector(latency, error_rate, seed)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, q, maxResults=100, pageToken=None):
+        start = int(pageToken or 0)
+        ids = self._order[start:start + min(maxResults, self.page_size)]
+        response = {"messages": [{"id": i} for i in ids]}
+        if start + len(ids) < len(self._order):
+            response["nextPageToken"] = str(start + len(ids))
+        return _Request(self, lambda: response)
+
+    def get(self, userId, id, format="full", metadataHeaders=None):
+        email = self._emails[id]
+        if format == "metadata":
+            wanted = {h.lower() for h in metadataHeaders or []}
+            payload = {"headers": [h for h in email["payload"]["headers"] if h["name"].lower() in wanted]}
+            return _Request(self, lambda: {"id": id, "snippet": email["snippet"], "payload": payload})
+        return _Request(self, lambda: email)
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
+
+
+# ── Anthropic ─────────────────────────────────────────────────────────────────
+
+_AMOUNT = re.compile(r"(S/|US\$)\s?([\d,]+\.\d{2})")
+_DATE = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+_MERCHANT = re.compile(r"Comercio\s*\n\s*(.+)")
+_BANK = re.compile(r"tarjeta (\w+)")
+
+
+class FakeAnthropic:
+    """messages.create → JSON transactions parsed from the prompt, with token usage."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, bad_json_rate: float = 0.0,
+                 seed: int = 0):
+        self.injector = _Injector(latency, error_rate, seed)
+        self.bad_json_rate = bad_json_rate
+        self._rng = random.Random(seed + 1)
+        self.messages = self
+
+    def create(self, model, max_tokens, system, messages):
+        if self.injector.hit():
+            raise _anthropic_429()
+        text = messages[0]["content"]
+        txns = []
+        amount, merchant = _AMOUNT.search(text), _MERCHANT.search(text)
+        if amount and merchant:
+            d, m, y = _DATE.search(text).groups() if _DATE.search(text) else ("01", "01", "2025")
+            name = merchant.group(1).strip()
+            value = float(amount.group(2).replace(",", ""))
+            category = _SYNTHETIC.get(name, "other")
+            txn = {
+                "date": f"{y}-{m}-{d}",
+                "description": name,
+                "amount": value if category == "salary" else -value,
+                "currency": "USD" if amount.group(1) == "US$" else "PEN",
+                "bank": _BANK.search(text).group(1) if _BANK.search(text) else "BCP",
+            }
+            if '"category"' in system:
+                txn["category"] = category
+            txns.append(txn)
+        out = json.dumps(txns)
+        if "haiku" in model and self._rng.random() < self.bad_json_rate:
+            out = out[:-1]   # truncated output → escalation
+        usage = types.SimpleNamespace(input_tokens=(len(system) + len(text)) // 4,
+                                      output_tokens=len(out) // 4)
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=out)], usage=usage)
+
+
+# ── Exchange-rate API ─────────────────────────────────────────────────────────
+
+class FxServer:
+    """open.er-api.com stand-in on 127.0.0.1; use .url_template for exchange_rate.API_URL."""
+
+    RATES = {"USD": 1.0, "PEN": 3.72, "EUR": 0.92}
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        injector = _Injector(latency, error_rate, seed)
+        rates = self.RATES
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                base = self.path.rstrip("/").rsplit("/", 1)[-1].upper()
+                if injector.hit() or base not in rates:
+                    self.send_response(429 if base in rates else 404)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps({
+                    "result": "success", "base_code": base,
+                    "rates": {c: r / rates[base] for c, r in rates.items()},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.injector = injector
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url_template(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v6/latest/{{from_currency}}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
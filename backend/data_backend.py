@@ -0,0 +1,23 @@
+"""
+Which backend the dashboard/report routers read through (DATA_BACKEND):
+
+  postgrest  (default) supabase-py → PostgREST → Postgres, RLS via set_config
+  postgres   pooled direct connection, RLS via SET LOCAL (postgres_client.py)
+
+Both return a client with the supabase-py query-builder interface, so the
+compute functions take either. Writes always go through supabase_client.
+"""
+import os
+
+DATA_BACKEND = os.getenv("DATA_BACKEND", "postgrest").lower()
+
+
+def get_reader_for_user(user_id: int):
+    """Client for user-scoped reads on the configured backend."""
+    if DATA_BACKEND == "postgres":
+        from postgres_client import PostgresReader
+
+        return PostgresReader(user_id)
+    from supabase_client import get_supabase_for_user
+
+    return get_supabase_for_user(user_id)
@@ -1,18 +1,65 @@
-"""Use Claude to extract structured transactions from raw email text."""
+"""
+Use Claude to extract structured transactions from raw email text.
+
+Model tiering: simple emails (short, a single amount, sender not forced to the
+strong tier) go to a small fast model first; the strong model is used directly
+for everything else, and as an escalation when the fast model's output fails
+validation (invalid JSON, missing/ill-typed fields, or no transaction where the
+email clearly has an amount). Configured via env:
+
+  EXTRACT_ROUTING        tiered (default) | strong (always use MODEL)
+  EXTRACT_MODEL_FAST     small model for simple emails
+  EXTRACT_MODEL_STRONG   large model (default MODEL)
+  EXTRACT_FAST_MAX_CHARS longest body considered simple (default 1500)
+  EXTRACT_STRONG_SENDERS comma-separated senders/domains always sent to strong
+  EXTRACT_PRICE_FAST / EXTRACT_PRICE_STRONG
+                         "input,output" USD per million tokens, for cost stats
+
+Per-tier calls, latency, tokens, estimated cost and escalation rate are kept
+in extraction_stats (see GET /api/sync/extraction-stats).
+"""
 import json
 import logging
+import os
 import re
-from typing import Any
+import threading
+import time
+from datetime import date
+from typing import Any, Optional
 
 import anthropic
 from dotenv import load_dotenv
 
+from services import rate_limit
+from services.email_preprocess import estimate_tokens
+from services.metrics import ANTHROPIC_TOKENS, count_for_run
+from services.rate_limit import TransientAPIError
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 MODEL = "claude-sonnet-4-5-20250929"
 MAX_TOKENS = 1024
 
+ROUTING        = os.getenv("EXTRACT_ROUTING", "tiered").lower()
+MODEL_FAST     = os.getenv("EXTRACT_MODEL_FAST", "claude-haiku-4-5-20251001")
+MODEL_STRONG   = os.getenv("EXTRACT_MODEL_STRONG", MODEL)
+FAST_MAX_CHARS = int(os.getenv("EXTRACT_FAST_MAX_CHARS", "1500"))
+STRONG_SENDERS = [
+    s.strip().lower() for s in os.getenv("EXTRACT_STRONG_SENDERS", "").split(",") if s.strip()
+]
+
+
+def _price(name: str, default: str) -> tuple[float, float]:
+    inp, out = os.getenv(name, default).split(",")
+    return float(inp), float(out)
+
+
+PRICES = {
+    "fast":   _price("EXTRACT_PRICE_FAST", "1,5"),
+    "strong": _price("EXTRACT_PRICE_STRONG", "3,15"),
+}
+
 SYSTEM_PROMPT = """You are a financial data extraction assistant specializing in Peruvian bank emails.
 Extract ALL financial transactions from the bank notification email provided.
 Return ONLY a valid JSON array, no markdown fences, no explanation, no extra text.
@@ -34,13 +81,21 @@ Rules:
 - Handle Spanish text naturally (BCP, Interbank, BBVA Peru emails are in Spanish)
 """
 
+# Variant used when services.categorizer assigns categories locally
+# (CATEGORIZER_MODE=local): same rules, no category field, fewer output tokens.
+SYSTEM_PROMPT_NO_CATEGORY = SYSTEM_PROMPT.replace(
+    '- "category": one of [groceries, transport, restaurants, entertainment, utilities, transfer, salary, shopping, health, education, other]\n',
+    "",
+)
+
 _client: anthropic.Anthropic | None = None
 
 
 def _get_client() -> anthropic.Anthropic:
     global _client
     if _client is None:
-        _client = anthropic.Anthropic()  # reads ANTHROPIC_API_KEY from env
+        # reads ANTHROPIC_API_KEY from env; retries are done by services.rate_limit
+        _client = anthropic.Anthropic(max_retries=0)
     return _client
 
 
@@ -52,26 +107,203 @@ def _strip_markdown(text: str) -> str:
     return text.strip()
 
 
-def extract_transactions(email_body: str, email_subject: str = "") -> list[dict[str, Any]]:
+# ── Routing ───────────────────────────────────────────────────────────────────
+
+# "S/ 45.90", "S/.1,200.00", "US$ 12.00", "$ 9.99", "USD 100"
+_AMOUNT = re.compile(r"(?:S/\.?|US\$|\$|USD|PEN)\s?\d[\d,]*(?:\.\d{1,2})?", re.IGNORECASE)
+_CURRENCIES = {"PEN", "USD"}
+
+
+def count_amounts(text: str) -> int:
+    return len(_AMOUNT.findall(text))
+
+
+def choose_tier(email_body: str, email_subject: str = "", email_sender: str = "") -> str:
+    """'fast' for single-amount alerts, 'strong' for statements and anything unusual."""
+    if ROUTING != "tiered":
+        return "strong"
+    sender = email_sender.lower()
+    if any(s in sender for s in STRONG_SENDERS):
+        return "strong"
+    if len(email_body) > FAST_MAX_CHARS:
+        return "strong"
+    return "fast" if count_amounts(f"{email_subject}\n{email_body}") == 1 else "strong"
+
+
+class ExtractionStats:
+    """Per-tier counters for the extraction router (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {
+            tier: {"calls": 0, "failures": 0, "latency_s": 0.0,
+                   "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+            for tier in PRICES
+        }
+        self.routed = {tier: 0 for tier in PRICES}
+        self.escalations = 0
+        self.escalation_reasons: dict[str, int] = {}
+
+    def record_call(self, tier: str, latency_s: float, usage: Any, failed: bool = False) -> None:
+        inp = getattr(usage, "input_tokens", 0) or 0
+        out = getattr(usage, "output_tokens", 0) or 0
+        price_in, price_out = PRICES[tier]
+        with self._lock:
+            t = self._tiers[tier]
+            t["calls"] += 1
+            t["failures"] += failed
+            t["latency_s"] += latency_s
+            t["input_tokens"] += inp
+            t["output_tokens"] += out
+            t["cost_usd"] += (inp * price_in + out * price_out) / 1e6
+
+    def record_route(self, tier: str) -> None:
+        with self._lock:
+            self.routed[tier] += 1
+
+    def record_escalation(self, reason: str) -> None:
+        with self._lock:
+            self.escalations += 1
+            self.escalation_reasons[reason] = self.escalation_reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for tier, t in self._tiers.items():
+                tiers[tier] = {
+                    "model":          MODEL_FAST if tier == "fast" else MODEL_STRONG,
+                    "calls":          t["calls"],
+                    "failures":       t["failures"],
+                    "avg_latency_ms": round(t["latency_s"] / t["calls"] * 1000, 1) if t["calls"] else None,
+                    "input_tokens":   t["input_tokens"],
+                    "output_tokens":  t["output_tokens"],
+                    "cost_usd":       round(t["cost_usd"], 4),
+                }
+            routed_fast = self.routed["fast"]
+            return {
+                "routing":            ROUTING,
+                "routed":             dict(self.routed),
+                "escalations":        self.escalations,
+                "escalation_rate":    round(self.escalations / routed_fast, 4) if routed_fast else 0.0,
+                "escalation_reasons": dict(self.escalation_reasons),
+                "tiers":              tiers,
+            }
+
+
+extraction_stats = ExtractionStats()
+
+
+# ── Extraction ────────────────────────────────────────────────────────────────
+
+def _call_model(tier: str, system: str, user_message: str) -> str:
+    model = MODEL_FAST if tier == "fast" else MODEL_STRONG
+    t0 = time.perf_counter()
+    try:
+        message = rate_limit.call_with_retry(
+            lambda: _get_client().messages.create(
+                model=model,
+                max_tokens=MAX_TOKENS,
+                system=system,
+                messages=[{"role": "user", "content": user_message}],
+            ),
+            "anthropic",
+            tokens=estimate_tokens(system) + estimate_tokens(user_message),
+        )
+    except Exception:
+        extraction_stats.record_call(tier, time.perf_counter() - t0, None, failed=True)
+        raise
+    usage = getattr(message, "usage", None)
+    extraction_stats.record_call(tier, time.perf_counter() - t0, usage)
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    ANTHROPIC_TOKENS.inc(input_tokens, model=model, type="input")
+    ANTHROPIC_TOKENS.inc(output_tokens, model=model, type="output")
+    count_for_run("tokens_input", input_tokens)
+    count_for_run("tokens_output", output_tokens)
+    return message.content[0].text
+
+
+def _field_problem(txn: dict) -> Optional[str]:
+    """Strict per-field check used to decide whether to escalate."""
+    try:
+        date.fromisoformat(str(txn["date"]))
+    except ValueError:
+        return "bad_date"
+    if isinstance(txn["amount"], bool) or not isinstance(txn["amount"], (int, float)):
+        return "bad_amount"
+    if txn["currency"] not in _CURRENCIES:
+        return "bad_currency"
+    if not str(txn["description"]).strip():
+        return "empty_description"
+    return None
+
+
+def _fast_output_problem(raw: str, required_fields: set[str], expected_amounts: int) -> Optional[str]:
+    """Reason to escalate the fast model's output, or None if it is acceptable."""
+    try:
+        transactions = json.loads(_strip_markdown(raw))
+    except json.JSONDecodeError:
+        return "invalid_json"
+    if not isinstance(transactions, list):
+        return "not_a_list"
+    if not transactions and expected_amounts:
+        return "empty_output"
+    for txn in transactions:
+        if not isinstance(txn, dict) or not required_fields.issubset(txn.keys()):
+            return "missing_fields"
+        try:
+            problem = _field_problem(txn)
+        except (TypeError, ValueError, KeyError):
+            # e.g. a list or object where a scalar belongs ({"currency": ["PEN"]})
+            problem = "bad_field_type"
+        if problem:
+            return problem
+    return None
+
+
+def extract_transactions(
+    email_body: str,
+    email_subject: str = "",
+    include_category: bool = True,
+    email_sender: str = "",
+) -> list[dict[str, Any]]:
     """
     Send email body to Claude and return a list of transaction dicts.
-    Returns [] on any failure so the caller can continue processing other emails.
+    Returns [] on any failure so the caller can continue processing other emails,
+    except rate-limit/5xx failures that outlive their retries: those raise
+    TransientAPIError so the email is not marked processed.
+    With include_category=False, Claude isn't asked for a category and the
+    caller is expected to fill it in.
     """
     if not email_body.strip():
         logger.warning("Empty email body, skipping extraction")
         return []
 
     user_message = f"Subject: {email_subject}\n\n{email_body}"
+    system = SYSTEM_PROMPT if include_category else SYSTEM_PROMPT_NO_CATEGORY
+    required_fields = {"date", "description", "amount", "currency", "bank"}
+    if include_category:
+        required_fields.add("category")
 
     try:
-        client = _get_client()
-        message = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}],
-        )
-        raw = message.content[0].text
+        tier = choose_tier(email_body, email_subject, email_sender)
+        extraction_stats.record_route(tier)
+
+        raw = None
+        if tier == "fast":
+            try:
+                raw = _call_model("fast", system, user_message)
+                reason = _fast_output_problem(raw, required_fields, count_amounts(user_message))
+            except (anthropic.APIError, TransientAPIError) as exc:
+                reason = "api_error"
+                logger.warning("Fast model error, escalating: %s", exc)
+            if reason:
+                extraction_stats.record_escalation(reason)
+                logger.info("Escalating extraction to %s (%s)", MODEL_STRONG, reason)
+                raw = None
+        if raw is None:
+            raw = _call_model("strong", system, user_message)
+
         cleaned = _strip_markdown(raw)
         transactions = json.loads(cleaned)
 
@@ -81,7 +313,6 @@ def extract_transactions(email_body: str, email_subject: str = "") -> list[dict[
 
         # Basic field validation
         valid = []
-        required_fields = {"date", "description", "amount", "currency", "category", "bank"}
         for txn in transactions:
             if required_fields.issubset(txn.keys()):
                 valid.append(txn)
@@ -91,6 +322,8 @@ def extract_transactions(email_body: str, email_subject: str = "") -> list[dict[
 
         return valid
 
+    except TransientAPIError:
+        raise
     except json.JSONDecodeError as exc:
         logger.error("JSON parse error from Claude response: %s", exc)
         return []
@@ -1,12 +1,18 @@
 import base64
 import logging
 import os
-from typing import Generator
-from bs4 import BeautifulSoup
+import time
+from datetime import datetime, timezone
+from typing import Callable, Generator, Optional
 from dotenv import load_dotenv
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
+from services import rate_limit
+from services.email_preprocess import html_to_text
+from services.email_triage import classify
+from services.metrics import count_for_run, sync_stage
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -28,7 +34,7 @@ def _decode_body(payload: dict) -> str:
 
     if mime_type == "text/html" and body_data:
         html = base64.urlsafe_b64decode(body_data).decode("utf-8", errors="replace")
-        return BeautifulSoup(html, "html.parser").get_text(separator="\n")
+        return html_to_text(html)
 
     for part in payload.get("parts", []):
         result = _decode_body(part)
@@ -43,50 +49,174 @@ def _build_query(days_back: int = 7) -> str:
     return f"({from_clause}) newer_than:{days_back}d"
 
 
+def build_window_query(after: datetime, before: datetime) -> str:
+    """Bank emails received in [after, before) — naive datetimes are UTC.
+    Epoch seconds, because after:/before: dates are day-granular and in PT."""
+    def epoch(dt: datetime) -> int:
+        return int((dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp())
+
+    from_clause = " OR ".join(f"from:{s}" for s in BANK_SENDERS)
+    return f"({from_clause}) after:{epoch(after)} before:{epoch(before)}"
+
+
+METADATA_BATCH_SIZE = 50   # Gmail allows 100 per batch; 50 avoids per-user rate limits
+
+
+def _headers(msg: dict) -> dict[str, str]:
+    return {
+        h["name"].lower(): h["value"]
+        for h in msg.get("payload", {}).get("headers", [])
+    }
+
+
+def _fetch_metadata(service, msg_ids: list[str], user_id: Optional[int] = None) -> dict[str, dict]:
+    """
+    Subject/From/Date headers + snippet for msg_ids, one batch request per chunk.
+    Items that fail with a retryable error (429/5xx) are retried with backoff;
+    anything still missing is left out and picked up by the next sync.
+    """
+    found: dict[str, dict] = {}
+    retry: list[str] = []
+
+    def on_response(request_id, response, exception):
+        if exception is None:
+            found[request_id] = response
+        elif rate_limit.is_retryable(exception):
+            retry.append(request_id)
+        else:
+            logger.error("Failed to fetch metadata for %s: %s", request_id, exception)
+
+    pending = list(msg_ids)
+    for attempt in range(rate_limit.MAX_ATTEMPTS):
+        for start in range(0, len(pending), METADATA_BATCH_SIZE):
+            chunk = pending[start:start + METADATA_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=on_response)
+            for msg_id in chunk:
+                batch.add(
+                    service.users().messages().get(
+                        userId="me", id=msg_id, format="metadata",
+                        metadataHeaders=["From", "Subject", "Date"],
+                    ),
+                    request_id=msg_id,
+                )
+            rate_limit.call_with_retry(
+                batch.execute, "gmail", cost=rate_limit.GMAIL_COST_GET * len(chunk), key=user_id,
+            )
+        if not retry:
+            break
+        pending, retry = retry, []
+        if attempt < rate_limit.MAX_ATTEMPTS - 1:
+            delay = rate_limit.backoff_delay(attempt)
+            logger.warning("Retrying metadata for %d message(s) in %.1fs", len(pending), delay)
+            time.sleep(delay)
+    else:
+        logger.warning("Gave up on metadata for %d message(s) this sync", len(pending))
+    return found
+
+
 def fetch_bank_emails(
     credentials: Credentials,
     days_back: int = 7,
+    exclude_ids: Optional[set[str]] = None,
+    user_id: Optional[int] = None,
+    service=None,
+    query: Optional[str] = None,
+    page_token: Optional[str] = None,
+    is_processed: Optional[Callable[[list[str]], set[str]]] = None,
+    on_page: Optional[Callable[[Optional[str], list[str]], None]] = None,
 ) -> Generator[dict, None, None]:
-
-    service = build("gmail", "v1", credentials=credentials)
-    query   = _build_query(days_back)
+    """
+    Yield bank emails newer than days_back, skipping exclude_ids (already processed).
+
+    Each page of results is triaged on metadata first (services.email_triage):
+    transactional messages are downloaded in full and carry a "body";
+    non-transactional ones are yielded with transactional=False and no body so
+    the caller can mark them processed without extracting.
+
+    Gmail calls are paced by the per-user quota bucket in services.rate_limit
+    (keyed by user_id). Pass a cached Gmail `service` to skip building a new
+    client (auth.get_user_gmail_service). A message whose download fails is not yielded, so it
+    is never marked processed and is retried on the next sync.
+
+    Checkpointing (sync_job.run_backfill, continued by resume_backfills; a
+    page with failed emails raises _PageIncomplete there): `query` replaces
+    the days_back query, listing starts at `page_token`, `is_processed(ids)`
+    returns the already-processed subset of each page instead of a preloaded
+    exclude_ids set, and
+    `on_page(next_page_token, failed_ids)` runs once every email of a page
+    has been consumed — None after the last page — with the ids of the page
+    that were not yielded (metadata or download failed). If the consumer
+    stops early, on_page is not called for the page in progress.
+    """
+    if service is None:
+        service = build("gmail", "v1", credentials=credentials)
+    query   = query or _build_query(days_back)
     logger.info("Gmail query: %s", query)
+    exclude_ids = exclude_ids or set()
 
-    page_token = None
-    total = 0
+    total = triaged_out = 0
 
     while True:
         kwargs: dict = {"userId": "me", "q": query, "maxResults": 100}
         if page_token:
             kwargs["pageToken"] = page_token
 
-        response  = service.users().messages().list(**kwargs).execute()
-        messages  = response.get("messages", [])
-
-        for msg_ref in messages:
-            msg_id: str = msg_ref["id"]
+        with sync_stage("gmail_list"):
+            response = rate_limit.call_with_retry(
+                service.users().messages().list(**kwargs).execute,
+                "gmail", cost=rate_limit.GMAIL_COST_LIST, key=user_id,
+            )
+        listed    = response.get("messages", [])
+        if is_processed is not None:
+            exclude_ids = is_processed([m["id"] for m in listed]) if listed else set()
+        msg_ids   = [m["id"] for m in listed if m["id"] not in exclude_ids]
+        count_for_run("emails_listed", len(listed))
+        count_for_run("emails_already_processed", len(listed) - len(msg_ids))
+        metadata  = {}
+        if msg_ids:
+            with sync_stage("gmail_metadata"):
+                metadata = _fetch_metadata(service, msg_ids, user_id)
+
+        failed: list[str] = []
+        for msg_id in msg_ids:
+            meta = metadata.get(msg_id)
+            if meta is None:
+                failed.append(msg_id)
+                continue    # retried on the next sync — not marked processed
+            headers = _headers(meta)
+            email = {
+                "id":      msg_id,
+                "from":    headers.get("from", ""),
+                "subject": headers.get("subject", ""),
+                "date":    headers.get("date", ""),
+                "snippet": meta.get("snippet", ""),
+            }
+            email["transactional"], email["triage_reason"] = classify(
+                email["from"], email["subject"], email["snippet"],
+            )
+            total += 1
+            if not email["transactional"]:
+                triaged_out += 1
+                yield email
+                continue
             try:
-                msg = service.users().messages().get(
-                    userId="me", id=msg_id, format="full"
-                ).execute()
-                headers = {
-                    h["name"].lower(): h["value"]
-                    for h in msg.get("payload", {}).get("headers", [])
-                }
-                body = _decode_body(msg.get("payload", {}))
-                total += 1
-                yield {
-                    "id":      msg_id,
-                    "from":    headers.get("from", ""),
-                    "subject": headers.get("subject", ""),
-                    "date":    headers.get("date", ""),
-                    "body":    body,
-                }
+                with sync_stage("gmail_get"):
+                    msg = rate_limit.call_with_retry(
+                        service.users().messages().get(userId="me", id=msg_id, format="full").execute,
+                        "gmail", cost=rate_limit.GMAIL_COST_GET, key=user_id,
+                    )
+                with sync_stage("decode"):
+                    email["body"] = _decode_body(msg.get("payload", {}))
             except Exception as exc:
                 logger.error("Failed to fetch message %s: %s", msg_id, exc)
+                failed.append(msg_id)
+                continue
+            yield email
 
         page_token = response.get("nextPageToken")
+        if on_page is not None:
+            on_page(page_token, failed)
         if not page_token:
             break
 
-    logger.info("Fetched %d bank emails total", total)
+    logger.info("Fetched %d bank emails total (%d non-transactional, not downloaded)", total, triaged_out)
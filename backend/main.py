@@ -1,19 +1,28 @@
 """FastAPI application entry point."""
 import logging
 import os
+import sys
+import time
 from contextlib import asynccontextmanager
+from datetime import datetime
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException
-from pydantic import BaseModel, Field as PydanticField
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-from auth import get_current_user, router as auth_router
-from database import create_db_and_tables
-from models import User
-from routers import budgets, dashboard, transactions
-import sync_job
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+
+from auth import require_metrics_token, router as auth_router
+from database import create_db_and_tables, engine
+from migrate import run_migrations
+from routers import budgets, dashboard, events, profiling, reports, sync, transactions
+from services import metrics
+from services.dashboard_cache import dashboard_cache
+from services.profiling import ProfilingMiddleware
+from services.fx_rates import refresh_daily_rates
+from services.merchants import rebuild_mapping as rebuild_merchant_mapping
+from services.partitions import maintain_partitions
+from services.sync_schedule import SYNC_TICK_S
 
 load_dotenv()
 
@@ -24,23 +33,60 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+# Set to false on replicas that only serve requests (autoscaled/serverless);
+# one process with the scheduler is enough.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() not in ("0", "false", "no")
+# How often paused/interrupted backfills are continued (sync_job.resume_backfills)
+BACKFILL_RESUME_MINUTES = int(os.getenv("BACKFILL_RESUME_MINUTES", "5"))
+
+
+def _run_due_syncs() -> None:
+    import sync_job   # Gmail/Anthropic clients: loaded on the first scheduled run
+
+    with metrics.SYNC_CYCLE.time():
+        sync_job.run_due_syncs()
+    metrics.SYNC_CYCLE_LAST.set(time.time())
+
 
-scheduler = BackgroundScheduler()
+def _resume_backfills() -> None:
+    import sync_job
+
+    sync_job.resume_backfills()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     logger.info("Database tables created/verified")
-
-    scheduler.add_job(sync_job.run_sync_all_users, "interval", hours=6, id="sync_all")
-    scheduler.start()
-    logger.info("APScheduler started — syncing all users every 6 hours")
+    run_migrations()
+
+    scheduler = None
+    if SCHEDULER_ENABLED:
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        scheduler = BackgroundScheduler()
+        # Per-user adaptive schedule (services/sync_schedule.py); a tick only syncs who is due
+        scheduler.add_job(_run_due_syncs, "interval", seconds=SYNC_TICK_S, id="sync_due")
+        scheduler.add_job(_resume_backfills, "interval", minutes=BACKFILL_RESUME_MINUTES,
+                          id="backfills")
+        # One rate per tracked pair per day builds the history behind fx=historical
+        scheduler.add_job(refresh_daily_rates, "interval", hours=24, id="fx_daily",
+                          next_run_time=datetime.now())
+        # Seed merchants and map unmapped rows — all of them after migrations/0011
+        scheduler.add_job(rebuild_merchant_mapping, id="merchants", next_run_time=datetime.now())
+        # Upcoming month partitions + processedemail retention (migrations/0007)
+        scheduler.add_job(maintain_partitions, "interval", hours=24, id="partitions",
+                          next_run_time=datetime.now())
+        scheduler.start()
+        logger.info("APScheduler started — checking for due user syncs every %ds", SYNC_TICK_S)
 
     yield
 
-    scheduler.shutdown(wait=False)
-    logger.info("APScheduler stopped")
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        if "sync_job" in sys.modules:   # only imported once a tick has run
+            sys.modules["sync_job"].shutdown_scheduled_syncs()
+        logger.info("APScheduler stopped")
 
 
 app = FastAPI(title="Budget Tracker API", version="2.0.0", lifespan=lifespan)
@@ -53,10 +99,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress any other large response; routes using fast_json_response set
+# Content-Encoding themselves and are passed through untouched.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Opt-in per request with X-Profile-Token (PROFILE_TOKEN); see services/profiling.py
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so latency includes compression; see services/metrics.py
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
 app.include_router(auth_router)
 app.include_router(transactions.router)
 app.include_router(budgets.router)
 app.include_router(dashboard.router)
+app.include_router(reports.router)
+app.include_router(sync.router)
+app.include_router(profiling.router)
+app.include_router(events.router)
 
 
 @app.get("/health")
@@ -64,16 +125,15 @@ def health():
     return {"status": "ok", "version": "2.0.0"}
 
 
-class SyncRequest(BaseModel):
-    days_back: int = PydanticField(default=7, ge=1, le=180)
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def metrics_endpoint():
+    """Prometheus scrape target (text exposition format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
-@app.post("/api/sync")
-def trigger_sync(
-    current_user: User = Depends(get_current_user),
-    body: SyncRequest = None,
-):
-    """Manually trigger a sync for the authenticated user (runs synchronously)."""
-    req = body or SyncRequest()
-    result = sync_job.run_sync_for_user(current_user, req.days_back)
-    return result
+@app.get("/api/dashboard/cache-stats", include_in_schema=False,
+         dependencies=[Depends(require_metrics_token)])
+def dashboard_cache_stats():
+    """Dashboard result cache counters (entries, hit ratio, evictions) of this
+    process. Operator-only, like /metrics."""
+    return dashboard_cache.stats()
@@ -0,0 +1,207 @@
+"""
+Minimal forward-only SQL migrations for the Postgres (Supabase) database.
+
+Migrations are plain SQL files in migrations/ named NNNN_description.sql and
+are applied in filename order, each in its own transaction. Applied versions
+are recorded in the schema_migrations table. A Postgres advisory lock keeps
+several API workers starting at once from applying the same file twice.
+
+create_all() (database.create_db_and_tables) still bootstraps a fresh database
+from models.py; migrations evolve existing databases. Keep the two in sync —
+any index added in a migration should also be declared on the model.
+
+Migrations are Postgres-only. On SQLite (local dev default) they are skipped
+and the schema comes from create_all alone.
+
+Usage (from backend/):
+    python migrate.py              # apply pending migrations
+    python migrate.py --status     # list applied / pending
+    python migrate.py --explain    # EXPLAIN the hot queries, fail if an index is not used
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+_LOCK_ID = 727_001   # arbitrary, app-wide advisory lock key for migrations
+
+
+def _migration_files() -> list[Path]:
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.sql"))
+
+
+def _is_postgres(eng: Engine) -> bool:
+    return eng.dialect.name == "postgresql"
+
+
+def _ensure_table(conn) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "  version    text PRIMARY KEY,"
+        "  applied_at timestamptz NOT NULL DEFAULT now()"
+        ")"
+    ))
+
+
+def _applied_versions(conn) -> set[str]:
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(eng: Engine = engine) -> list[str]:
+    """Apply every pending migration. Returns the versions applied this call."""
+    if not _is_postgres(eng):
+        logger.info("Migrations skipped — %s database (schema comes from create_all)", eng.dialect.name)
+        return []
+
+    applied_now: list[str] = []
+    with eng.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_ID})
+        conn.commit()   # session-level lock outlives this transaction
+        try:
+            with conn.begin():
+                _ensure_table(conn)
+                done = _applied_versions(conn)
+
+            for path in _migration_files():
+                version = path.stem
+                if version in done:
+                    continue
+                logger.info("Applying migration %s", version)
+                # Sent as-is: multi-statement, $$ bodies, and no_parameters so the
+                # driver doesn't treat literal '%' as a placeholder.
+                with conn.begin():
+                    conn.exec_driver_sql(path.read_text(), execution_options={"no_parameters": True})
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version) VALUES (:v)"),
+                        {"v": version},
+                    )
+                applied_now.append(version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_ID})
+            conn.commit()
+
+    if applied_now:
+        logger.info("Applied %d migration(s): %s", len(applied_now), ", ".join(applied_now))
+    return applied_now
+
+
+def migration_status(eng: Engine = engine) -> list[dict]:
+    done: set[str] = set()
+    if _is_postgres(eng):
+        with eng.begin() as conn:
+            _ensure_table(conn)
+            done = _applied_versions(conn)
+    return [{"version": p.stem, "applied": p.stem in done} for p in _migration_files()]
+
+
+# ── EXPLAIN checks ────────────────────────────────────────────────────────────
+# Each hot query is paired with the index it must be able to use. Checks run with
+# enable_seqscan=off: on small dev/staging tables the planner rightly prefers a
+# seq scan, so this proves the index *matches the query shape*, which is what
+# regresses when a query or index changes.
+HOT_QUERIES: list[tuple[str, str, str]] = [
+    (
+        "dashboard month range (dashboard._fetch_month_transactions)",
+        "SELECT date, amount, currency, category FROM transaction "
+        "WHERE user_id = 1 AND date >= '2024-01-01' AND date < '2024-02-01'",
+        "ix_transaction_user_id_date",
+    ),
+    (
+        "transaction list ordered by date desc, id desc",
+        "SELECT * FROM transaction WHERE user_id = 1 "
+        "AND date >= '2024-01-01' AND date < '2025-01-01' ORDER BY date DESC, id DESC",
+        "ix_transaction_user_id_date",
+    ),
+    (
+        "sync dedupe lookup (sync_job)",
+        "SELECT id FROM processedemail WHERE user_id = 1 AND email_id = '18c0000000000000' LIMIT 1",
+        "ix_processedemail_user_id_email_id",
+    ),
+    (
+        "latest exchange rate (services.exchange_rate)",
+        "SELECT * FROM exchangerate WHERE from_currency = 'PEN' AND to_currency = 'USD' "
+        "ORDER BY fetched_at DESC LIMIT 1",
+        "ix_exchangerate_pair_fetched_at",
+    ),
+]
+
+
+def _plan_indexes(node: dict) -> set[str]:
+    found = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def _parent_indexes(conn, names: set[str]) -> set[str]:
+    """Map partition-level index names to the partitioned index they belong to
+    (transaction/processedemail are partitioned by migrations/0007)."""
+    if not names:
+        return names
+    parents = dict(conn.execute(text(
+        "SELECT child.relname, parent.relname FROM pg_inherits i "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "WHERE child.relkind = 'i' AND child.relname = ANY(:names)"
+    ), {"names": list(names)}).all())
+    return {parents.get(n, n) for n in names}
+
+
+def explain_hot_queries(eng: Engine = engine) -> list[dict]:
+    """EXPLAIN each hot query and report whether its expected index is used."""
+    if not _is_postgres(eng):
+        raise RuntimeError("EXPLAIN checks need Postgres — set DATABASE_URL")
+
+    results = []
+    with eng.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, sql, expected in HOT_QUERIES:
+                raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                used = _parent_indexes(conn, _plan_indexes(plan))
+                results.append({
+                    "query":    name,
+                    "expected": expected,
+                    "used":     sorted(used),
+                    "ok":       expected in used,
+                })
+    return results
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Apply or inspect SQL migrations.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    group.add_argument("--explain", action="store_true", help="check hot queries use their indexes")
+    args = parser.parse_args()
+
+    if args.status:
+        for m in migration_status():
+            print(f"{'applied' if m['applied'] else 'pending':<8} {m['version']}")
+        return 0
+
+    if args.explain:
+        failed = 0
+        for r in explain_hot_queries():
+            mark = "OK  " if r["ok"] else "FAIL"
+            print(f"{mark} {r['query']}\n     expected {r['expected']}, plan uses {r['used'] or 'no index'}")
+            failed += not r["ok"]
+        return 1 if failed else 0
+
+    run_migrations()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+-- 0001 — Indexed full-text + fuzzy search over transaction description/bank.
+--
+-- Backs GET /api/transactions?q=... (routers/transactions.py → rpc search_transactions).
+-- Uses expression indexes instead of a generated column so `select("*")` keeps
+-- returning exactly the columns in TransactionRead.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Full-text (prefix) matching: to_tsvector with an explicit config is IMMUTABLE,
+-- so it can be indexed directly. The 'simple' config avoids stemming merchant names.
+CREATE INDEX IF NOT EXISTS ix_transaction_search_tsv
+    ON public.transaction
+    USING gin (to_tsvector('simple', description || ' ' || bank));
+
+-- Fuzzy matching (typos, "WONG.PE" vs "WONG"): word_similarity via <% uses this index.
+CREATE INDEX IF NOT EXISTS ix_transaction_search_trgm
+    ON public.transaction
+    USING gin ((description || ' ' || bank) gin_trgm_ops);
+
+-- Lets the existing `bank=` filter (ilike '%...%') use an index too.
+CREATE INDEX IF NOT EXISTS ix_transaction_bank_trgm
+    ON public.transaction
+    USING gin (bank gin_trgm_ops);
+
+-- SECURITY INVOKER so the user_isolation RLS policy still applies; the explicit
+-- user_id predicate lets the planner combine it with the user_id index.
+CREATE OR REPLACE FUNCTION public.search_transactions(
+    q               text,
+    prefix_query    text,
+    date_from       date    DEFAULT NULL,
+    date_to         date    DEFAULT NULL,
+    category_filter text    DEFAULT NULL,
+    bank_filter     text    DEFAULT NULL,
+    result_limit    integer DEFAULT 50,
+    result_offset   integer DEFAULT 0
+)
+RETURNS TABLE (
+    id          integer,
+    date        date,
+    description text,
+    amount      double precision,
+    currency    text,
+    category    text,
+    bank        text,
+    email_id    text,
+    created_at  timestamp,
+    rank        real
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT t.id, t.date, t.description::text, t.amount, t.currency::text,
+           t.category::text, t.bank::text, t.email_id::text, t.created_at,
+           (ts_rank(to_tsvector('simple', t.description || ' ' || t.bank),
+                    to_tsquery('simple', prefix_query))
+            + word_similarity(q, t.description || ' ' || t.bank))::real AS rank
+    FROM public.transaction t
+    WHERE t.user_id = current_setting('app.current_user_id')::bigint
+      AND (to_tsvector('simple', t.description || ' ' || t.bank)
+               @@ to_tsquery('simple', prefix_query)
+           OR q <% (t.description || ' ' || t.bank))
+      AND (date_from IS NULL OR t.date >= date_from)
+      AND (date_to IS NULL OR t.date < date_to)
+      AND (category_filter IS NULL OR t.category = category_filter)
+      AND (bank_filter IS NULL OR t.bank ILIKE '%' || bank_filter || '%')
+    ORDER BY rank DESC, t.date DESC, t.id DESC
+    LIMIT result_limit OFFSET result_offset;
+$$;
@@ -0,0 +1,32 @@
+-- 0002 — Composite indexes shaped after the hot queries.
+--
+--   transaction     date-range scans per user (dashboard._fetch_month_transactions,
+--                   list_transactions ORDER BY date DESC, id DESC)
+--   processedemail  (user_id, email_id) dedupe lookup in sync_job — now UNIQUE
+--   exchangerate    latest rate per pair (ORDER BY fetched_at DESC LIMIT 1)
+--
+-- Verify with: python migrate.py --explain
+
+-- Duplicate ProcessedEmail rows can exist from overlapping manual + scheduled
+-- syncs; keep the oldest so the unique index can be built.
+DELETE FROM public.processedemail p
+USING public.processedemail older
+WHERE p.user_id = older.user_id
+  AND p.email_id = older.email_id
+  AND p.id > older.id;
+
+CREATE INDEX IF NOT EXISTS ix_transaction_user_id_date
+    ON public.transaction (user_id, date, id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_processedemail_user_id_email_id
+    ON public.processedemail (user_id, email_id);
+
+CREATE INDEX IF NOT EXISTS ix_exchangerate_pair_fetched_at
+    ON public.exchangerate (from_currency, to_currency, fetched_at DESC);
+
+-- Single-column indexes made redundant by the composites above.
+DROP INDEX IF EXISTS public.ix_transaction_user_id;
+DROP INDEX IF EXISTS public.ix_processedemail_user_id;
+DROP INDEX IF EXISTS public.ix_processedemail_email_id;
+DROP INDEX IF EXISTS public.ix_exchangerate_from_currency;
+DROP INDEX IF EXISTS public.ix_exchangerate_to_currency;
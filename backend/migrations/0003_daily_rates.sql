@@ -0,0 +1,23 @@
+-- 0003 — Historical, date-indexed FX rates (services/fx_rates.py).
+--
+-- One row per (from, to, day). Backfilled from exchangerate, keeping the last
+-- fetch of each day, so months already on record keep the rate they had.
+
+CREATE TABLE IF NOT EXISTS public.dailyrate (
+    id            serial PRIMARY KEY,
+    from_currency varchar NOT NULL,
+    to_currency   varchar NOT NULL,
+    rate_date     date NOT NULL,
+    rate          double precision NOT NULL,
+    fetched_at    timestamp NOT NULL DEFAULT now()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dailyrate_pair_date
+    ON public.dailyrate (from_currency, to_currency, rate_date);
+
+INSERT INTO public.dailyrate (from_currency, to_currency, rate_date, rate, fetched_at)
+SELECT DISTINCT ON (from_currency, to_currency, fetched_at::date)
+       from_currency, to_currency, fetched_at::date, rate, fetched_at
+FROM public.exchangerate
+ORDER BY from_currency, to_currency, fetched_at::date, fetched_at DESC
+ON CONFLICT (from_currency, to_currency, rate_date) DO NOTHING;
@@ -0,0 +1,89 @@
+-- 0004 — Canonical merchants and trigger-maintained per-merchant monthly stats.
+--
+-- merchant / merchantalias are global (no user data) and written only by the
+-- backend (services/merchants.py). merchantstat is per user and is kept in
+-- step with transaction by the trigger below, so GET /api/dashboard/top-merchants
+-- reads a few aggregate rows instead of scanning transactions.
+--
+-- After applying, map existing rows with: python -m services.merchants --backfill
+
+CREATE TABLE IF NOT EXISTS public.merchant (
+    id         serial PRIMARY KEY,
+    name       varchar NOT NULL,
+    key        varchar NOT NULL UNIQUE,
+    created_at timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.merchantalias (
+    id          serial PRIMARY KEY,
+    key         varchar NOT NULL UNIQUE,
+    merchant_id integer NOT NULL REFERENCES public.merchant (id)
+);
+CREATE INDEX IF NOT EXISTS ix_merchantalias_merchant_id ON public.merchantalias (merchant_id);
+
+ALTER TABLE public.transaction
+    ADD COLUMN IF NOT EXISTS merchant_id integer REFERENCES public.merchant (id);
+
+CREATE TABLE IF NOT EXISTS public.merchantstat (
+    id          serial PRIMARY KEY,
+    user_id     integer NOT NULL REFERENCES public."user" (id),
+    merchant_id integer NOT NULL REFERENCES public.merchant (id),
+    month       date NOT NULL,
+    currency    varchar NOT NULL,
+    txn_count   integer NOT NULL DEFAULT 0,
+    spent       double precision NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_merchantstat_user_merchant_month_currency
+    ON public.merchantstat (user_id, merchant_id, month, currency);
+CREATE INDEX IF NOT EXISTS ix_merchantstat_user_month
+    ON public.merchantstat (user_id, month);
+
+ALTER TABLE public.merchantstat ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.merchantstat;
+CREATE POLICY "user_isolation" ON public.merchantstat
+    USING (user_id = current_setting('app.current_user_id')::bigint);
+
+-- Keeps merchantstat in step with expense rows (amount < 0) that have a merchant.
+-- SECURITY DEFINER: the trigger must write stats regardless of the caller's RLS scope.
+CREATE OR REPLACE FUNCTION public.merchantstat_apply(
+    p_user bigint, p_merchant integer, p_date date, p_currency text,
+    p_amount double precision, p_sign integer
+) RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO public.merchantstat AS s (user_id, merchant_id, month, currency, txn_count, spent)
+    VALUES (p_user, p_merchant, date_trunc('month', p_date)::date, p_currency,
+            p_sign, p_sign * abs(p_amount))
+    ON CONFLICT (user_id, merchant_id, month, currency)
+    DO UPDATE SET txn_count = s.txn_count + EXCLUDED.txn_count,
+                  spent     = s.spent + EXCLUDED.spent;
+$$;
+
+CREATE OR REPLACE FUNCTION public.transaction_merchantstat() RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.merchant_id IS NOT NULL AND OLD.amount < 0 THEN
+        PERFORM merchantstat_apply(OLD.user_id, OLD.merchant_id, OLD.date, OLD.currency, OLD.amount, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.merchant_id IS NOT NULL AND NEW.amount < 0 THEN
+        PERFORM merchantstat_apply(NEW.user_id, NEW.merchant_id, NEW.date, NEW.currency, NEW.amount, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transaction_merchantstat ON public.transaction;
+CREATE TRIGGER trg_transaction_merchantstat
+    AFTER INSERT OR DELETE ON public.transaction
+    FOR EACH ROW EXECUTE FUNCTION public.transaction_merchantstat();
+
+-- Category/description-only edits don't touch the stats
+DROP TRIGGER IF EXISTS trg_transaction_merchantstat_update ON public.transaction;
+CREATE TRIGGER trg_transaction_merchantstat_update
+    AFTER UPDATE OF merchant_id, amount, date, currency ON public.transaction
+    FOR EACH ROW EXECUTE FUNCTION public.transaction_merchantstat();
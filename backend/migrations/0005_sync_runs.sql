@@ -0,0 +1,81 @@
+-- 0005 — Sync run history (models.SyncRun), written by sync_job after every
+-- run_sync_for_user. Users read their own rows through RLS
+-- (GET /api/sync/runs); fleet-wide percentiles come from
+-- sync_run_percentiles(), which returns aggregates only (operator-only:
+-- EXECUTE is revoked from end-user roles in migrations/0013).
+
+CREATE TABLE IF NOT EXISTS public.syncrun (
+    id                 serial PRIMARY KEY,
+    user_id            integer NOT NULL REFERENCES public."user" (id),
+    started_at         timestamp NOT NULL,
+    finished_at        timestamp NOT NULL,
+    duration_s         double precision NOT NULL DEFAULT 0,
+    status             varchar NOT NULL DEFAULT 'ok',
+    days_back          integer NOT NULL DEFAULT 7,
+    emails_listed      integer NOT NULL DEFAULT 0,
+    emails_skipped     integer NOT NULL DEFAULT 0,
+    emails_triaged_out integer NOT NULL DEFAULT 0,
+    emails_processed   integer NOT NULL DEFAULT 0,
+    emails_deferred    integer NOT NULL DEFAULT 0,
+    transactions_added integer NOT NULL DEFAULT 0,
+    errors             integer NOT NULL DEFAULT 0,
+    retries            integer NOT NULL DEFAULT 0,
+    tokens_input       integer NOT NULL DEFAULT 0,
+    tokens_output      integer NOT NULL DEFAULT 0,
+    stage_seconds      json NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS ix_syncrun_user_started ON public.syncrun (user_id, started_at);
+CREATE INDEX IF NOT EXISTS ix_syncrun_started ON public.syncrun (started_at);
+
+ALTER TABLE public.syncrun ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.syncrun;
+CREATE POLICY "user_isolation" ON public.syncrun
+    USING (user_id = current_setting('app.current_user_id')::bigint);
+
+-- p50/p95/p99 over every user's runs since `since`.
+-- SECURITY DEFINER: must see all rows; returns no per-user data.
+CREATE OR REPLACE FUNCTION public.sync_run_percentiles(since timestamp)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH runs AS (
+        SELECT * FROM syncrun WHERE started_at >= since
+    ),
+    stages AS (
+        SELECT s.key AS stage,
+               jsonb_build_object(
+                   'p50', percentile_cont(0.50) WITHIN GROUP (ORDER BY s.value::float8),
+                   'p95', percentile_cont(0.95) WITHIN GROUP (ORDER BY s.value::float8),
+                   'p99', percentile_cont(0.99) WITHIN GROUP (ORDER BY s.value::float8)
+               ) AS pct
+        FROM runs, json_each_text(runs.stage_seconds) AS s
+        GROUP BY s.key
+    )
+    SELECT jsonb_build_object(
+        'since',      since,
+        'runs',       count(*),
+        'users',      count(DISTINCT user_id),
+        'error_rate', coalesce(avg((errors > 0)::int), 0),
+        'duration_s', jsonb_build_object(
+            'p50', percentile_cont(0.50) WITHIN GROUP (ORDER BY duration_s),
+            'p95', percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_s),
+            'p99', percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_s)),
+        'emails_listed', jsonb_build_object(
+            'p50', percentile_cont(0.50) WITHIN GROUP (ORDER BY emails_listed),
+            'p95', percentile_cont(0.95) WITHIN GROUP (ORDER BY emails_listed),
+            'p99', percentile_cont(0.99) WITHIN GROUP (ORDER BY emails_listed)),
+        'tokens_input', jsonb_build_object(
+            'p50', percentile_cont(0.50) WITHIN GROUP (ORDER BY tokens_input),
+            'p95', percentile_cont(0.95) WITHIN GROUP (ORDER BY tokens_input),
+            'p99', percentile_cont(0.99) WITHIN GROUP (ORDER BY tokens_input)),
+        'retries', jsonb_build_object(
+            'p50', percentile_cont(0.50) WITHIN GROUP (ORDER BY retries),
+            'p95', percentile_cont(0.95) WITHIN GROUP (ORDER BY retries),
+            'p99', percentile_cont(0.99) WITHIN GROUP (ORDER BY retries)),
+        'stages', coalesce((SELECT jsonb_object_agg(stage, pct) FROM stages), '{}'::jsonb)
+    )
+    FROM runs;
+$$;
@@ -0,0 +1,20 @@
+-- 0006 — Role for the direct read path (postgres_client.py, DATA_BACKEND=postgres).
+-- Each read runs `SET LOCAL ROLE budget_reader` before its query, so the
+-- "user_isolation" RLS policies apply even though the pooled connection logs
+-- in as the service user. NOLOGIN: it is only ever switched to, never used
+-- to connect.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'budget_reader') THEN
+        CREATE ROLE budget_reader NOLOGIN NOBYPASSRLS;
+    END IF;
+END
+$$;
+
+-- The connecting user must be a member to SET ROLE to it
+GRANT budget_reader TO CURRENT_USER;
+
+GRANT USAGE ON SCHEMA public TO budget_reader;
+GRANT SELECT ON public."transaction", public.budget, public.merchantstat, public.merchant
+    TO budget_reader;
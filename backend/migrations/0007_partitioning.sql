@@ -0,0 +1,182 @@
+-- 0007 — Monthly range partitions: transaction by date, processedemail by
+-- processed_at. Dashboard date-range queries prune to the months they ask
+-- for, and processedemail is kept to the sync window by dropping whole
+-- months (services/partitions.py runs daily: creates upcoming months, drops
+-- expired processedemail months, deletes stragglers).
+--
+-- Partitions are named <table>_YYYY_MM; rows outside every month partition
+-- land in <table>_default and are moved out when their month is created.
+-- Partitions get RLS enabled with no policy, so they are unreadable except
+-- through the parent, whose user_isolation policy applies.
+--
+-- Every unique index must include the partition key, so:
+--   transaction     PRIMARY KEY (id, date) — ids still come from the same sequence
+--   processedemail  PRIMARY KEY (id, processed_at), and (user_id, email_id) is
+--                   no longer UNIQUE here; migrations/0012 enforces it through
+--                   the unpartitioned processedemail_key table.
+-- models.py keeps the plain tables, so a fresh database gets create_all's
+-- schema first and this migration converts it at the same startup.
+
+-- ── Partition management ─────────────────────────────────────────────────────
+
+-- Create the missing month partitions of parent between from_month and
+-- to_month (inclusive). Returns how many were created.
+CREATE OR REPLACE FUNCTION public.ensure_month_partitions(
+    parent text, key_col text, from_month date, to_month date
+) RETURNS integer
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    month_start date := date_trunc('month', from_month)::date;
+    month_end   date;
+    part        text;
+    created     integer := 0;
+BEGIN
+    WHILE month_start <= to_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        part := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(format('public.%I', part)) IS NULL THEN
+            -- The default partition may not hold rows of the new range, so
+            -- they go out and back in through the parent: a delete plus an
+            -- insert, which keeps row triggers (merchantstat) balanced.
+            EXECUTE format('CREATE TEMP TABLE _partition_moving (LIKE public.%I)', parent);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.%I WHERE %I >= %L AND %I < %L RETURNING *) '
+                'INSERT INTO _partition_moving SELECT * FROM moved',
+                parent || '_default', key_col, month_start, key_col, month_end);
+            EXECUTE format('CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                           part, parent, month_start, month_end);
+            EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', part);
+            EXECUTE format('INSERT INTO public.%I SELECT * FROM _partition_moving', parent);
+            DROP TABLE _partition_moving;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Drop the month partitions of parent that end on or before cutoff.
+-- Returns how many were dropped. Retention only: transaction is never pruned.
+CREATE OR REPLACE FUNCTION public.drop_month_partitions_before(
+    parent text, cutoff date
+) RETURNS integer
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    part    record;
+    dropped integer := 0;
+BEGIN
+    IF parent = 'transaction' THEN
+        RAISE EXCEPTION 'transaction partitions are never dropped';
+    END IF;
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = format('public.%I', parent)::regclass
+          AND c.relname ~ ('^' || parent || '_\d{4}_\d{2}$')
+    LOOP
+        IF (to_date(right(part.relname, 7), 'YYYY_MM') + interval '1 month')::date <= cutoff THEN
+            EXECUTE format('DROP TABLE public.%I', part.relname);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN dropped;
+END;
+$$;
+
+-- ── transaction ──────────────────────────────────────────────────────────────
+
+ALTER TABLE public."transaction" RENAME TO transaction_unpartitioned;
+-- Frees the name for the new table's primary key
+ALTER TABLE public.transaction_unpartitioned RENAME CONSTRAINT transaction_pkey TO transaction_unpartitioned_pkey;
+ALTER SEQUENCE public.transaction_id_seq OWNED BY NONE;
+
+CREATE TABLE public."transaction" (
+    LIKE public.transaction_unpartitioned INCLUDING DEFAULTS,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+ALTER SEQUENCE public.transaction_id_seq OWNED BY public."transaction".id;
+
+CREATE TABLE public.transaction_default PARTITION OF public."transaction" DEFAULT;
+ALTER TABLE public.transaction_default ENABLE ROW LEVEL SECURITY;
+
+-- Five years back is plenty of monthly partitions; anything older stays in default
+SELECT public.ensure_month_partitions(
+    'transaction', 'date',
+    GREATEST(COALESCE((SELECT min(date) FROM public.transaction_unpartitioned), current_date),
+             (current_date - interval '5 years')::date),
+    (current_date + interval '3 months')::date);
+
+-- Copied before the merchantstat triggers exist: the stats already count these rows
+INSERT INTO public."transaction" SELECT * FROM public.transaction_unpartitioned;
+DROP TABLE public.transaction_unpartitioned;
+
+ALTER TABLE public."transaction"
+    ADD FOREIGN KEY (user_id) REFERENCES public."user" (id),
+    ADD FOREIGN KEY (merchant_id) REFERENCES public.merchant (id);
+
+-- Same names as before (models.py, 0001, 0002); created per partition
+CREATE INDEX ix_transaction_user_id_date ON public."transaction" (user_id, date, id);
+CREATE INDEX ix_transaction_email_id ON public."transaction" (email_id);
+CREATE INDEX ix_transaction_search_tsv
+    ON public."transaction"
+    USING gin (to_tsvector('simple', description || ' ' || bank));
+CREATE INDEX ix_transaction_search_trgm
+    ON public."transaction"
+    USING gin ((description || ' ' || bank) gin_trgm_ops);
+CREATE INDEX ix_transaction_bank_trgm
+    ON public."transaction"
+    USING gin (bank gin_trgm_ops);
+
+CREATE TRIGGER trg_transaction_merchantstat
+    AFTER INSERT OR DELETE ON public."transaction"
+    FOR EACH ROW EXECUTE FUNCTION public.transaction_merchantstat();
+CREATE TRIGGER trg_transaction_merchantstat_update
+    AFTER UPDATE OF merchant_id, amount, date, currency ON public."transaction"
+    FOR EACH ROW EXECUTE FUNCTION public.transaction_merchantstat();
+
+ALTER TABLE public."transaction" ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "user_isolation" ON public."transaction"
+    USING (user_id = current_setting('app.current_user_id')::bigint)
+    WITH CHECK (user_id = current_setting('app.current_user_id')::bigint);
+GRANT SELECT ON public."transaction" TO budget_reader;
+
+-- ── processedemail ───────────────────────────────────────────────────────────
+
+ALTER TABLE public.processedemail RENAME TO processedemail_unpartitioned;
+ALTER TABLE public.processedemail_unpartitioned RENAME CONSTRAINT processedemail_pkey TO processedemail_unpartitioned_pkey;
+ALTER SEQUENCE public.processedemail_id_seq OWNED BY NONE;
+
+CREATE TABLE public.processedemail (
+    LIKE public.processedemail_unpartitioned INCLUDING DEFAULTS,
+    PRIMARY KEY (id, processed_at)
+) PARTITION BY RANGE (processed_at);
+ALTER SEQUENCE public.processedemail_id_seq OWNED BY public.processedemail.id;
+
+CREATE TABLE public.processedemail_default PARTITION OF public.processedemail DEFAULT;
+ALTER TABLE public.processedemail_default ENABLE ROW LEVEL SECURITY;
+
+-- Older rows go to default; the partition job deletes them past retention
+SELECT public.ensure_month_partitions(
+    'processedemail', 'processed_at',
+    GREATEST(COALESCE((SELECT min(processed_at)::date FROM public.processedemail_unpartitioned),
+                      current_date),
+             (current_date - interval '1 year')::date),
+    (current_date + interval '3 months')::date);
+
+INSERT INTO public.processedemail SELECT * FROM public.processedemail_unpartitioned;
+DROP TABLE public.processedemail_unpartitioned;
+
+ALTER TABLE public.processedemail
+    ADD FOREIGN KEY (user_id) REFERENCES public."user" (id);
+CREATE INDEX ix_processedemail_user_id_email_id ON public.processedemail (user_id, email_id);
+
+ALTER TABLE public.processedemail ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "user_isolation" ON public.processedemail
+    USING (user_id = current_setting('app.current_user_id')::bigint)
+    WITH CHECK (user_id = current_setting('app.current_user_id')::bigint);
@@ -0,0 +1,33 @@
+-- 0008 — Backfill checkpoints (models.SyncBackfill), written by
+-- sync_job.run_backfill after every Gmail page. Users read their own row
+-- through RLS (GET /api/sync/backfill).
+
+CREATE TABLE IF NOT EXISTS public.syncbackfill (
+    id                 serial PRIMARY KEY,
+    user_id            integer NOT NULL REFERENCES public."user" (id),
+    status             varchar NOT NULL DEFAULT 'queued',
+    days_back          integer NOT NULL DEFAULT 180,
+    window_days        integer NOT NULL DEFAULT 14,
+    range_start        timestamp NOT NULL,
+    window_end         timestamp NOT NULL,
+    page_token         varchar,
+    windows_done       integer NOT NULL DEFAULT 0,
+    windows_total      integer NOT NULL DEFAULT 1,
+    emails_listed      integer NOT NULL DEFAULT 0,
+    emails_processed   integer NOT NULL DEFAULT 0,
+    emails_failed      integer NOT NULL DEFAULT 0,
+    page_attempts      integer NOT NULL DEFAULT 0,
+    transactions_added integer NOT NULL DEFAULT 0,
+    active_seconds     double precision NOT NULL DEFAULT 0,
+    last_error         varchar,
+    started_at         timestamp NOT NULL,
+    updated_at         timestamp NOT NULL,
+    finished_at        timestamp
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_syncbackfill_user_id ON public.syncbackfill (user_id);
+CREATE INDEX IF NOT EXISTS ix_syncbackfill_status_updated ON public.syncbackfill (status, updated_at);
+
+ALTER TABLE public.syncbackfill ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.syncbackfill;
+CREATE POLICY "user_isolation" ON public.syncbackfill
+    USING (user_id = current_setting('app.current_user_id')::bigint);
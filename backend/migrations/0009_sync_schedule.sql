@@ -0,0 +1,22 @@
+-- 0009 — Per-user sync schedule (models.SyncSchedule), maintained by
+-- services/sync_schedule.py: next sync time, observed mail rate and last
+-- activity. Users read their own row through RLS (GET /api/sync/schedule).
+
+CREATE TABLE IF NOT EXISTS public.syncschedule (
+    id                 serial PRIMARY KEY,
+    user_id            integer NOT NULL REFERENCES public."user" (id),
+    next_sync_at       timestamp NOT NULL,
+    interval_s         double precision NOT NULL DEFAULT 0,
+    mail_rate_per_day  double precision NOT NULL DEFAULT 1,
+    last_synced_at     timestamp,
+    last_active_at     timestamp,
+    failed_syncs       integer NOT NULL DEFAULT 0,
+    unprocessed_since  timestamp
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_syncschedule_user_id ON public.syncschedule (user_id);
+CREATE INDEX IF NOT EXISTS ix_syncschedule_next_sync_at ON public.syncschedule (next_sync_at);
+
+ALTER TABLE public.syncschedule ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.syncschedule;
+CREATE POLICY "user_isolation" ON public.syncschedule
+    USING (user_id = current_setting('app.current_user_id')::bigint);
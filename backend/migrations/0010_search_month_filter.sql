@@ -0,0 +1,54 @@
+-- 0010 — search_transactions() gains month_filter, so a month-only search
+-- (GET /api/transactions?q=...&month=3, no year) is filtered before
+-- LIMIT/OFFSET instead of after. Otherwise identical to 0001.
+--
+-- Dropped first: CREATE OR REPLACE with another argument list would add an
+-- overload, and PostgREST could not pick between the two.
+
+DROP FUNCTION IF EXISTS public.search_transactions(text, text, date, date, text, text, integer, integer);
+
+CREATE OR REPLACE FUNCTION public.search_transactions(
+    q               text,
+    prefix_query    text,
+    date_from       date    DEFAULT NULL,
+    date_to         date    DEFAULT NULL,
+    category_filter text    DEFAULT NULL,
+    bank_filter     text    DEFAULT NULL,
+    result_limit    integer DEFAULT 50,
+    result_offset   integer DEFAULT 0,
+    month_filter    integer DEFAULT NULL
+)
+RETURNS TABLE (
+    id          integer,
+    date        date,
+    description text,
+    amount      double precision,
+    currency    text,
+    category    text,
+    bank        text,
+    email_id    text,
+    created_at  timestamp,
+    rank        real
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT t.id, t.date, t.description::text, t.amount, t.currency::text,
+           t.category::text, t.bank::text, t.email_id::text, t.created_at,
+           (ts_rank(to_tsvector('simple', t.description || ' ' || t.bank),
+                    to_tsquery('simple', prefix_query))
+            + word_similarity(q, t.description || ' ' || t.bank))::real AS rank
+    FROM public.transaction t
+    WHERE t.user_id = current_setting('app.current_user_id')::bigint
+      AND (to_tsvector('simple', t.description || ' ' || t.bank)
+               @@ to_tsquery('simple', prefix_query)
+           OR q <% (t.description || ' ' || t.bank))
+      AND (date_from IS NULL OR t.date >= date_from)
+      AND (date_to IS NULL OR t.date < date_to)
+      AND (month_filter IS NULL OR extract(month FROM t.date) = month_filter)
+      AND (category_filter IS NULL OR t.category = category_filter)
+      AND (bank_filter IS NULL OR t.bank ILIKE '%' || bank_filter || '%')
+    ORDER BY rank DESC, t.date DESC, t.id DESC
+    LIMIT result_limit OFFSET result_offset;
+$$;
@@ -0,0 +1,48 @@
+-- 0011 — Per-user merchants (services/merchants.py).
+--
+-- A merchant's name is built from whichever description created it, and
+-- fuzzy resolution used to hand that name to every other user whose
+-- description came close. merchant/merchantalias now carry user_id; NULL
+-- marks the vetted shared seed merchants (SHARED_MERCHANTS), the only rows
+-- visible to everyone.
+--
+-- Existing merchants can't be split by owner after the fact, so the mapping
+-- is reset: merchant_id is cleared (the merchantstat trigger drains the
+-- stats to zero), and the rows are rebuilt per user by
+-- services.merchants.rebuild_mapping(), which the scheduler runs in the
+-- background right after startup (top merchants are empty until it's done).
+
+ALTER TABLE public.merchant
+    ADD COLUMN IF NOT EXISTS user_id integer REFERENCES public."user" (id);
+ALTER TABLE public.merchantalias
+    ADD COLUMN IF NOT EXISTS user_id integer REFERENCES public."user" (id);
+
+UPDATE public."transaction" SET merchant_id = NULL WHERE merchant_id IS NOT NULL;
+DELETE FROM public.merchantstat;
+DELETE FROM public.merchantalias;
+DELETE FROM public.merchant;
+
+-- key is unique per user (0 = shared) instead of globally: 0004 made it a
+-- constraint, create_all a unique index
+ALTER TABLE public.merchant DROP CONSTRAINT IF EXISTS merchant_key_key;
+ALTER TABLE public.merchantalias DROP CONSTRAINT IF EXISTS merchantalias_key_key;
+DROP INDEX IF EXISTS public.ix_merchant_key;
+DROP INDEX IF EXISTS public.ix_merchantalias_key;
+CREATE INDEX IF NOT EXISTS ix_merchant_key ON public.merchant (key);
+CREATE INDEX IF NOT EXISTS ix_merchantalias_key ON public.merchantalias (key);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_merchant_scope_key
+    ON public.merchant ((coalesce(user_id, 0)), key);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_merchantalias_scope_key
+    ON public.merchantalias ((coalesce(user_id, 0)), key);
+
+-- top-merchants embeds merchant(name) under the user's RLS scope (PostgREST
+-- and the budget_reader role of 0006): own merchants plus the shared ones
+ALTER TABLE public.merchant ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.merchant;
+CREATE POLICY "user_isolation" ON public.merchant
+    USING (user_id IS NULL OR user_id = current_setting('app.current_user_id')::bigint);
+
+ALTER TABLE public.merchantalias ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "user_isolation" ON public.merchantalias;
+CREATE POLICY "user_isolation" ON public.merchantalias
+    USING (user_id IS NULL OR user_id = current_setting('app.current_user_id')::bigint);
@@ -0,0 +1,65 @@
+-- 0012 — Unique (user_id, email_id) for the partitioned processedemail.
+--
+-- 0007 partitions processedemail by processed_at, and a unique index there
+-- must include the partition key, so (user_id, email_id) lost its UNIQUE and
+-- only sync_job's advisory lock (_claim_email) kept duplicates out — nothing
+-- stopped any other writer. processedemail_key is a small unpartitioned
+-- table with (user_id, email_id) as its primary key, filled by a BEFORE
+-- INSERT trigger on processedemail: a duplicate insert now fails with a
+-- unique violation whoever writes it. Row deletes are mirrored by trigger;
+-- dropped month partitions by services/partitions.py, which prunes the keys
+-- with the same cutoff.
+
+CREATE TABLE IF NOT EXISTS public.processedemail_key (
+    user_id       integer   NOT NULL REFERENCES public."user" (id),
+    email_id      varchar   NOT NULL,
+    processed_at  timestamp NOT NULL,
+    PRIMARY KEY (user_id, email_id)
+);
+CREATE INDEX IF NOT EXISTS ix_processedemail_key_processed_at
+    ON public.processedemail_key (processed_at);
+-- No policy: only the trigger functions below and the service role touch it
+ALTER TABLE public.processedemail_key ENABLE ROW LEVEL SECURITY;
+
+-- Duplicates that slipped in since 0007 keep their oldest row
+DELETE FROM public.processedemail p
+USING public.processedemail q
+WHERE p.user_id = q.user_id AND p.email_id = q.email_id
+  AND (p.processed_at, p.id) > (q.processed_at, q.id);
+
+INSERT INTO public.processedemail_key (user_id, email_id, processed_at)
+SELECT user_id, email_id, processed_at FROM public.processedemail
+ON CONFLICT DO NOTHING;
+
+-- SECURITY DEFINER: the key row must be written regardless of the caller's RLS scope.
+CREATE OR REPLACE FUNCTION public.processedemail_key_insert() RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO processedemail_key (user_id, email_id, processed_at)
+    VALUES (NEW.user_id, NEW.email_id, NEW.processed_at);
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.processedemail_key_delete() RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM processedemail_key WHERE user_id = OLD.user_id AND email_id = OLD.email_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_processedemail_key_insert ON public.processedemail;
+CREATE TRIGGER trg_processedemail_key_insert
+    BEFORE INSERT ON public.processedemail
+    FOR EACH ROW EXECUTE FUNCTION public.processedemail_key_insert();
+DROP TRIGGER IF EXISTS trg_processedemail_key_delete ON public.processedemail;
+CREATE TRIGGER trg_processedemail_key_delete
+    AFTER DELETE ON public.processedemail
+    FOR EACH ROW EXECUTE FUNCTION public.processedemail_key_delete();
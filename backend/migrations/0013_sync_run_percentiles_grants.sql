@@ -0,0 +1,20 @@
+-- 0013 — sync_run_percentiles() (0005) is a SECURITY DEFINER aggregate over
+-- every tenant's runs. Functions are executable by PUBLIC by default, so any
+-- PostgREST role could call it; only the service role (GET
+-- /api/sync/runs/percentiles, METRICS_TOKEN-gated) and the owner keep EXECUTE.
+
+REVOKE EXECUTE ON FUNCTION public.sync_run_percentiles(timestamp) FROM PUBLIC;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION public.sync_run_percentiles(timestamp) FROM anon;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        REVOKE EXECUTE ON FUNCTION public.sync_run_percentiles(timestamp) FROM authenticated;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT EXECUTE ON FUNCTION public.sync_run_percentiles(timestamp) TO service_role;
+    END IF;
+END
+$$;
@@ -0,0 +1,8 @@
+-- 0014 — Who set transaction.category: 'llm' (extraction), 'model' (the
+-- local categorizer, services/categorizer.py) or 'user' (manual create or
+-- edit). The categorizer retrains from llm and user labels only, never
+-- from its own output. Existing rows count as 'llm' — CATEGORIZER_MODE
+-- defaults to off, so that's what they are unless it was switched on.
+
+ALTER TABLE public."transaction"
+    ADD COLUMN IF NOT EXISTS category_source varchar NOT NULL DEFAULT 'llm';
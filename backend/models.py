@@ -36,18 +36,76 @@ class User(SQLModel, table=True):
 # ── Transaction ───────────────────────────────────────────────────────────────
 
 class Transaction(SQLModel, table=True):
+    # Composite indexes mirror migrations/0002_query_shaped_indexes.sql so
+    # create_all on a fresh database ends up with the same schema. On Postgres
+    # migrations/0007_partitioning.sql turns the table into monthly partitions
+    # by date (primary key (id, date)).
+    __table_args__ = (
+        sa.Index("ix_transaction_user_id_date", "user_id", "date", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
     date: date
     description: str
     amount: float          # negative = expense, positive = income
     currency: str = "PEN"
     category: str
+    # Who set category: llm | model (services/categorizer.py) | user.
+    # The local categorizer trains on llm and user labels only.
+    category_source: str = Field(default="llm", sa_column_kwargs={"server_default": "llm"})
     bank: str
     email_id: str = Field(default="manual", index=True)
+    merchant_id: Optional[int] = Field(default=None, foreign_key="merchant.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+# ── Merchant ──────────────────────────────────────────────────────────────────
+# Canonical merchants and the normalized description keys that map to them,
+# per user — user_id NULL marks the vetted shared seed merchants, the only
+# names one user's rows can show another. See services/merchants.py.
+
+class Merchant(SQLModel, table=True):
+    __table_args__ = (
+        sa.Index("ux_merchant_scope_key", sa.text("coalesce(user_id, 0)"), "key", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    name: str
+    key: str = Field(index=True)                  # normalized canonical key
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MerchantAlias(SQLModel, table=True):
+    __table_args__ = (
+        sa.Index("ux_merchantalias_scope_key", sa.text("coalesce(user_id, 0)"), "key", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    key: str = Field(index=True)                  # normalized raw description
+    merchant_id: int = Field(foreign_key="merchant.id", index=True)
+
+
+class MerchantStat(SQLModel, table=True):
+    """Per-user monthly spend per merchant — maintained by a trigger on transaction
+    (migrations/0004_merchants.sql) so top-merchant reads never scan transactions."""
+    __table_args__ = (
+        sa.Index("ux_merchantstat_user_merchant_month_currency",
+                 "user_id", "merchant_id", "month", "currency", unique=True),
+        sa.Index("ix_merchantstat_user_month", "user_id", "month"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    merchant_id: int = Field(foreign_key="merchant.id")
+    month: date                                   # first day of the month
+    currency: str
+    txn_count: int = 0
+    spent: float = 0.0                            # sum of |amount| of expenses
+
+
 # ── Budget ────────────────────────────────────────────────────────────────────
 
 class Budget(SQLModel, table=True):
@@ -62,8 +120,33 @@ class Budget(SQLModel, table=True):
 
 class ExchangeRate(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    from_currency: str = Field(index=True)
-    to_currency: str = Field(index=True)
+    from_currency: str
+    to_currency: str
+    rate: float
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+sa.Index(
+    "ix_exchangerate_pair_fetched_at",
+    ExchangeRate.from_currency,
+    ExchangeRate.to_currency,
+    ExchangeRate.fetched_at.desc(),
+)
+
+
+# ── DailyRate ─────────────────────────────────────────────────────────────────
+# One rate per currency pair per day — the historical store behind
+# services.fx_rates (convert at each transaction's own date).
+
+class DailyRate(SQLModel, table=True):
+    __table_args__ = (
+        sa.Index("ux_dailyrate_pair_date", "from_currency", "to_currency", "rate_date", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    from_currency: str
+    to_currency: str
+    rate_date: date
     rate: float
     fetched_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -71,13 +154,130 @@ class ExchangeRate(SQLModel, table=True):
 # ── ProcessedEmail ────────────────────────────────────────────────────────────
 
 class ProcessedEmail(SQLModel, table=True):
+    # On Postgres migrations/0007_partitioning.sql partitions the table by
+    # processed_at, where (user_id, email_id) can't be a unique index; it is
+    # unique through ProcessedEmailKey instead, on both databases.
+    __table_args__ = (
+        sa.Index("ix_processedemail_user_id_email_id", "user_id", "email_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
-    email_id: str = Field(index=True)       # Gmail message ID
+    user_id: int = Field(foreign_key="user.id")
+    email_id: str                           # Gmail message ID
     processed_at: datetime = Field(default_factory=datetime.utcnow)
     transaction_count: int = 0
 
 
+class ProcessedEmailKey(SQLModel, table=True):
+    """One row per ProcessedEmail, keyed (user_id, email_id) — maintained by
+    triggers on processedemail (migrations/0012_processedemail_key.sql; the
+    SQLite ones below), so a duplicate insert fails for every writer."""
+    __tablename__ = "processedemail_key"
+    __table_args__ = (
+        sa.Index("ix_processedemail_key_processed_at", "processed_at"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    email_id: str = Field(primary_key=True)
+    processed_at: datetime
+
+
+for _ddl in (
+    "CREATE TRIGGER trg_processedemail_key_insert BEFORE INSERT ON processedemail "
+    "BEGIN INSERT INTO processedemail_key (user_id, email_id, processed_at) "
+    "VALUES (NEW.user_id, NEW.email_id, NEW.processed_at); END",
+    "CREATE TRIGGER trg_processedemail_key_delete AFTER DELETE ON processedemail "
+    "BEGIN DELETE FROM processedemail_key "
+    "WHERE user_id = OLD.user_id AND email_id = OLD.email_id; END",
+):
+    sa.event.listen(ProcessedEmail.__table__, "after_create", sa.DDL(_ddl).execute_if(dialect="sqlite"))
+
+
+
+# ── SyncBackfill ──────────────────────────────────────────────────────────────
+
+class SyncBackfill(SQLModel, table=True):
+    """Checkpoint of a user's large backfill (sync_job.run_backfill): the window being
+    listed and the Gmail page token within it, so a restarted or expired run
+    resumes where it stopped. One row per user, reused by the next backfill
+    (migrations/0008_sync_backfill.sql adds RLS)."""
+    __table_args__ = (
+        sa.Index("ux_syncbackfill_user_id", "user_id", unique=True),
+        sa.Index("ix_syncbackfill_status_updated", "status", "updated_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    status: str = "queued"                        # queued | running | paused | done
+    days_back: int = 180
+    window_days: int = 14
+    range_start: datetime                         # oldest email the backfill covers
+    window_end: datetime                          # current window is [window_end - window_days, window_end)
+    page_token: Optional[str] = None              # next Gmail page within the current window
+    windows_done: int = 0
+    windows_total: int = 1
+    emails_listed: int = 0
+    emails_processed: int = 0
+    emails_failed: int = 0                        # given up on after BACKFILL_PAGE_ATTEMPTS
+    page_attempts: int = 0                        # runs that found failed emails on the current page
+    transactions_added: int = 0
+    active_seconds: float = 0.0                   # time spent running, for the ETA
+    last_error: Optional[str] = None              # why the last run paused early
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)   # checkpoint / heartbeat
+    finished_at: Optional[datetime] = None
+
+
+# ── SyncSchedule ──────────────────────────────────────────────────────────────
+
+class SyncSchedule(SQLModel, table=True):
+    """When a user is synced next and the inputs it was derived from
+    (services/sync_schedule.py; migrations/0009_sync_schedule.sql adds RLS)."""
+    __table_args__ = (
+        sa.Index("ux_syncschedule_user_id", "user_id", unique=True),
+        sa.Index("ix_syncschedule_next_sync_at", "next_sync_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    next_sync_at: datetime
+    interval_s: float = 0.0                       # before jitter
+    mail_rate_per_day: float = 1.0                # time-weighted new bank emails/day
+    last_synced_at: Optional[datetime] = None
+    last_active_at: Optional[datetime] = None     # last authenticated request
+    failed_syncs: int = 0                         # consecutive syncs where every email failed
+    unprocessed_since: Optional[datetime] = None  # window start of mail a sync left failed/deferred
+
+# ── SyncRun ───────────────────────────────────────────────────────────────────
+
+class SyncRun(SQLModel, table=True):
+    """One run_sync_for_user call — history behind GET /api/sync/runs
+    (migrations/0005_sync_runs.sql adds RLS and the fleet percentile function)."""
+    __table_args__ = (
+        sa.Index("ix_syncrun_user_started", "user_id", "started_at"),
+        sa.Index("ix_syncrun_started", "started_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    started_at: datetime
+    finished_at: datetime
+    duration_s: float = 0.0
+    status: str = "ok"                            # ok | errors=N | no_credentials
+    days_back: int = 7
+    emails_listed: int = 0                        # returned by the Gmail query
+    emails_skipped: int = 0                       # already processed (incl. concurrent runs)
+    emails_triaged_out: int = 0
+    emails_processed: int = 0
+    emails_deferred: int = 0                      # rate-limited, retried next sync
+    transactions_added: int = 0
+    errors: int = 0
+    retries: int = 0                              # Gmail + Anthropic retried calls
+    tokens_input: int = 0
+    tokens_output: int = 0
+    stage_seconds: dict = Field(default_factory=dict, sa_column=Column(sa.JSON, nullable=False))
+
+
 # ── Pydantic schemas ──────────────────────────────────────────────────────────
 
 class TransactionRead(SQLModel):
@@ -89,6 +289,7 @@ class TransactionRead(SQLModel):
     category: str
     bank: str
     email_id: str
+    merchant_id: Optional[int] = None
     created_at: datetime
 
 
@@ -0,0 +1,228 @@
+"""
+Direct, pooled Postgres read path for the dashboard (DATA_BACKEND=postgres).
+
+The PostgREST path costs, per dashboard read, a set_config RPC plus the query
+itself — two HTTP round trips to PostgREST, each followed by its own round
+trip to Postgres, and the rows are JSON-encoded by Postgres/PostgREST and
+parsed again by supabase-py. PostgresReader instead sends one simple-protocol
+query string over a pooled psycopg2 connection:
+
+    SET LOCAL ROLE budget_reader;
+    SET LOCAL app.current_user_id = 42;
+    SELECT ... FROM "transaction" t WHERE t.user_id = 42 AND ...
+
+Postgres runs a multi-statement query string as a single implicit
+transaction, so both SET LOCALs end with it — nothing leaks to the next
+checkout of the pooled connection, and the whole read is one round trip.
+budget_reader (migrations/0006_direct_reader_role.sql) has no BYPASSRLS, so
+the "user_isolation" policies apply exactly as they do behind PostgREST; the
+explicit user_id filter is kept as a second layer, as in sync_job.
+
+PostgresReader mimics the small part of the supabase-py query builder the
+dashboard and analytics readers use — table().select().eq/gte/lt/…/order/
+range/limit().execute().data, including one-level embeds like
+"merchant(name)" — and returns rows shaped like PostgREST's (dates as ISO
+strings, numerics as floats), so the compute functions don't change. It is
+read-only: writes, RPCs and search keep going through supabase_client.
+
+READ_DATABASE_URL defaults to DATABASE_URL. On SQLite (local dev, benchmarks)
+the SET statements are skipped and only the user_id filter applies.
+"""
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Optional
+
+from postgrest.exceptions import APIError
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from services.metrics import instrument_engine
+
+READ_DATABASE_URL  = os.getenv("READ_DATABASE_URL") or os.getenv("DATABASE_URL", "sqlite:///./budget_tracker.db")
+READ_POOL_SIZE     = int(os.getenv("READ_POOL_SIZE", "10"))
+READ_POOL_OVERFLOW = int(os.getenv("READ_POOL_MAX_OVERFLOW", "10"))
+READ_POOL_RECYCLE  = int(os.getenv("READ_POOL_RECYCLE", "300"))
+READER_ROLE        = os.getenv("READ_DATABASE_ROLE", "budget_reader")
+
+_IDENT_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+_EMBED_RE = re.compile(r"^([a-z_][a-z0-9_]*)\(([^()]*)\)$")
+_OPS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+@lru_cache(maxsize=1)
+def get_read_engine() -> Engine:
+    """Engine for the read path (lazily created, shared by all requests)."""
+    kwargs: dict[str, Any] = {"isolation_level": "AUTOCOMMIT"}
+    if READ_DATABASE_URL.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        # No pool_pre_ping: it would double the round trips. Stale connections
+        # are recycled instead, and a failed read surfaces as a 400 like any
+        # other PostgREST error.
+        kwargs.update(pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_OVERFLOW,
+                      pool_recycle=READ_POOL_RECYCLE)
+    eng = create_engine(READ_DATABASE_URL, **kwargs)
+    instrument_engine(eng)   # db_queries_total / per-request counts on /metrics
+    return eng
+
+
+def _ident(name: str) -> str:
+    if not _IDENT_RE.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class _Result:
+    __slots__ = ("data",)
+
+    def __init__(self, data: list[dict]):
+        self.data = data
+
+
+class _Query:
+    """SELECT builder with the supabase-py method names (reads only)."""
+
+    def __init__(self, reader: "PostgresReader", table: str):
+        self._reader = reader
+        self._table = _ident(table)
+        self._columns = "*"
+        self._where: list[str] = []
+        self._params: dict[str, Any] = {}
+        self._order: list[str] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    def select(self, columns: str = "*") -> "_Query":
+        self._columns = columns
+        return self
+
+    def _filter(self, op: str, column: str, value: Any) -> "_Query":
+        name = f"p{len(self._params)}"
+        self._where.append(f"t.{_ident(column)} {_OPS[op]} :{name}")
+        self._params[name] = value
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        return self._filter("eq", column, value)
+
+    def neq(self, column: str, value: Any) -> "_Query":
+        return self._filter("neq", column, value)
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        return self._filter("gt", column, value)
+
+    def gte(self, column: str, value: Any) -> "_Query":
+        return self._filter("gte", column, value)
+
+    def lt(self, column: str, value: Any) -> "_Query":
+        return self._filter("lt", column, value)
+
+    def lte(self, column: str, value: Any) -> "_Query":
+        return self._filter("lte", column, value)
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self._order.append(f"t.{_ident(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int) -> "_Query":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def _select_list(self) -> tuple[list[str], list[str], list[tuple[str, list[str]]]]:
+        """→ (SELECT expressions, JOIN clauses, embeds as (name, [columns]))."""
+        exprs, joins, embeds = [], [], []
+        for part in (p.strip() for p in self._columns.split(",")):
+            match = _EMBED_RE.match(part)
+            if part == "*":
+                exprs.append("t.*")
+            elif match:
+                rel, cols = match.group(1), [c.strip() for c in match.group(2).split(",")]
+                alias = f"e{len(embeds)}"
+                joins.append(f"LEFT JOIN {_ident(rel)} {alias} ON {alias}.id = t.{_ident(rel + '_id')}")
+                exprs += [f'{alias}.{_ident(c)} AS "{rel}.{c}"' for c in cols]
+                embeds.append((rel, cols))
+            else:
+                exprs.append(f"t.{_ident(part)}")
+        return exprs, joins, embeds
+
+    def _build(self) -> tuple[str, list[tuple[str, list[str]]]]:
+        exprs, joins, embeds = self._select_list()
+        sql = f"SELECT {', '.join(exprs)} FROM {self._table} t {' '.join(joins)} WHERE t.user_id = :uid"
+        if self._where:
+            sql += " AND " + " AND ".join(self._where)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)}"
+        if self._offset:
+            sql += f" OFFSET {int(self._offset)}"
+        return sql, embeds
+
+    def to_sql(self) -> str:
+        return self._build()[0]
+
+    def execute(self) -> _Result:
+        sql, embeds = self._build()
+        columns, rows = self._reader.fetch(sql, self._params)
+        return _Result(_shape_rows(columns, rows, embeds))
+
+
+def _shape_rows(columns: list[str], rows: list[tuple], embeds: list[tuple[str, list[str]]]) -> list[dict]:
+    """Rows as PostgREST returns them: ISO dates, float numerics, nested embeds."""
+    if rows:
+        # Convert only the columns whose type needs it (decided on the first row)
+        convert = [i for i, v in enumerate(rows[0]) if isinstance(v, (date, datetime, Decimal))]
+        if convert:
+            rows = [tuple(_jsonable(v) if i in convert else v for i, v in enumerate(r)) for r in rows]
+    out = [dict(zip(columns, r)) for r in rows]
+    for rel, cols in embeds:
+        keys = [f"{rel}.{c}" for c in cols]
+        for row in out:
+            values = [row.pop(k) for k in keys]
+            row[rel] = dict(zip(cols, values)) if any(v is not None for v in values) else None
+    return out
+
+
+class PostgresReader:
+    """Read-only, supabase-py-shaped client scoped to one user."""
+
+    def __init__(self, user_id: int, engine: Optional[Engine] = None):
+        self.user_id = int(user_id)
+        self.engine = engine or get_read_engine()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def fetch(self, sql: str, params: dict) -> tuple[list[str], list[tuple]]:
+        """Run one SELECT for this user in a single round trip."""
+        if self.engine.dialect.name == "postgresql":
+            # user_id is an int we issued, so inlining it is safe; the SETs
+            # and the query go out as one query string (psycopg2 interpolates
+            # parameters client-side).
+            sql = (f"SET LOCAL ROLE {_ident(READER_ROLE)}; "
+                   f"SET LOCAL app.current_user_id = {self.user_id}; {sql}")
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(text(sql), {**params, "uid": self.user_id})
+                return list(result.keys()), [tuple(r) for r in result.fetchall()]
+        except DBAPIError as e:
+            # Same exception type as the PostgREST path, so routers' handling is unchanged
+            orig = e.orig
+            raise APIError({"message": str(orig), "code": getattr(orig, "pgcode", None),
+                            "hint": None, "details": None}) from e
@@ -3,6 +3,11 @@ from postgrest.exceptions import APIError
 
 from auth import get_current_supabase, get_current_user
 from models import BudgetCreate, BudgetRead, BudgetUpdate, User
+from services.dashboard_cache import invalidate_user
+from services.events import publish_budget
+
+# Budget writes only change the budget-status payload
+_BUDGET_ENDPOINTS = ("budget-status",)
 
 router = APIRouter(prefix="/api/budgets", tags=["budgets"])
 
@@ -37,6 +42,8 @@ def create_budget(
             raise HTTPException(409, f"Budget for '{data.category}' already exists")
         payload = {**data.model_dump(), "user_id": current_user.id}
         result = supa.table("budget").insert(payload).execute()
+        invalidate_user(current_user.id, _BUDGET_ENDPOINTS)
+        publish_budget(current_user.id, "created", result.data[0])
         return result.data[0]
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -55,6 +62,8 @@ def update_budget(
             raise HTTPException(404, "Budget not found")
         update_dict = data.model_dump(exclude_unset=True)
         result = supa.table("budget").update(update_dict).eq("id", budget_id).execute()
+        invalidate_user(current_user.id, _BUDGET_ENDPOINTS)
+        publish_budget(current_user.id, "updated", result.data[0])
         return result.data[0]
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -67,9 +76,11 @@ def delete_budget(
     supa = Depends(get_current_supabase),
 ):
     try:
-        check = supa.table("budget").select("id").eq("id", budget_id).execute()
+        check = supa.table("budget").select("id,category").eq("id", budget_id).execute()
         if not check.data:
             raise HTTPException(404, "Budget not found")
         supa.table("budget").delete().eq("id", budget_id).execute()
+        invalidate_user(current_user.id, _BUDGET_ENDPOINTS)
+        publish_budget(current_user.id, "deleted", check.data[0])
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
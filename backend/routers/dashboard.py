@@ -1,12 +1,18 @@
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from postgrest.exceptions import APIError
 
-from auth import get_current_supabase, get_current_user
+from auth import get_current_user
+from data_backend import get_reader_for_user
 from models import User
+from services import analytics
+from services.dashboard_cache import cache_key, dashboard_cache
 from services.exchange_rate import get_exchange_rate, get_exchange_rate_info
+from services.fast_response import fast_json_response
+from services import fx_rates
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
@@ -16,8 +22,32 @@ def _current_month_year():
     return today.month, today.year
 
 
-def _to_usd(amount: float, currency: str, pen_to_usd: float) -> float:
-    return amount if currency == "USD" else amount * pen_to_usd
+# fx=current   → every row at today's rate (the original behaviour)
+# fx=historical → every row at the rate in force on its own date
+FxMode = Literal["current", "historical"]
+
+
+def _usd_amounts(txns: list[dict], fx: FxMode) -> np.ndarray:
+    """Convert the amount column of txns to USD in one batch."""
+    return fx_rates.convert_batch(
+        [t["amount"] for t in txns],
+        [t["currency"] for t in txns],
+        dates=[t["date"] for t in txns] if fx == "historical" else None,
+        to_currency="USD",
+    )
+
+
+def _rate_version(fx: FxMode, pen_to_usd: float) -> tuple:
+    return (fx, pen_to_usd, fx_rates.version())
+
+
+def _sum_by(keys: list, values: np.ndarray) -> dict:
+    """Group-by-sum of values over keys (one vectorized bincount)."""
+    if not keys:
+        return {}
+    labels, codes = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+    sums = np.bincount(codes, weights=values, minlength=len(labels))
+    return dict(zip(labels.tolist(), sums.tolist()))
 
 
 def _month_range(month: int, year: int) -> tuple[str, str]:
@@ -49,22 +79,35 @@ def exchange_rate_endpoint():
 def summary(
     month: Optional[int] = Query(None),
     year:  Optional[int] = Query(None),
+    fx:    FxMode        = Query("current"),
     current_user: User   = Depends(get_current_user),
-    supa = Depends(get_current_supabase),
 ):
     if not month or not year:
         month, year = _current_month_year()
 
     pen_to_usd = get_exchange_rate("PEN", "USD")
+    return dashboard_cache.get_or_compute(
+        cache_key(current_user.id, "summary", month, year, _rate_version(fx, pen_to_usd)),
+        lambda: _compute_summary(get_reader_for_user(current_user.id), month, year, pen_to_usd, fx),
+    )
+
+
+def _compute_summary(supa, month: int, year: int, pen_to_usd: float, fx: FxMode = "current") -> dict:
     txns = _fetch_month_transactions(supa, month, year)
 
-    pen_income   = sum(t["amount"] for t in txns if t["amount"] > 0 and t["currency"] == "PEN")
-    pen_expenses = sum(t["amount"] for t in txns if t["amount"] < 0 and t["currency"] == "PEN")
-    usd_income   = sum(t["amount"] for t in txns if t["amount"] > 0 and t["currency"] == "USD")
-    usd_expenses = sum(t["amount"] for t in txns if t["amount"] < 0 and t["currency"] == "USD")
+    amounts    = np.fromiter((t["amount"] for t in txns), dtype=np.float64, count=len(txns))
+    currencies = np.asarray([t["currency"] for t in txns], dtype=object)
+    usd        = _usd_amounts(txns, fx)
+    income, expense = amounts > 0, amounts < 0
+    is_pen, is_usd  = currencies == "PEN", currencies == "USD"
 
-    total_income_usd   = _to_usd(pen_income,   "PEN", pen_to_usd) + usd_income
-    total_expenses_usd = _to_usd(pen_expenses,  "PEN", pen_to_usd) + usd_expenses
+    pen_income   = float(amounts[income & is_pen].sum())
+    pen_expenses = float(amounts[expense & is_pen].sum())
+    usd_income   = float(amounts[income & is_usd].sum())
+    usd_expenses = float(amounts[expense & is_usd].sum())
+
+    total_income_usd   = float(usd[income].sum())
+    total_expenses_usd = float(usd[expense].sum())
 
     return {
         "month": month, "year": year,
@@ -84,6 +127,7 @@ def summary(
             "net":      round(total_income_usd + total_expenses_usd, 2),
         },
         "exchange_rate":     pen_to_usd,
+        "fx_mode":           fx,
         "transaction_count": len(txns),
     }
 
@@ -92,20 +136,27 @@ def summary(
 def by_category(
     month: Optional[int] = Query(None),
     year:  Optional[int] = Query(None),
+    fx:    FxMode        = Query("current"),
     current_user: User   = Depends(get_current_user),
-    supa = Depends(get_current_supabase),
 ):
     if not month or not year:
         month, year = _current_month_year()
 
     pen_to_usd = get_exchange_rate("PEN", "USD")
-    txns = _fetch_month_transactions(supa, month, year)
+    return dashboard_cache.get_or_compute(
+        cache_key(current_user.id, "by-category", month, year, _rate_version(fx, pen_to_usd)),
+        lambda: _compute_by_category(get_reader_for_user(current_user.id), month, year, fx),
+    )
+
+
+def _expense_totals_by_category(txns: list[dict], fx: FxMode) -> dict[str, float]:
+    expenses = [t for t in txns if t["amount"] < 0]
+    return _sum_by([t["category"] for t in expenses], np.abs(_usd_amounts(expenses, fx)))
 
-    cat_totals: dict[str, float] = {}
-    for t in txns:
-        if t["amount"] < 0:
-            cat = t["category"]
-            cat_totals[cat] = cat_totals.get(cat, 0) + abs(_to_usd(t["amount"], t["currency"], pen_to_usd))
+
+def _compute_by_category(supa, month: int, year: int, fx: FxMode = "current") -> list[dict]:
+    txns = _fetch_month_transactions(supa, month, year)
+    cat_totals = _expense_totals_by_category(txns, fx)
 
     return sorted(
         [{"category": c, "total": round(v, 2)} for c, v in cat_totals.items()],
@@ -115,16 +166,24 @@ def by_category(
 
 @router.get("/monthly-trend")
 def monthly_trend(
+    request: Request,
     year: Optional[int] = Query(None),
+    fx:   FxMode        = Query("current"),
     current_user: User  = Depends(get_current_user),
-    supa = Depends(get_current_supabase),
 ):
     if not year:
         year = date.today().year
 
-    MONTH_NAMES = ["","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
     pen_to_usd = get_exchange_rate("PEN", "USD")
+    data = dashboard_cache.get_or_compute(
+        cache_key(current_user.id, "monthly-trend", None, year, _rate_version(fx, pen_to_usd)),
+        lambda: _compute_monthly_trend(get_reader_for_user(current_user.id), year, fx),
+    )
+    return fast_json_response(request, data)
 
+
+def _compute_monthly_trend(supa, year: int, fx: FxMode = "current") -> list[dict]:
+    MONTH_NAMES = ["","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
     result = (
         supa.table("transaction")
         .select("date,amount,currency")
@@ -133,11 +192,12 @@ def monthly_trend(
         .execute()
     )
 
-    month_totals: dict[int, float] = {}
-    for t in result.data:
-        if t["amount"] < 0:
-            m = date.fromisoformat(t["date"]).month
-            month_totals[m] = month_totals.get(m, 0) + abs(_to_usd(t["amount"], t["currency"], pen_to_usd))
+    expenses = [t for t in result.data if t["amount"] < 0]
+    # "YYYY-MM-DD"[5:7] → month number, no date parsing per row
+    month_totals = _sum_by(
+        [int(t["date"][5:7]) for t in expenses],
+        np.abs(_usd_amounts(expenses, fx)),
+    )
 
     return [
         {"month": MONTH_NAMES[m], "month_num": m, "expenses": round(v, 2)}
@@ -149,12 +209,20 @@ def monthly_trend(
 def budget_status(
     month: Optional[int] = Query(None),
     year:  Optional[int] = Query(None),
+    fx:    FxMode        = Query("current"),
     current_user: User   = Depends(get_current_user),
-    supa = Depends(get_current_supabase),
 ):
     if not month or not year:
         month, year = _current_month_year()
 
+    pen_to_usd = get_exchange_rate("PEN", "USD")
+    return dashboard_cache.get_or_compute(
+        cache_key(current_user.id, "budget-status", month, year, _rate_version(fx, pen_to_usd)),
+        lambda: _compute_budget_status(get_reader_for_user(current_user.id), month, year, fx),
+    )
+
+
+def _compute_budget_status(supa, month: int, year: int, fx: FxMode = "current") -> list[dict]:
     try:
         budgets_result = supa.table("budget").select("*").execute()
     except APIError as e:
@@ -164,19 +232,17 @@ def budget_status(
     if not budgets:
         return []
 
-    pen_to_usd = get_exchange_rate("PEN", "USD")
     txns = _fetch_month_transactions(supa, month, year)
 
-    spent_map: dict[str, float] = {}
-    for t in txns:
-        if t["amount"] < 0:
-            cat = t["category"]
-            spent_map[cat] = spent_map.get(cat, 0) + abs(_to_usd(t["amount"], t["currency"], pen_to_usd))
+    spent_map = _expense_totals_by_category(txns, fx)
+    # Limits are forward-looking, so they always convert at today's rate
+    limits_usd = fx_rates.convert_batch(
+        [b["monthly_limit"] for b in budgets], [b["currency"] for b in budgets],
+    )
 
     result = []
-    for b in budgets:
+    for b, limit_usd in zip(budgets, limits_usd.tolist()):
         spent = spent_map.get(b["category"], 0.0)
-        limit_usd = _to_usd(b["monthly_limit"], b["currency"], pen_to_usd)
         pct = (spent / limit_usd * 100) if limit_usd > 0 else 0
         result.append({
             "category":   b["category"],
@@ -187,3 +253,104 @@ def budget_status(
         })
 
     return result
+
+
+@router.get("/aggregate")
+def aggregate(
+    request: Request,
+    from_:    date          = Query(..., alias="from"),
+    to:       date          = Query(..., description="Inclusive end date"),
+    bucket:   Literal["day", "week", "month", "quarter"] = Query("month"),
+    group_by: Optional[Literal["category", "bank", "currency"]] = Query(None),
+    fx:       FxMode        = Query("current"),
+    current_user: User      = Depends(get_current_user),
+):
+    """
+    Income/expense series (USD) for any date range, bucketed by day, week,
+    month or quarter and optionally split by category, bank or currency.
+    Series are dense (empty buckets are 0) and aligned with `buckets`.
+    """
+    if to < from_:
+        raise HTTPException(422, "'to' must be on or after 'from'")
+    if analytics.bucket_count(from_, to, bucket) > analytics.MAX_BUCKETS:
+        raise HTTPException(422, f"Range too large for '{bucket}' buckets (max {analytics.MAX_BUCKETS})")
+
+    pen_to_usd = get_exchange_rate("PEN", "USD")
+    endpoint = f"aggregate:{from_}:{to}:{bucket}:{group_by}"
+
+    def compute():
+        supa = get_reader_for_user(current_user.id)
+        try:
+            rows = analytics.fetch_range(supa, from_, to, group_by)
+        except APIError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return analytics.aggregate(rows, from_, to, bucket, group_by, fx)
+
+    data = dashboard_cache.get_or_compute(
+        cache_key(current_user.id, endpoint, None, None, _rate_version(fx, pen_to_usd)),
+        compute,
+    )
+    return fast_json_response(request, data)
+
+
+@router.get("/top-merchants")
+def top_merchants(
+    month: Optional[int] = Query(None),
+    year:  Optional[int] = Query(None),
+    limit: int           = Query(10, ge=1, le=100),
+    fx:    FxMode        = Query("current"),
+    current_user: User   = Depends(get_current_user),
+):
+    """
+    Biggest expense merchants (USD) for a month — or a whole year when only
+    `year` is given. Reads the trigger-maintained merchantstat rows.
+    """
+    if not year:
+        month, year = _current_month_year()
+
+    pen_to_usd = get_exchange_rate("PEN", "USD")
+    return dashboard_cache.get_or_compute(
+        cache_key(current_user.id, f"top-merchants:{limit}", month, year, _rate_version(fx, pen_to_usd)),
+        lambda: _compute_top_merchants(get_reader_for_user(current_user.id), month, year, limit, fx),
+    )
+
+
+def _compute_top_merchants(supa, month: Optional[int], year: int, limit: int,
+                           fx: FxMode = "current") -> list[dict]:
+    first, after = _month_range(month, year) if month else (f"{year}-01-01", f"{year + 1}-01-01")
+    try:
+        result = (
+            supa.table("merchantstat")
+            .select("merchant_id,month,currency,txn_count,spent,merchant(name)")
+            .gte("month", first)
+            .lt("month", after)
+            .execute()
+        )
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = result.data
+    if not rows:
+        return []
+
+    # Stats are per calendar month, so historical mode converts at mid-month
+    spent_usd = fx_rates.convert_batch(
+        [r["spent"] for r in rows],
+        [r["currency"] for r in rows],
+        dates=[r["month"][:8] + "15" for r in rows] if fx == "historical" else None,
+    )
+    ids = [r["merchant_id"] for r in rows]
+    totals = _sum_by(ids, spent_usd)
+    counts = _sum_by(ids, np.asarray([r["txn_count"] for r in rows], dtype=np.float64))
+    names  = {r["merchant_id"]: (r.get("merchant") or {}).get("name") for r in rows}
+
+    top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [
+        {
+            "merchant_id":       merchant_id,
+            "merchant":          names[merchant_id],
+            "total":             round(total, 2),
+            "transaction_count": int(counts[merchant_id]),
+        }
+        for merchant_id, total in top
+    ]
@@ -0,0 +1,59 @@
+"""
+Per-user Server-Sent Events stream of data changes (services/events.py).
+
+EventSource cannot set an Authorization header. Besides the session cookie,
+the stream accepts ?ticket= — a short-lived, stream-only token from
+POST /api/events/ticket — so the session JWT never appears in a URL.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from jose import JWTError
+from sqlmodel import Session
+
+from auth import STREAM_TICKET_TTL_S, create_stream_ticket, decode_stream_ticket, get_current_user
+from database import engine
+from models import User
+from services import events
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def get_stream_user(
+    request: Request,
+    ticket: Optional[str] = Query(None, description="Stream ticket from POST /api/events/ticket"),
+    session_token: Optional[str] = Cookie(default=None),
+) -> User:
+    # A short session of its own: a yield dependency would hold a pooled
+    # connection for as long as the stream stays open.
+    with Session(engine) as session:
+        if not ticket:
+            return get_current_user(request, session_token, session)
+        try:
+            user_id = decode_stream_ticket(ticket)
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired stream ticket")
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        return user
+
+
+@router.post("/ticket")
+def stream_ticket(current_user: User = Depends(get_current_user)):
+    """Short-lived ticket for opening the event stream (GET /api/events?ticket=)."""
+    return {"ticket": create_stream_ticket(current_user.id), "expires_in": STREAM_TICKET_TTL_S}
+
+
+@router.get("")
+async def event_stream(current_user: User = Depends(get_stream_user)):
+    """text/event-stream of "transactions" / "budgets" change events with per-month deltas."""
+    if events.bus.subscriber_count(current_user.id) >= events.bus.max_per_user:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+    return StreamingResponse(
+        events.stream(current_user.id),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx would otherwise hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
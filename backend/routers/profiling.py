@@ -0,0 +1,37 @@
+"""
+Download stored request/sync profiles (services/profiling.py).
+
+Guarded by the same PROFILE_TOKEN that turns profiling on — send it as
+X-Profile-Token. The routes 404 when profiling is disabled.
+"""
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from services import profiling
+
+router = APIRouter(prefix="/api/profiles", tags=["profiling"])
+
+
+def require_profile_token(x_profile_token: str = Header(default="")) -> None:
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not hmac.compare_digest(x_profile_token.encode(), profiling.PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid profile token")
+
+
+@router.get("", dependencies=[Depends(require_profile_token)])
+def list_profiles():
+    """Stored profiles, newest first (id, kind, label, duration, samples, ...)."""
+    return profiling.list_profiles()
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profile_token)])
+def download_profile(profile_id: str):
+    """Collapsed stacks — feed to flamegraph.pl, speedscope or inferno-flamegraph."""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain",
+                        filename=f"{profile_id}{profiling.PROFILE_SUFFIX}")
@@ -0,0 +1,52 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from postgrest.exceptions import APIError
+
+from auth import get_current_user
+from data_backend import get_reader_for_user
+from models import User
+from services import analytics
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+def _columns(current_user: User) -> analytics.TransactionColumns:
+    try:
+        return analytics.load_columns(current_user.id, lambda: get_reader_for_user(current_user.id))
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/year-over-year")
+def year_over_year(
+    year: Optional[int] = Query(None),
+    current_user: User  = Depends(get_current_user),
+):
+    """Monthly expenses (USD) for `year` next to the same month of the previous year."""
+    return analytics.year_over_year(_columns(current_user), year or date.today().year)
+
+
+@router.get("/rolling-averages")
+def rolling_averages(
+    windows: str       = Query("3,6,12", pattern=r"^\d{1,2}(,\d{1,2})*$"),
+    current_user: User = Depends(get_current_user),
+):
+    """Monthly expenses (USD) over the whole history with trailing N-month averages."""
+    sizes = tuple(sorted({int(w) for w in windows.split(",") if int(w) > 0}))
+    if not sizes:
+        raise HTTPException(422, "windows must contain at least one positive integer")
+    return analytics.rolling_averages(_columns(current_user), sizes)
+
+
+@router.get("/category-share")
+def category_share(current_user: User = Depends(get_current_user)):
+    """Per-month share of expenses by category over the whole history."""
+    return analytics.category_share(_columns(current_user))
+
+
+@router.get("/savings-rate")
+def savings_rate(current_user: User = Depends(get_current_user)):
+    """Per-month income, expenses and savings rate over the whole history."""
+    return analytics.savings_rate(_columns(current_user))
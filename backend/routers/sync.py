@@ -0,0 +1,168 @@
+"""
+Sync endpoints. sync_job pulls in the Gmail and Anthropic client libraries,
+so it is imported on first use rather than when the API process starts.
+"""
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from postgrest.exceptions import APIError
+from pydantic import BaseModel, Field as PydanticField
+
+from auth import get_current_supabase, get_current_user, require_metrics_token
+from models import User
+from services.partitions import MAX_DAYS_BACK
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+class SyncRequest(BaseModel):
+    days_back: int = PydanticField(default=7, ge=1, le=MAX_DAYS_BACK)
+
+
+class BackfillRequest(BaseModel):
+    days_back: int = PydanticField(default=MAX_DAYS_BACK, ge=1, le=MAX_DAYS_BACK)
+
+
+@router.post("")
+def trigger_sync(
+    current_user: User = Depends(get_current_user),
+    body: SyncRequest = None,
+):
+    """Manually trigger a sync for the authenticated user (runs synchronously)."""
+    import sync_job
+
+    req = body or SyncRequest()
+    result = sync_job.run_sync_for_user(current_user, req.days_back)
+    return result
+
+
+def _backfill_progress(row: dict) -> dict:
+    """Progress of a SyncBackfill row for the UI, with an ETA extrapolated
+    from the time spent running so far (pauses between runs not counted)."""
+    done, total = row["windows_done"], max(row["windows_total"], 1)
+    fraction = 1.0 if row["status"] == "done" else min(done / total, 1.0)
+    eta_s = None
+    if 0 < fraction < 1:
+        eta_s = round(row["active_seconds"] / fraction * (1 - fraction))
+    return {
+        "status":               row["status"],
+        "days_back":            row["days_back"],
+        "windows_done":         done,
+        "windows_total":        total,
+        "percent":              round(fraction * 100, 1),
+        "emails_listed":        row["emails_listed"],
+        "emails_processed":     row["emails_processed"],
+        "emails_failed":        row["emails_failed"],
+        "transactions_added":   row["transactions_added"],
+        "eta_seconds":          eta_s,
+        "estimated_completion": (
+            (datetime.utcnow() + timedelta(seconds=eta_s)).isoformat() if eta_s is not None else None
+        ),
+        "last_error":           row["last_error"],
+        "started_at":           row["started_at"],
+        "updated_at":           row["updated_at"],
+        "finished_at":          row["finished_at"],
+    }
+
+
+@router.post("/backfill", status_code=202)
+def start_backfill(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    body: BackfillRequest = None,
+):
+    """Start (or resume) a checkpointed backfill of the last days_back days.
+    Runs in the background in bounded chunks; poll GET /api/sync/backfill."""
+    import sync_job
+
+    req = body or BackfillRequest()
+    job = sync_job.start_backfill(current_user, req.days_back)
+    background_tasks.add_task(sync_job.run_backfill, current_user)
+    return _backfill_progress(job.model_dump(mode="json"))
+
+
+@router.get("/backfill")
+def backfill_status(
+    current_user: User = Depends(get_current_user),
+    supa = Depends(get_current_supabase),
+):
+    """The user's latest backfill: status, percent, counts and estimated completion."""
+    try:
+        result = supa.table("syncbackfill").select("*").limit(1).execute()
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result.data:
+        raise HTTPException(status_code=404, detail="No backfill")
+    return _backfill_progress(result.data[0])
+
+
+@router.get("/schedule")
+def sync_schedule_status(
+    current_user: User = Depends(get_current_user),
+    supa = Depends(get_current_supabase),
+):
+    """When the scheduler syncs this user next, and the observed mail rate
+    and activity the interval was derived from (services/sync_schedule.py)."""
+    try:
+        result = supa.table("syncschedule").select(
+            "next_sync_at,interval_s,mail_rate_per_day,last_synced_at,last_active_at"
+        ).limit(1).execute()
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Not scheduled yet")
+    return result.data[0]
+
+
+@router.get("/extraction-stats", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def sync_extraction_stats():
+    """Per-tier extraction model calls, latency, tokens, cost, escalation rate and
+    input-token savings from email preprocessing, plus API retry/throttle counters.
+    Process-wide, so operator-only, like /metrics."""
+    from extract_transactions import extraction_stats
+    from services import rate_limit
+    from services.email_preprocess import preprocess_stats
+
+    return {
+        **extraction_stats.snapshot(),
+        "preprocess":  preprocess_stats.snapshot(),
+        "rate_limits": rate_limit.stats(),
+    }
+
+
+@router.get("/runs")
+def sync_runs(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    supa = Depends(get_current_supabase),
+):
+    """The user's most recent sync runs, newest first: email counts, retries,
+    tokens and seconds per pipeline stage (stage_seconds)."""
+    try:
+        result = (
+            supa.table("syncrun")
+            .select("*")
+            .order("started_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return result.data
+
+
+@router.get("/runs/percentiles", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def sync_run_percentiles(days: int = Query(7, ge=1, le=90)):
+    """Fleet-wide p50/p95/p99 of run duration, emails listed, input tokens,
+    retries and per-stage seconds over the last `days` (aggregates only).
+    Spans every user, so operator-only, like /metrics; the function is
+    executable by the service role only (migrations/0013)."""
+    from supabase_client import get_base_client
+
+    since = datetime.utcnow() - timedelta(days=days)
+    try:
+        result = get_base_client().rpc("sync_run_percentiles", {"since": since.isoformat()}).execute()
+    except APIError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return result.data
+
@@ -1,11 +1,17 @@
+import re
 from datetime import date, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from postgrest.exceptions import APIError
 
 from auth import get_current_supabase, get_current_user
 from models import TransactionCreate, TransactionRead, TransactionUpdate, User
+from services.categorizer import record_correction
+from services.dashboard_cache import invalidate_user
+from services.events import publish_transactions
+from services.fast_response import fast_json_response
+from services.merchants import resolve_merchant
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
@@ -20,19 +26,88 @@ def _month_date_range(month: int, year: int) -> tuple[str, str]:
     return str(first), str(after)
 
 
+SEARCH_DEFAULT_LIMIT = 50
+
+# fast_json_response bypasses response_model, so list endpoints select (and
+# project search rows onto) exactly TransactionRead's fields — never user_id
+# or the search rank.
+_READ_FIELDS = tuple(TransactionRead.model_fields)
+_READ_COLUMNS = ",".join(_READ_FIELDS)
+
+
+def _project(rows: list[dict]) -> list[dict]:
+    return [{f: r.get(f) for f in _READ_FIELDS} for r in rows]
+
+# Letters/digits only — everything else is a separator, so user input can never
+# inject tsquery operators (&, |, !, :, parentheses).
+_SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def _prefix_tsquery(q: str) -> str:
+    """'wong san isi' → 'wong:* & san:* & isi:*' (every term, prefix-matched)."""
+    return " & ".join(f"{t}:*" for t in _SEARCH_TOKEN_RE.findall(q.lower()))
+
+
+def _search_transactions(
+    supa, q: str, month: Optional[int], year: Optional[int],
+    category: Optional[str], bank: Optional[str], limit: int, offset: int,
+) -> list[dict]:
+    """
+    Ranked prefix + fuzzy search over description/bank via the
+    search_transactions() Postgres function (migrations/0001_transaction_search.sql,
+    month_filter from 0010).
+    """
+    prefix_query = _prefix_tsquery(q)
+    if not prefix_query:
+        return []
+
+    date_from = date_to = None
+    if month and year:
+        date_from, date_to = _month_date_range(month, year)
+    elif year:
+        date_from, date_to = f"{year}-01-01", f"{year + 1}-01-01"
+
+    params = {
+        "q":               q.strip(),
+        "prefix_query":    prefix_query,
+        "date_from":       date_from,
+        "date_to":         date_to,
+        "category_filter": category,
+        "bank_filter":     bank,
+        "result_limit":    limit,
+        "result_offset":   offset,
+    }
+    if month and not year:
+        # Month of any year: filtered in SQL, before LIMIT/OFFSET (migrations/0010)
+        params["month_filter"] = month
+    result = supa.rpc("search_transactions", params).execute()
+    return result.data or []
+
+
 @router.get("", response_model=list[TransactionRead])
 def list_transactions(
+    request: Request,
     month:    Optional[int] = Query(None),
     year:     Optional[int] = Query(None),
     category: Optional[str] = Query(None),
     bank:     Optional[str] = Query(None),
+    q:        Optional[str] = Query(None, max_length=200, description="Search description/bank (prefix + fuzzy, ranked)"),
+    limit:    Optional[int] = Query(None, ge=1, le=1000),
+    offset:   int           = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
     supa = Depends(get_current_supabase),
 ):
     try:
+        if q and q.strip():
+            rows = _search_transactions(
+                supa, q, month, year, category, bank,
+                limit or SEARCH_DEFAULT_LIMIT, offset,
+            )
+            return fast_json_response(request, _project(rows))
+
         query = (
             supa.table("transaction")
-            .select("*")
+            .select(_READ_COLUMNS)
             .order("date", desc=True)
             .order("id", desc=True)
         )
@@ -45,15 +120,23 @@ def list_transactions(
         elif month:
             # Month-only filter: fetch all and filter in Python (uncommon case)
             result = query.execute()
-            return [r for r in result.data if date.fromisoformat(r["date"]).month == month]
+            rows = [r for r in result.data if date.fromisoformat(r["date"]).month == month]
+            rows = rows[offset:offset + limit] if limit else rows[offset:]
+            return fast_json_response(request, rows)
 
         if category:
             query = query.eq("category", category)
         if bank:
             query = query.ilike("bank", f"%{bank}%")
+        if limit:
+            query = query.range(offset, offset + limit - 1)
+        elif offset:
+            # No limit: every row from offset on
+            query = query.offset(offset)
 
+        # Rows come straight from PostgREST — skip response_model revalidation
         result = query.execute()
-        return result.data
+        return fast_json_response(request, result.data)
 
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -66,10 +149,14 @@ def create_transaction(
     supa = Depends(get_current_supabase),
 ):
     try:
-        payload = {**data.model_dump(), "user_id": current_user.id, "email_id": "manual"}
+        payload = {**data.model_dump(), "user_id": current_user.id, "email_id": "manual",
+                   "category_source": "user"}
         if isinstance(payload.get("date"), date):
             payload["date"] = str(payload["date"])
+        payload["merchant_id"] = resolve_merchant(current_user.id, payload["description"])
         result = supa.table("transaction").insert(payload).execute()
+        invalidate_user(current_user.id)
+        publish_transactions(current_user.id, "api", added=result.data)
         return result.data[0]
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -99,13 +186,38 @@ def update_transaction(
     supa = Depends(get_current_supabase),
 ):
     try:
-        check = supa.table("transaction").select("id").eq("id", txn_id).execute()
+        check = (
+            supa.table("transaction")
+            .select("id,description,category,date,amount,currency")
+            .eq("id", txn_id)
+            .execute()
+        )
         if not check.data:
             raise HTTPException(404, "Transaction not found")
         update_dict = data.model_dump(exclude_unset=True)
         if "date" in update_dict and isinstance(update_dict["date"], date):
             update_dict["date"] = str(update_dict["date"])
+        if "description" in update_dict:
+            update_dict["merchant_id"] = resolve_merchant(current_user.id, update_dict["description"])
+        if "category" in update_dict:
+            update_dict["category_source"] = "user"
         result = supa.table("transaction").update(update_dict).eq("id", txn_id).execute()
+        if not result.data:
+            # Deleted between the check and the update: nothing changed
+            raise HTTPException(404, "Transaction not found")
+        invalidate_user(current_user.id)
+        before = check.data[0]
+        publish_transactions(current_user.id, "api", added=result.data, removed=[before])
+
+        # Category corrections are training signal for the local categorizer
+        if "category" in update_dict:
+            record_correction(
+                current_user.id,
+                before["description"],
+                before["category"],
+                update_dict.get("description") or before["description"],
+                update_dict["category"],
+            )
         return result.data[0]
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -118,9 +230,17 @@ def delete_transaction(
     supa = Depends(get_current_supabase),
 ):
     try:
-        check = supa.table("transaction").select("id").eq("id", txn_id).execute()
+        # The row's amount/date/category feed the change event's deltas
+        check = (
+            supa.table("transaction")
+            .select("id,date,amount,currency,category")
+            .eq("id", txn_id)
+            .execute()
+        )
         if not check.data:
             raise HTTPException(404, "Transaction not found")
         supa.table("transaction").delete().eq("id", txn_id).execute()
+        invalidate_user(current_user.id)
+        publish_transactions(current_user.id, "api", removed=check.data)
     except APIError as e:
         raise HTTPException(status_code=400, detail=str(e))
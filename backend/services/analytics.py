@@ -0,0 +1,327 @@
+"""
+Columnar analytics over a user's whole transaction history.
+
+A user's transactions are loaded once into compact NumPy columns
+(TransactionColumns) and every report is a handful of vectorized group-bys
+(np.bincount over month/category codes) — no per-row Python loops, so ten
+years of history costs about the same as one.
+
+Amounts are converted to USD at each transaction's own date (fx_rates), so
+multi-year comparisons aren't distorted by today's rate.
+
+Loaded columns are kept in the dashboard result cache under the "columns"
+endpoint, which means transaction writes and syncs invalidate them along with
+every other dashboard payload.
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+
+from models import CATEGORIES
+from services import fx_rates
+from services.dashboard_cache import cache_key, dashboard_cache
+
+PAGE_SIZE = 1000          # PostgREST's default max-rows per response
+MAX_BUCKETS = 2000        # caps dense series length (~5.5 years of daily buckets)
+BUCKETS = ("day", "week", "month", "quarter")
+GROUP_BY = ("category", "bank", "currency")
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+class TransactionColumns:
+    """One user's transactions as parallel arrays, sorted by date."""
+
+    __slots__ = ("day", "month", "amount", "usd", "currency_code", "category_code",
+                 "currencies", "categories")
+
+    def __init__(self, rows: list[dict]):
+        n = len(rows)
+        self.day = fx_rates.to_epoch_days([r["date"] for r in rows]).astype(np.int32)
+        # Months since 1970-01 — the bucket key for every monthly report
+        self.month = (self.day.astype("datetime64[D]").astype("datetime64[M]")
+                      .astype(np.int32))
+        self.amount = np.fromiter((r["amount"] for r in rows), dtype=np.float64, count=n)
+
+        currency_labels = [r["currency"] for r in rows]
+        self.usd = fx_rates.convert_batch(
+            self.amount, currency_labels, [r["date"] for r in rows], to_currency="USD",
+        )
+        self.currencies, codes = np.unique(np.asarray(currency_labels, dtype=object),
+                                           return_inverse=True)
+        self.currency_code = codes.astype(np.int8)
+
+        # Known categories keep their CATEGORIES position; anything else is appended.
+        # Only the distinct labels are looked up, then mapped back with one gather.
+        labels, inverse = np.unique(np.asarray([r["category"] for r in rows], dtype=object),
+                                    return_inverse=True)
+        vocab = list(CATEGORIES)
+        for label in labels.tolist():
+            if label not in vocab:
+                vocab.append(label)
+        remap = np.array([vocab.index(label) for label in labels.tolist()], dtype=np.int16)
+        self.category_code = remap[inverse] if n else np.empty(0, dtype=np.int16)
+        self.categories = vocab
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, a).nbytes for a in
+                   ("day", "month", "amount", "usd", "currency_code", "category_code"))
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+
+def _fetch_all_rows(
+    supa,
+    columns: str = "date,amount,currency,category",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> list[dict]:
+    """One logical query, paged past PostgREST's row cap. date_to is exclusive."""
+    rows: list[dict] = []
+    start = 0
+    while True:
+        query = supa.table("transaction").select(columns)
+        if date_from:
+            query = query.gte("date", date_from)
+        if date_to:
+            query = query.lt("date", date_to)
+        page = (
+            query.order("date")
+            .order("id")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        ).data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def load_columns(user_id: int, supa_factory) -> TransactionColumns:
+    """Return the user's cached columns, loading them on a miss.
+    supa_factory is only called on a miss (it costs a set_config round trip)."""
+    return dashboard_cache.get_or_compute(
+        cache_key(user_id, "columns", None, None, fx_rates.version()),
+        lambda: TransactionColumns(_fetch_all_rows(supa_factory())),
+    )
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+def _month_label(month_idx: int) -> str:
+    year, m = divmod(int(month_idx), 12)
+    return f"{1970 + year}-{m + 1:02d}"
+
+
+def _month_span(cols: TransactionColumns) -> tuple[int, int]:
+    """First month index and number of months, gap-filled to the full span."""
+    first, last = int(cols.month.min()), int(cols.month.max())
+    return first, last - first + 1
+
+
+def _monthly(cols: TransactionColumns, values: np.ndarray, mask: np.ndarray,
+             first: int, n: int) -> np.ndarray:
+    return np.bincount(cols.month[mask] - first, weights=values[mask], minlength=n)
+
+
+def _rolling_mean(series: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean; NaN until a full window is available."""
+    out = np.full(series.shape, np.nan)
+    if len(series) >= window:
+        csum = np.cumsum(np.insert(series, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def _clean(values: np.ndarray, digits: int = 2) -> list[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+# ── Reports ───────────────────────────────────────────────────────────────────
+
+def year_over_year(cols: TransactionColumns, year: int) -> list[dict]:
+    """Monthly expenses (USD) for year vs year-1, with percent change."""
+    expense = cols.usd < 0
+    month_of_year = cols.month % 12
+    year_of = cols.month // 12 + 1970
+
+    this = np.bincount(month_of_year[expense & (year_of == year)],
+                       weights=-cols.usd[expense & (year_of == year)], minlength=12)
+    prev = np.bincount(month_of_year[expense & (year_of == year - 1)],
+                       weights=-cols.usd[expense & (year_of == year - 1)], minlength=12)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(prev > 0, (this - prev) / prev * 100, np.nan)
+
+    return [
+        {
+            "month":          MONTH_NAMES[m],
+            "month_num":      m + 1,
+            "expenses":       round(float(this[m]), 2),
+            "prev_expenses":  round(float(prev[m]), 2),
+            "change_pct":     _clean(change[m:m + 1], 1)[0],
+        }
+        for m in range(12)
+    ]
+
+
+def rolling_averages(cols: TransactionColumns, windows: tuple[int, ...] = (3, 6, 12)) -> list[dict]:
+    """Monthly expenses (USD) across the whole history with trailing averages."""
+    if not len(cols):
+        return []
+    first, n = _month_span(cols)
+    expenses = _monthly(cols, -cols.usd, cols.usd < 0, first, n)
+    rolling = {w: _clean(_rolling_mean(expenses, w)) for w in windows}
+
+    return [
+        {
+            "month":    _month_label(first + i),
+            "expenses": round(float(expenses[i]), 2),
+            **{f"avg_{w}m": rolling[w][i] for w in windows},
+        }
+        for i in range(n)
+    ]
+
+
+def category_share(cols: TransactionColumns) -> dict:
+    """Per-month share (%) of expenses by category across the whole history."""
+    if not len(cols):
+        return {"months": [], "categories": [], "shares": {}}
+    first, n = _month_span(cols)
+    ncat = len(cols.categories)
+    expense = cols.usd < 0
+
+    flat = (cols.month[expense] - first) * ncat + cols.category_code[expense]
+    matrix = np.bincount(flat, weights=-cols.usd[expense], minlength=n * ncat).reshape(n, ncat)
+    totals = matrix.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals > 0, matrix / totals * 100, 0.0)
+
+    used = np.flatnonzero(matrix.sum(axis=0) > 0)
+    return {
+        "months":     [_month_label(first + i) for i in range(n)],
+        "categories": [cols.categories[c] for c in used],
+        "shares":     {cols.categories[c]: _clean(shares[:, c], 1) for c in used},
+    }
+
+
+def savings_rate(cols: TransactionColumns) -> list[dict]:
+    """Per-month income, expenses and savings rate ((income - expenses) / income)."""
+    if not len(cols):
+        return []
+    first, n = _month_span(cols)
+    income   = _monthly(cols, cols.usd, cols.usd > 0, first, n)
+    expenses = _monthly(cols, -cols.usd, cols.usd < 0, first, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(income > 0, (income - expenses) / income * 100, np.nan)
+
+    rates = _clean(rate, 1)
+    return [
+        {
+            "month":        _month_label(first + i),
+            "income":       round(float(income[i]), 2),
+            "expenses":     round(float(expenses[i]), 2),
+            "savings_rate": rates[i],
+        }
+        for i in range(n)
+    ]
+
+
+# ── Arbitrary range / bucket aggregation ─────────────────────────────────────
+
+def bucket_index(days: np.ndarray, bucket: str) -> np.ndarray:
+    """Epoch days → bucket number. Weeks start on Monday (1970-01-01 was a Thursday)."""
+    days = np.asarray(days, dtype=np.int64)
+    if bucket == "day":
+        return days
+    if bucket == "week":
+        return (days + 3) // 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return months if bucket == "month" else months // 3
+
+
+def bucket_starts(first: int, n: int, bucket: str) -> list[str]:
+    """ISO start date of n consecutive buckets beginning at bucket number first."""
+    idx = np.arange(first, first + n, dtype=np.int64)
+    if bucket == "day":
+        starts = idx.astype("datetime64[D]")
+    elif bucket == "week":
+        starts = (idx * 7 - 3).astype("datetime64[D]")
+    else:
+        months = idx if bucket == "month" else idx * 3
+        starts = months.astype("datetime64[M]").astype("datetime64[D]")
+    return starts.astype(str).tolist()
+
+
+def bucket_count(start: date, end: date, bucket: str) -> int:
+    first, last = bucket_index(fx_rates.to_epoch_days([start, end]), bucket)
+    return int(last - first + 1)
+
+
+def aggregate(
+    rows: list[dict],
+    start: date,
+    end: date,
+    bucket: str,
+    group_by: Optional[str] = None,
+    fx: str = "current",
+) -> dict:
+    """
+    Dense, gap-filled income/expense series (USD) between start and end
+    (inclusive), bucketed by day/week/month/quarter and optionally split by
+    category, bank or currency. One pass: one batch conversion plus bincounts.
+    """
+    first, last = bucket_index(fx_rates.to_epoch_days([start, end]), bucket)
+    n = int(last - first + 1)
+
+    dates = [r["date"] for r in rows]
+    usd = fx_rates.convert_batch(
+        [r["amount"] for r in rows], [r["currency"] for r in rows],
+        dates=dates if fx == "historical" else None, to_currency="USD",
+    )
+    pos = bucket_index(fx_rates.to_epoch_days(dates), bucket) - first
+    income, expense = usd > 0, usd < 0
+
+    income_totals  = np.bincount(pos[income], weights=usd[income], minlength=n)
+    expense_totals = np.bincount(pos[expense], weights=-usd[expense], minlength=n)
+    result = {
+        "from":     start.isoformat(),
+        "to":       end.isoformat(),
+        "bucket":   bucket,
+        "group_by": group_by,
+        "fx_mode":  fx,
+        "buckets":  bucket_starts(int(first), n, bucket),
+        "totals": {
+            "income":   np.round(income_totals, 2).tolist(),
+            "expenses": np.round(expense_totals, 2).tolist(),
+            "net":      np.round(income_totals - expense_totals, 2).tolist(),
+        },
+    }
+
+    if group_by:
+        labels, codes = np.unique(np.asarray([r[group_by] for r in rows], dtype=object),
+                                  return_inverse=True)
+        k = len(labels)
+        flat = codes * n + pos
+        by_income  = np.bincount(flat[income], weights=usd[income], minlength=k * n).reshape(k, n)
+        by_expense = np.bincount(flat[expense], weights=-usd[expense], minlength=k * n).reshape(k, n)
+        order = np.argsort(-by_expense.sum(axis=1), kind="stable")
+        result["series"] = [
+            {
+                "key":      labels[g],
+                "income":   np.round(by_income[g], 2).tolist(),
+                "expenses": np.round(by_expense[g], 2).tolist(),
+            }
+            for g in order.tolist()
+        ]
+    return result
+
+
+def fetch_range(supa, start: date, end: date, group_by: Optional[str]) -> list[dict]:
+    columns = "date,amount,currency" + (f",{group_by}" if group_by else "")
+    return _fetch_all_rows(supa, columns, start.isoformat(),
+                           (end + timedelta(days=1)).isoformat())
@@ -0,0 +1,341 @@
+"""
+Local learned transaction categorizer (hashed n-grams + multinomial Naive Bayes).
+
+Trained from the stored (description, category) pairs in the transaction
+table — so user corrections made through PUT /api/transactions/{id} become
+training signal — and updated incrementally after every sync from the
+LLM's labels. Never from its own predictions, which would reinforce them:
+rows it labelled carry category_source = "model" and are left out. A global
+model learns from everyone; a small per-user model learns each user's own
+habits (e.g. "TRANSF YAPE" is rent for one user and restaurants for another).
+Both are combined as a product of experts at prediction time. At most
+CATEGORIZER_MAX_USER_MODELS per-user models stay in memory (least recently
+used dropped); a dropped one is rebuilt from the table on the user's next sync.
+
+Prediction is one hash pass over the description plus a fancy-indexed sum
+over a dense log-likelihood matrix: tens of microseconds, no network.
+
+sync_job uses it according to CATEGORIZER_MODE:
+  off       (default) LLM categories are kept as-is
+  override  the local label replaces the LLM's when the local
+            model's confidence is >= CATEGORIZER_MIN_CONFIDENCE
+  local     categorization is dropped from the Claude prompt entirely; the
+            local model labels every transaction, falling back to "other"
+            below the confidence threshold
+
+Models live in memory and are rebuilt from the database on first use after a
+restart; rebuilding is a single vectorized np.add.at over all pairs.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from models import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+MODE            = os.getenv("CATEGORIZER_MODE", "off").lower()
+MIN_CONFIDENCE  = float(os.getenv("CATEGORIZER_MIN_CONFIDENCE", "0.85"))
+GLOBAL_FEATURES = 1 << 18
+USER_FEATURES   = 1 << 12      # per-user models stay small (~180 KB each)
+MAX_USER_MODELS = int(os.getenv("CATEGORIZER_MAX_USER_MODELS", "500"))
+MIN_USER_EXAMPLES = 5
+CORRECTION_WEIGHT = 3.0        # a manual correction counts as three examples
+ALPHA = 0.1                    # additive smoothing
+
+_CLASS_INDEX = {c: i for i, c in enumerate(CATEGORIES)}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_DIGITS = re.compile(r"\d+")
+
+
+# ── Features ──────────────────────────────────────────────────────────────────
+
+def normalize(text: str) -> str:
+    """'Wóng.PE  S.Isidro #123' → 'wong pe s isidro 0'"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _DIGITS.sub("0", text)
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def hashed_features(text: str) -> np.ndarray:
+    """Word unigrams + char 3-grams of each padded word, crc32-hashed (stable across processes)."""
+    feats = []
+    for word in normalize(text).split():
+        feats.append(zlib.crc32(b"w:" + word.encode()))
+        padded = f" {word} ".encode()
+        for i in range(len(padded) - 2):
+            feats.append(zlib.crc32(padded[i:i + 3]))
+    return np.asarray(feats, dtype=np.int64)
+
+
+# ── Model ─────────────────────────────────────────────────────────────────────
+
+class NaiveBayes:
+    """Multinomial NB over hashed features with incremental (partial) fitting."""
+
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.counts = np.zeros((len(CATEGORIES), n_features), dtype=np.float32)
+        self.class_counts = np.zeros(len(CATEGORIES), dtype=np.float64)
+        self.examples = 0.0
+        self._log_prior: Optional[np.ndarray] = None
+        self._log_lik: Optional[np.ndarray] = None
+
+    def update(self, feats: np.ndarray, cls: int, weight: float) -> None:
+        np.add.at(self.counts[cls], feats % self.n_features, weight)
+        if weight < 0:   # withdrawing an example that may never have been learned
+            np.maximum(self.counts[cls], 0.0, out=self.counts[cls])
+        self.class_counts[cls] += weight
+        self.examples += weight
+        self._log_lik = None
+
+    def fit_bulk(self, feature_lists: list[np.ndarray], classes: np.ndarray) -> None:
+        if not feature_lists:
+            return
+        lengths = np.fromiter((len(f) for f in feature_lists), dtype=np.int64, count=len(feature_lists))
+        rows = np.repeat(classes, lengths)
+        cols = np.concatenate(feature_lists) % self.n_features
+        np.add.at(self.counts, (rows, cols), 1.0)
+        self.class_counts += np.bincount(classes, minlength=len(CATEGORIES))
+        self.examples += len(classes)
+        self._log_lik = None
+
+    def _refresh(self) -> None:
+        totals = self.counts.sum(axis=1, keepdims=True) + ALPHA * self.n_features
+        self._log_lik = np.log((self.counts + ALPHA) / totals).astype(np.float32)
+        self._log_prior = np.log((self.class_counts + 1.0) / (self.class_counts.sum() + len(CATEGORIES)))
+
+    def joint_log_likelihood(self, feats: np.ndarray) -> np.ndarray:
+        if self._log_lik is None:
+            self._refresh()
+        return self._log_prior + self._log_lik[:, feats % self.n_features].sum(axis=1)
+
+
+class Categorizer:
+    def __init__(self, max_user_models: int = MAX_USER_MODELS):
+        self.global_model = NaiveBayes(GLOBAL_FEATURES)
+        self.user_models: OrderedDict[int, NaiveBayes] = OrderedDict()   # least recently used first
+        self.evicted: set[int] = set()   # users whose model was dropped, until restore_user()
+        self.max_user_models = max_user_models
+        self.trained = False
+        self._lock = threading.RLock()
+
+    def _user_model(self, user_id: int) -> Optional[NaiveBayes]:
+        """The user's model (created if new), or None if it was evicted — an
+        update to an empty stand-in would be lost at restore_user()."""
+        model = self.user_models.get(user_id)
+        if model is not None:
+            self.user_models.move_to_end(user_id)
+            return model
+        if user_id in self.evicted:
+            return None
+        model = self.user_models[user_id] = NaiveBayes(USER_FEATURES)
+        self._evict()
+        return model
+
+    def _evict(self) -> None:
+        while len(self.user_models) > self.max_user_models:
+            user_id, _ = self.user_models.popitem(last=False)
+            self.evicted.add(user_id)
+
+    # ── Training ──────────────────────────────────────────────────────────────
+    def fit(self, pairs: Iterable[tuple[int, str, str]]) -> int:
+        """(Re)build all models from (user_id, description, category) triples.
+        Users past max_user_models get no model until restore_user()."""
+        by_user: dict[int, tuple[list, list]] = {}
+        all_feats, all_classes = [], []
+        for user_id, description, category in pairs:
+            cls = _CLASS_INDEX.get(category)
+            if cls is None or not description:
+                continue
+            feats = hashed_features(description)
+            all_feats.append(feats)
+            all_classes.append(cls)
+            u = by_user.setdefault(user_id, ([], []))
+            u[0].append(feats)
+            u[1].append(cls)
+
+        with self._lock:
+            self.global_model = NaiveBayes(GLOBAL_FEATURES)
+            self.global_model.fit_bulk(all_feats, np.asarray(all_classes, dtype=np.int64))
+            self.user_models, self.evicted = OrderedDict(), set()
+            for user_id, (feats, classes) in by_user.items():
+                if len(self.user_models) >= self.max_user_models:
+                    self.evicted.add(user_id)
+                    continue
+                self._user_model(user_id).fit_bulk(feats, np.asarray(classes, dtype=np.int64))
+            self.trained = True
+        return len(all_classes)
+
+    def restore_user(self, user_id: int, pairs: Iterable[tuple[int, str, str]]) -> None:
+        """Rebuild an evicted user's model from their (user_id, description,
+        category) triples."""
+        feats, classes = [], []
+        for _, description, category in pairs:
+            cls = _CLASS_INDEX.get(category)
+            if cls is not None and description:
+                feats.append(hashed_features(description))
+                classes.append(cls)
+        model = NaiveBayes(USER_FEATURES)
+        model.fit_bulk(feats, np.asarray(classes, dtype=np.int64))
+        with self._lock:
+            self.evicted.discard(user_id)
+            self.user_models[user_id] = model
+            self._evict()
+
+    def learn(self, user_id: int, description: str, category: str, weight: float = 1.0) -> None:
+        cls = _CLASS_INDEX.get(category)
+        if cls is None or not description:
+            return
+        feats = hashed_features(description)
+        with self._lock:
+            self.global_model.update(feats, cls, weight)
+            user = self._user_model(user_id)
+            if user is not None:
+                user.update(feats, cls, weight)
+
+    def relabel(self, user_id: int, old_description: str, old: Optional[str],
+                new_description: str, new: str, weight: float = CORRECTION_WEIGHT) -> None:
+        """A user corrected (old_description, old) → (new_description, new):
+        withdraw the old example, add the new one weighted."""
+        with self._lock:
+            if old in _CLASS_INDEX and old_description:
+                feats = hashed_features(old_description)
+                cls = _CLASS_INDEX[old]
+                for model in (self.global_model, self._user_model(user_id)):
+                    if model is not None and model.class_counts[cls] >= 1.0:
+                        model.update(feats, cls, -1.0)
+            self.learn(user_id, new_description, new, weight)
+
+    # ── Prediction ────────────────────────────────────────────────────────────
+    def predict(self, description: str, user_id: Optional[int] = None) -> tuple[str, float]:
+        """Return (category, confidence in [0, 1])."""
+        feats = hashed_features(description)
+        if not len(feats) or not self.global_model.examples:
+            return "other", 0.0
+        with self._lock:
+            joint = self.global_model.joint_log_likelihood(feats)
+            user = self.user_models.get(user_id) if user_id is not None else None
+            if user is not None:
+                self.user_models.move_to_end(user_id)
+            if user is not None and user.examples >= MIN_USER_EXAMPLES:
+                joint = joint + user.joint_log_likelihood(feats)
+        joint = joint - joint.max()
+        probs = np.exp(joint)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return CATEGORIES[best], float(probs[best])
+
+
+categorizer = Categorizer()
+
+
+# ── DB integration ────────────────────────────────────────────────────────────
+
+def load_pairs(user_id: Optional[int] = None) -> list[tuple[int, str, str]]:
+    """Stored (user_id, description, category) triples labelled by the LLM or
+    a user — never by this model — of everyone or one user (direct DB,
+    bypasses RLS)."""
+    from sqlmodel import Session, select
+    from database import engine
+    from models import Transaction
+
+    query = (
+        select(Transaction.user_id, Transaction.description, Transaction.category)
+        .where(Transaction.category_source != "model")
+    )
+    if user_id is not None:
+        query = query.where(Transaction.user_id == user_id)
+    with Session(engine) as session:
+        return list(session.exec(query).all())
+
+
+def ensure_trained(user_id: Optional[int] = None) -> None:
+    """Train on first use; also rebuild user_id's model if it was evicted."""
+    if not categorizer.trained:
+        with categorizer._lock:
+            if not categorizer.trained:
+                t0 = time.perf_counter()
+                n = categorizer.fit(load_pairs())
+                logger.info("Categorizer trained on %d pair(s) in %.2fs", n, time.perf_counter() - t0)
+    if user_id is not None and user_id in categorizer.evicted:
+        categorizer.restore_user(user_id, load_pairs(user_id))
+
+
+def apply_to_extracted(user_id: int, txns: list[dict]) -> int:
+    """
+    Apply CATEGORIZER_MODE to freshly extracted transactions (in place).
+    Categories set here are marked category_source = "model". Returns how
+    many categories were set or replaced locally.
+    """
+    if MODE == "off" or not txns:
+        return 0
+    ensure_trained(user_id)
+    changed = 0
+    for txn in txns:
+        label, confidence = categorizer.predict(str(txn.get("description", "")), user_id)
+        if MODE == "local":
+            txn["category"] = label if confidence >= MIN_CONFIDENCE else "other"
+        elif confidence >= MIN_CONFIDENCE and label != txn.get("category"):
+            txn["category"] = label
+        else:
+            continue
+        txn["category_source"] = "model"
+        changed += 1
+    return changed
+
+
+def record_correction(user_id: int, old_description: str, old: Optional[str],
+                      new_description: str, new: str) -> None:
+    """Called on manual category edits. No-op until the model has been trained —
+    the correction is in the table and will be picked up by the first fit()."""
+    if categorizer.trained and (old_description, old) != (new_description, new):
+        categorizer.relabel(user_id, old_description, old, new_description, new)
+
+
+# ── Evaluation ────────────────────────────────────────────────────────────────
+
+def evaluate(pairs: list[tuple[int, str, str]], holdout: float = 0.2, seed: int = 0) -> dict:
+    """Train on a random split, report accuracy and per-prediction latency on the rest."""
+    pairs = [p for p in pairs if p[2] in _CLASS_INDEX and p[1]]
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(pairs))
+    n_test = max(1, int(len(pairs) * holdout)) if pairs else 0
+    test = [pairs[i] for i in order[:n_test]]
+    train = [pairs[i] for i in order[n_test:]]
+
+    model = Categorizer()
+    t0 = time.perf_counter()
+    model.fit(train)
+    train_s = time.perf_counter() - t0
+    model.predict("warmup")  # builds log-likelihood tables
+
+    correct = confident = confident_correct = 0
+    t0 = time.perf_counter()
+    for user_id, description, category in test:
+        label, conf = model.predict(description, user_id)
+        correct += label == category
+        if conf >= MIN_CONFIDENCE:
+            confident += 1
+            confident_correct += label == category
+    predict_s = time.perf_counter() - t0
+
+    return {
+        "train_examples":       len(train),
+        "test_examples":        len(test),
+        "accuracy":             round(correct / len(test), 4) if test else None,
+        "coverage_at_threshold": round(confident / len(test), 4) if test else None,
+        "accuracy_at_threshold": round(confident_correct / confident, 4) if confident else None,
+        "threshold":            MIN_CONFIDENCE,
+        "train_seconds":        round(train_s, 3),
+        "predict_us_mean":      round(predict_s / len(test) * 1e6, 1) if test else None,
+    }
@@ -0,0 +1,178 @@
+"""
+Bounded in-process LRU cache for computed dashboard payloads.
+
+Keys are (user_id, endpoint, month, year, rate_version). Entries are dropped
+when the owning user writes transactions/budgets or a sync adds rows, so a
+cached payload is never staler than the last write seen by this process.
+
+Memory is bounded two ways (both configurable via env):
+  DASHBOARD_CACHE_MAX_ENTRIES — max number of cached payloads
+  DASHBOARD_CACHE_MAX_BYTES   — max total size, estimated from the JSON encoding
+
+NOTE: the cache is per process. With several uvicorn workers each worker keeps
+its own copy, and a write only invalidates the worker that served it — keep
+DASHBOARD_CACHE_MAX_ENTRIES=0 (disabled) in that setup until invalidation is
+shared.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "2048"))
+MAX_BYTES   = int(os.getenv("DASHBOARD_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def _estimate_size(value: Any) -> int:
+    nbytes = getattr(value, "nbytes", None)   # columnar payloads (services.analytics)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class DashboardCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self._entries: "OrderedDict[tuple, tuple[Any, int]]" = OrderedDict()
+        self._by_user: dict[int, set[tuple]] = {}
+        # Bumped by invalidate_user (per user) and clear() (_epoch); a payload
+        # computed across a bump is stale
+        self._generation: dict[int, int] = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock  = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    # ── Internal (call with lock held) ────────────────────────────────────────
+    def _drop(self, key: tuple) -> None:
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        user_keys = self._by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._by_user[key[0]]
+
+    def _evict_overflow(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self, user_id: int) -> int:
+        # Both counters only grow, so any bump changes the sum
+        with self._lock:
+            return self._epoch + self._generation.get(user_id, 0)
+
+    def put(self, key: tuple, value: Any, generation: Optional[int] = None) -> None:
+        """Store value. With generation (from generation()), the value is
+        dropped if the user was invalidated since — it was computed from
+        data older than that write."""
+        if not self.enabled:
+            return
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and self._epoch + self._generation.get(key[0], 0) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size)
+            self._by_user.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            self._evict_overflow()
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Return the cached payload for key, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        generation = self.generation(key[0])
+        value = compute()
+        self.put(key, value, generation)
+        return value
+
+    def invalidate_user(self, user_id: int, endpoints: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop a user's cached payloads. With endpoints, only those endpoints are
+        dropped (e.g. a budget write only affects budget-status).
+        Returns the number of entries removed.
+        """
+        wanted = set(endpoints) if endpoints is not None else None
+        with self._lock:
+            self._generation[user_id] = self._generation.get(user_id, 0) + 1
+            keys = [
+                k for k in self._by_user.get(user_id, ())
+                if wanted is None or k[1] in wanted
+            ]
+            for k in keys:
+                self._drop(k)
+            self.invalidations += len(keys)
+        if keys:
+            logger.debug("Dashboard cache: dropped %d entries for user %d", len(keys), user_id)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._bytes = 0
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries":       len(self._entries),
+                "bytes":         self._bytes,
+                "max_entries":   self.max_entries,
+                "max_bytes":     self.max_bytes,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "hit_ratio":     round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions":     self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+dashboard_cache = DashboardCache()
+
+
+def cache_key(user_id: int, endpoint: str, month: Optional[int], year: Optional[int],
+              rate_version: Hashable) -> tuple:
+    return (user_id, endpoint, month, year, rate_version)
+
+
+def invalidate_user(user_id: int, endpoints: Optional[Iterable[str]] = None) -> int:
+    return dashboard_cache.invalidate_user(user_id, endpoints)
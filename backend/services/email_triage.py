@@ -0,0 +1,102 @@
+"""
+Metadata-only triage of bank emails (subject + snippet), before full download.
+
+Bank senders also send marketing, security notices and product news. Those
+used to be downloaded with format="full", cleaned and sent to Claude only to
+come back as []. classify() looks at the From/Subject headers and the Gmail
+snippet and decides whether a message is worth extracting:
+
+  1. a matching "transactional" pattern wins (consumo, transferencia, ...)
+  2. otherwise a matching "skip" pattern marks it non-transactional
+  3. anything else is treated as transactional — an unknown format costs one
+     extraction, a wrong skip loses a transaction
+
+Rules are per bank, keyed by a substring of the From header, on top of the
+generic rules. TRIAGE_RULES_FILE may point to a JSON file of the form
+{"<sender substring>": {"transactional": [regex, ...], "skip": [regex, ...]}}
+whose patterns are added to (or create) that sender's rules.
+TRIAGE_ENABLED=false sends every message to extraction as before.
+"""
+import json
+import logging
+import os
+import re
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED    = os.getenv("TRIAGE_ENABLED", "true").lower() not in ("0", "false", "no")
+RULES_FILE = os.getenv("TRIAGE_RULES_FILE", "")
+
+GENERIC_RULES: dict[str, list[str]] = {
+    "transactional": [
+        r"\bconsumo\b", r"\bcompra\b", r"\bcargo\b", r"\bpago (de|a|realizado|exitoso)",
+        r"\btransferencia", r"\babono", r"\bdep[oó]sito", r"\bretiro",
+        r"\boperaci[oó]n (realizada|exitosa)", r"\bconstancia", r"\bdevoluci[oó]n",
+        r"\byape", r"\bplin\b", r"(S/\.?|US\$|\$)\s?\d",
+    ],
+    "skip": [
+        r"\bpromoci[oó]n", r"\bofertas?\b", r"\bdescuentos?\b", r"\bsorteo", r"\bgana\b",
+        r"\bbeneficios?\b", r"\bnovedades\b", r"\bbolet[ií]n", r"\bnewsletter",
+        r"\bactualiza(r)? tus datos", r"\bc[oó]digo de verificaci[oó]n", r"\bclave din[aá]mica",
+        r"\binicio de sesi[oó]n", r"\bnuevo dispositivo", r"\bcambio de (clave|contrase[nñ]a)",
+        r"\bt[eé]rminos y condiciones", r"\bencuesta", r"\bprecalificad", r"\bpr[eé]stamo aprobado",
+    ],
+}
+
+SENDER_RULES: dict[str, dict[str, list[str]]] = {
+    "bcp.com.pe":  {"transactional": [r"\bconstancia de"], "skip": [r"\bbcp te (invita|regala)"]},
+    "interbank":   {"transactional": [r"\bconstancia de"], "skip": [r"\binterbank benefit", r"\bcine ?planet"]},
+    "bbva":        {"transactional": [r"\bhas realizado"], "skip": [r"\bbbva te (invita|regala)"]},
+    "scotiabank":  {"transactional": [r"\bhas realizado"], "skip": [r"\bscotia ?puntos"]},
+}
+
+
+def _compile(patterns: list[str]) -> Optional[re.Pattern]:
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+def _load_rules() -> tuple[dict, dict[str, dict]]:
+    sender_rules = {k: {kind: list(v) for kind, v in r.items()} for k, r in SENDER_RULES.items()}
+    if RULES_FILE:
+        try:
+            with open(RULES_FILE) as f:
+                extra = json.load(f)
+            for sender, rules in extra.items():
+                merged = sender_rules.setdefault(sender.lower(), {"transactional": [], "skip": []})
+                for kind in ("transactional", "skip"):
+                    merged.setdefault(kind, []).extend(rules.get(kind, []))
+            logger.info("Loaded triage rules for %d sender(s) from %s", len(extra), RULES_FILE)
+        except (OSError, ValueError) as exc:
+            logger.error("Could not load TRIAGE_RULES_FILE %s: %s", RULES_FILE, exc)
+
+    generic = {kind: _compile(p) for kind, p in GENERIC_RULES.items()}
+    compiled = {
+        sender: {kind: _compile(rules.get(kind, [])) for kind in ("transactional", "skip")}
+        for sender, rules in sender_rules.items()
+    }
+    return generic, compiled
+
+
+_GENERIC, _SENDERS = _load_rules()
+
+
+def classify(sender: str, subject: str, snippet: str = "") -> tuple[bool, str]:
+    """Return (is_transactional, reason)."""
+    if not ENABLED:
+        return True, "triage_disabled"
+    text = f"{subject}\n{snippet}"
+    sender = sender.lower()
+    rule_sets = [(key, r) for key, r in _SENDERS.items() if key in sender] + [("generic", _GENERIC)]
+
+    for name, rules in rule_sets:
+        pattern = rules.get("transactional")
+        if pattern is not None and pattern.search(text):
+            return True, f"{name}:transactional"
+    for name, rules in rule_sets:
+        pattern = rules.get("skip")
+        if pattern is not None and pattern.search(text):
+            return False, f"{name}:skip"
+    return True, "default"
@@ -0,0 +1,252 @@
+"""
+Per-user change events pushed to open dashboards over Server-Sent Events.
+
+The sync job and the transaction/budget routers publish an event after every
+committed write; GET /api/events (routers/events.py) streams them. Events
+carry precomputed deltas so the dashboard patches only the panels of the
+affected months instead of re-issuing every dashboard query:
+
+  event: transactions
+  data: {"source": "sync" | "api", "months": ["2025-03"],
+         "fx_mode": "current", "exchange_rate": 0.27,
+         "deltas": {"2025-03": {"count": 2,
+                                "pen":       {"income": 0, "expenses": -42.5, "net": -42.5},
+                                "usd":       {...}, "total_usd": {...},
+                                "by_category": {"groceries": 11.48}}}}
+
+  event: budgets
+  data: {"action": "created" | "updated" | "deleted",
+         "budget": {"id": 3, "category": "groceries", "limit": 135.0}}
+
+Deltas mirror the /api/dashboard payloads at fx=current: pen/usd/total_usd
+add to /summary, by_category (positive = more spent) adds to /by-category, to
+budget-status "spent" and — summed — to the month's /monthly-trend point.
+A client whose summary was computed at a different exchange_rate refetches.
+
+Every stream starts with a "ready" event and gets a comment line every
+EVENTS_HEARTBEAT_S. A subscriber that falls EVENTS_QUEUE_SIZE events behind
+gets a single "resync" event instead of the backlog.
+
+NOTE: like services.dashboard_cache, subscriptions are per process — a write
+served by one uvicorn worker only reaches streams held by that worker.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import date
+from typing import AsyncIterator, Iterable, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_S  = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+QUEUE_SIZE   = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+MAX_PER_USER = int(os.getenv("EVENTS_MAX_PER_USER", "5"))
+
+
+def _frame(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+class _Subscriber:
+    __slots__ = ("loop", "queue", "overflowed")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, frame: str) -> None:
+        # Runs on the subscriber's event loop (call_soon_threadsafe)
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(frame)
+
+
+class EventBus:
+    """Thread-safe fan-out: publish from worker threads, consume on the event loop."""
+
+    def __init__(self, max_per_user: int = MAX_PER_USER):
+        self.max_per_user = max_per_user
+        self._subs: dict[int, set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def subscriber_count(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subs.get(user_id, ()))
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return self.subscriber_count(user_id) > 0
+
+    def connected_users(self) -> set[int]:
+        """Users with at least one open stream (i.e. a dashboard open)."""
+        with self._lock:
+            return set(self._subs)
+
+    def subscribe(self, user_id: int) -> _Subscriber:
+        """Register a stream; call from the event loop that will consume it."""
+        sub = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subs.setdefault(user_id, set()).add(sub)
+            total = sum(len(s) for s in self._subs.values())
+        metrics.SSE_CONNECTIONS.set(total)
+        return sub
+
+    def unsubscribe(self, user_id: int, sub: _Subscriber) -> None:
+        with self._lock:
+            subs = self._subs.get(user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[user_id]
+            total = sum(len(s) for s in self._subs.values())
+        metrics.SSE_CONNECTIONS.set(total)
+
+    def publish(self, user_id: int, event: str, data: dict) -> int:
+        """Queue an event for every stream of user_id. Returns the number of streams."""
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+            self._next_id += 1
+            event_id = self._next_id
+        if not subs:
+            return 0
+        frame = _frame(event, data, event_id)
+        delivered = 0
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, frame)
+                delivered += 1
+            except RuntimeError:   # loop closed — the stream is going away
+                continue
+        metrics.SSE_EVENTS.inc(type=event)
+        return delivered
+
+
+bus = EventBus()
+
+
+async def stream(user_id: int) -> AsyncIterator[str]:
+    """SSE body for one connection; unsubscribes when the client goes away."""
+    sub = bus.subscribe(user_id)
+    try:
+        yield _frame("ready", {"heartbeat_s": HEARTBEAT_S})
+        while True:
+            try:
+                frame = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if sub.overflowed:
+                # Too far behind for deltas to be trusted: drop them, refetch
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.overflowed = False
+                yield _frame("resync", {})
+                continue
+            yield frame
+    finally:
+        bus.unsubscribe(user_id, sub)
+
+
+# ── Deltas ────────────────────────────────────────────────────────────────────
+
+def _month_key(value) -> str:
+    return (value.isoformat() if isinstance(value, date) else str(value))[:7]
+
+
+_TOTALS = ("pen", "usd", "total_usd")
+
+
+def _empty_delta() -> dict:
+    d: dict = {k: {"income": 0.0, "expenses": 0.0, "net": 0.0} for k in _TOTALS}
+    return {"count": 0, **d, "by_category": {}}
+
+
+def _add(bucket: dict, amount: float, sign: int) -> None:
+    # The row's own sign picks income/expenses; removing an expense shrinks expenses
+    bucket["income" if amount > 0 else "expenses"] += sign * amount
+    bucket["net"] += sign * amount
+
+
+def transaction_deltas(added: Iterable[dict] = (), removed: Iterable[dict] = ()) -> dict[str, dict]:
+    """
+    Per-month change of the dashboard aggregates caused by adding/removing
+    rows with date, amount, currency and category. Months whose delta is
+    zero everywhere are left out.
+    """
+    from services import fx_rates
+
+    rows = [(r, 1) for r in added] + [(r, -1) for r in removed]
+    if not rows:
+        return {}
+    usd = fx_rates.convert_batch(
+        [r["amount"] for r, _ in rows], [r["currency"] for r, _ in rows], to_currency="USD",
+    ).tolist()
+
+    deltas: dict[str, dict] = {}
+    for (row, sign), amount_usd in zip(rows, usd):
+        d = deltas.setdefault(_month_key(row["date"]), _empty_delta())
+        amount = float(row["amount"])
+        d["count"] += sign
+        if row["currency"] in ("PEN", "USD"):
+            _add(d[row["currency"].lower()], amount, sign)
+        _add(d["total_usd"], amount_usd, sign)
+        if amount < 0:
+            cat = d["by_category"]
+            cat[row["category"]] = cat.get(row["category"], 0.0) + sign * abs(amount_usd)
+
+    out = {}
+    for month, d in deltas.items():
+        for key in _TOTALS:
+            d[key] = {k: round(v, 2) for k, v in d[key].items()}
+        d["by_category"] = {c: round(v, 2) for c, v in d["by_category"].items() if round(v, 2)}
+        # An edit that only touched the description changes nothing here
+        if d["count"] or d["by_category"] or any(any(d[k].values()) for k in _TOTALS):
+            out[month] = d
+    return out
+
+
+# ── Publishing (never fails the write that triggered it) ──────────────────────
+
+def publish_transactions(user_id: int, source: str, added: Iterable[dict] = (),
+                         removed: Iterable[dict] = ()) -> None:
+    """Publish a "transactions" event for committed inserts/updates/deletes."""
+    if not bus.has_subscribers(user_id):
+        return
+    try:
+        from services.exchange_rate import get_exchange_rate
+
+        deltas = transaction_deltas(added, removed)
+        if not deltas:
+            return
+        bus.publish(user_id, "transactions", {
+            "source":        source,
+            "months":        sorted(deltas),
+            "fx_mode":       "current",
+            "exchange_rate": get_exchange_rate("PEN", "USD"),
+            "deltas":        deltas,
+        })
+    except Exception as exc:
+        logger.error("Could not publish transaction event for user %d: %s", user_id, exc)
+
+
+def publish_budget(user_id: int, action: str, budget: dict) -> None:
+    """Publish a "budgets" event; the limit is in USD like budget-status."""
+    if not bus.has_subscribers(user_id):
+        return
+    try:
+        payload = {"id": budget.get("id"), "category": budget["category"]}
+        if action != "deleted":
+            from services import fx_rates
+
+            limit_usd = fx_rates.convert_batch([budget["monthly_limit"]], [budget["currency"]])
+            payload["limit"] = round(float(limit_usd[0]), 2)
+        bus.publish(user_id, "budgets", {"action": action, "budget": payload})
+    except Exception as exc:
+        logger.error("Could not publish budget event for user %d: %s", user_id, exc)
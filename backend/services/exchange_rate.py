@@ -1,25 +1,92 @@
 """Exchange rate service with DB caching and API fallback."""
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
 import httpx
 from sqlmodel import Session, select
 
 from database import engine
-from models import ExchangeRate
+from models import DailyRate, ExchangeRate
+from services.metrics import FX_LOOKUPS
 
 logger = logging.getLogger(__name__)
 
-FALLBACK_RATE = 0.27          # hardcoded last-resort
+# Hardcoded last resort, per pair (the inverse pair uses 1/rate)
+FALLBACK_RATES: dict[tuple[str, str], float] = {("PEN", "USD"): 0.27}
 CACHE_TTL_HOURS = 24
 API_URL = "https://open.er-api.com/v6/latest/{from_currency}"
+# A pair whose API fetch failed isn't fetched again for this long, so an
+# outage or an unknown code ("S/") doesn't cost an HTTP call per request
+MISS_TTL_SECONDS = 600
+
+# (from, to) → monotonic time of the last failed API fetch / of the last
+# lookup that found no rate at all
+_api_failed_at: dict[tuple[str, str], float] = {}
+_unavailable_at: dict[tuple[str, str], float] = {}
+_miss_lock = threading.Lock()
+
+
+def _recent(misses: dict, pair: tuple[str, str]) -> bool:
+    with _miss_lock:
+        return time.monotonic() - misses.get(pair, -MISS_TTL_SECONDS) < MISS_TTL_SECONDS
+
+
+def _note(misses: dict, pair: tuple[str, str]) -> None:
+    with _miss_lock:
+        misses[pair] = time.monotonic()
+
+
+def fetch_exchange_rate(from_currency: str, to_currency: str,
+                        session: Optional[Session] = None) -> float:
+    """
+    Fetch today's rates for from_currency from the API, cache the
+    from_currency → to_currency rate and upsert today's daily rates.
+    Raises on API failure.
+    """
+    url = API_URL.format(from_currency=from_currency)
+    resp = httpx.get(url, timeout=5)
+    resp.raise_for_status()
+    data = resp.json()
+    rate = data["rates"][to_currency]
+
+    record = ExchangeRate(
+        from_currency=from_currency,
+        to_currency=to_currency,
+        rate=rate,
+        fetched_at=datetime.utcnow(),
+    )
+    if session is None:
+        with Session(engine) as own:
+            own.add(record)
+            own.commit()
+    else:
+        session.add(record)
+        session.commit()
+    logger.info("Exchange rate %s→%s fetched: %.6f", from_currency, to_currency, rate)
+
+    # Import here to avoid circular dependency (fx_rates falls back to us)
+    from services.fx_rates import record_daily_rates
+    try:
+        record_daily_rates(from_currency, data["rates"])
+    except Exception as exc:
+        logger.warning("Failed to record daily rates for %s: %s", from_currency, exc)
+    return rate
 
 
 def get_exchange_rate(from_currency: str = "PEN", to_currency: str = "USD") -> float:
     """
     Return the exchange rate from_currency → to_currency.
-    Priority: fresh DB cache → API fetch → stale DB cache → hardcoded fallback.
+    Priority: fresh DB cache → API fetch → stale DB cache → last daily rate
+    → hardcoded per-pair fallback. Raises ExchangeRateUnavailable when the
+    pair has none of these; that answer is cached for MISS_TTL_SECONDS.
     """
+    pair = (from_currency, to_currency)
+    if _recent(_unavailable_at, pair):
+        raise ExchangeRateUnavailable(f"No exchange rate available for {from_currency}→{to_currency}")
+
     with Session(engine) as session:
         cached = session.exec(
             select(ExchangeRate)
@@ -34,35 +101,62 @@ def get_exchange_rate(from_currency: str = "PEN", to_currency: str = "USD") -> f
         if cached:
             age = datetime.utcnow() - cached.fetched_at
             if age < timedelta(hours=CACHE_TTL_HOURS):
+                FX_LOOKUPS.inc(result="hit")
                 return cached.rate
 
         # Try to fetch from API
-        try:
-            url = API_URL.format(from_currency=from_currency)
-            resp = httpx.get(url, timeout=5)
-            resp.raise_for_status()
-            data = resp.json()
-            rate = data["rates"][to_currency]
-
-            record = ExchangeRate(
-                from_currency=from_currency,
-                to_currency=to_currency,
-                rate=rate,
-                fetched_at=datetime.utcnow(),
-            )
-            session.add(record)
-            session.commit()
-            logger.info("Exchange rate %s→%s fetched: %.6f", from_currency, to_currency, rate)
-            return rate
-
-        except Exception as exc:
-            logger.warning("Exchange rate API failed: %s — using cached/fallback", exc)
+        if not _recent(_api_failed_at, pair):
+            try:
+                rate = fetch_exchange_rate(from_currency, to_currency, session)
+                FX_LOOKUPS.inc(result="miss")
+                return rate
+            except Exception as exc:
+                _note(_api_failed_at, pair)
+                logger.warning("Exchange rate API failed: %s — using cached/fallback", exc)
 
         # Stale cache is better than hardcoded
         if cached:
+            FX_LOOKUPS.inc(result="stale")
             return cached.rate
 
-        return FALLBACK_RATE
+        last = _last_daily_rate(session, from_currency, to_currency)
+        if last is not None:
+            FX_LOOKUPS.inc(result="stale")
+            return last
+
+    FX_LOOKUPS.inc(result="fallback")
+    try:
+        return _fallback_rate(from_currency, to_currency)
+    except ExchangeRateUnavailable:
+        _note(_unavailable_at, pair)
+        raise
+
+
+class ExchangeRateUnavailable(LookupError):
+    """No fresh, cached, recorded or hardcoded rate exists for the pair."""
+
+
+def _last_daily_rate(session: Session, from_currency: str, to_currency: str) -> Optional[float]:
+    """Latest recorded daily rate for the pair, or 1/rate of its inverse."""
+    for base, quote, invert in ((from_currency, to_currency, False), (to_currency, from_currency, True)):
+        row = session.exec(
+            select(DailyRate)
+            .where(DailyRate.from_currency == base, DailyRate.to_currency == quote)
+            .order_by(DailyRate.rate_date.desc())
+        ).first()
+        if row and row.rate > 0:
+            return 1 / row.rate if invert else row.rate
+    return None
+
+
+def _fallback_rate(from_currency: str, to_currency: str) -> float:
+    if from_currency == to_currency:
+        return 1.0
+    if (from_currency, to_currency) in FALLBACK_RATES:
+        return FALLBACK_RATES[(from_currency, to_currency)]
+    if (to_currency, from_currency) in FALLBACK_RATES:
+        return 1 / FALLBACK_RATES[(to_currency, from_currency)]
+    raise ExchangeRateUnavailable(f"No exchange rate available for {from_currency}→{to_currency}")
 
 
 def get_exchange_rate_info(from_currency: str = "PEN", to_currency: str = "USD") -> dict:
@@ -0,0 +1,66 @@
+"""
+Fast JSON response path for large list payloads.
+
+Rows that come straight from PostgREST are already JSON-shaped (dates are ISO
+strings, numbers are numbers), so re-validating them through a Pydantic
+response_model and then encoding with the stdlib json module is pure overhead.
+fast_json_response() encodes with orjson and negotiates compression itself:
+brotli when the client accepts it and the `brotli` package is installed,
+otherwise gzip. Bodies below COMPRESS_MIN_BYTES are sent as-is.
+
+Routes using this keep their response_model for the OpenAPI schema — FastAPI
+skips response_model validation when the handler returns a Response.
+"""
+import gzip
+import os
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional — gzip is always available
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL   = 6
+BROTLI_LEVEL = 4   # quality 4 is close to gzip-6 speed with a smaller output
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    header = request.headers.get("accept-encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def encode_body(body: bytes, accepted: set[str]) -> tuple[bytes, str | None]:
+    """Compress body with the best encoding the client accepts. Returns (body, encoding)."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=BROTLI_LEVEL), "br"
+    if "gzip" in accepted or "*" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def fast_json_response(request: Request, data: Any, status_code: int = 200) -> Response:
+    """Serialize trusted, JSON-shaped data with orjson and compress if worthwhile."""
+    body = orjson.dumps(data)
+    body, encoding = encode_body(body, _accepted_encodings(request))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
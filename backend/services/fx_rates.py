@@ -0,0 +1,238 @@
+"""
+Historical, date-indexed FX rate store with vectorized batch conversion.
+
+Rates live in the DailyRate table (one row per pair per day) and are loaded
+per pair into an in-memory sorted index: an int64 array of days-since-epoch
+plus a parallel float64 array of rates. Lookups are "as of" — the latest rate
+on or before each date — done for a whole column at once with
+np.searchsorted, instead of converting row by row.
+
+Coverage: the rates API only serves *today's* rates, so history accumulates
+from the day this store went live (plus whatever migrations/0003 backfilled
+from exchangerate). Dates before the first known rate use the earliest rate.
+Pairs with no direct, inverse or cross history fall back to get_exchange_rate().
+
+Indexes are refreshed when this process records new rates, and otherwise
+every INDEX_TTL_SECONDS so rates written by other workers are picked up.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlmodel import Session, select
+
+from database import engine
+from models import DailyRate
+from services.exchange_rate import ExchangeRateUnavailable, fetch_exchange_rate, get_exchange_rate
+
+logger = logging.getLogger(__name__)
+
+INDEX_TTL_SECONDS = 3600
+# Quote currencies kept from each API response (the API returns ~160)
+TRACKED_CURRENCIES: list[str] = [
+    c.strip().upper()
+    for c in os.getenv("FX_TRACKED_CURRENCIES", "USD,PEN,EUR").split(",")
+    if c.strip()
+]
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+# Currency assumed for amounts whose code has no rate at all
+UNKNOWN_CURRENCY_AS = "PEN"
+_unknown_warned: set[str] = set()
+
+# (from, to) → (days int64[], rates float64[], loaded_at monotonic)
+_index: dict[tuple[str, str], tuple[np.ndarray, np.ndarray, float]] = {}
+_lock = threading.Lock()
+_version = 0
+
+
+def version() -> int:
+    """Bumped whenever this process records rates — use it in cache keys."""
+    return _version
+
+
+def to_epoch_days(dates: Sequence) -> np.ndarray:
+    """ISO date strings / date objects → int64 days since 1970-01-01 (vectorized)."""
+    if len(dates) == 0:
+        return np.empty(0, dtype=np.int64)
+    return (np.asarray(dates, dtype="datetime64[D]") - _EPOCH).astype(np.int64)
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+def _load_pair(from_currency: str, to_currency: str) -> tuple[np.ndarray, np.ndarray]:
+    with Session(engine) as session:
+        rows = session.exec(
+            select(DailyRate.rate_date, DailyRate.rate)
+            .where(
+                DailyRate.from_currency == from_currency,
+                DailyRate.to_currency == to_currency,
+            )
+            .order_by(DailyRate.rate_date)
+        ).all()
+    days  = to_epoch_days([r[0] for r in rows])
+    rates = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    return days, rates
+
+
+def _series(from_currency: str, to_currency: str) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    key = (from_currency, to_currency)
+    now = time.monotonic()
+    with _lock:
+        cached = _index.get(key)
+    if cached is None or now - cached[2] > INDEX_TTL_SECONDS:
+        days, rates = _load_pair(from_currency, to_currency)
+        cached = (days, rates, now)
+        with _lock:
+            _index[key] = cached
+    days, rates, _ = cached
+    return (days, rates) if len(days) else None
+
+
+def _invalidate(pairs: Sequence[tuple[str, str]]) -> None:
+    global _version
+    with _lock:
+        for pair in pairs:
+            _index.pop(pair, None)
+        _version += 1
+
+
+# ── Lookups ───────────────────────────────────────────────────────────────────
+
+def _as_of(series: tuple[np.ndarray, np.ndarray], days: np.ndarray) -> np.ndarray:
+    known_days, known_rates = series
+    idx = np.searchsorted(known_days, days, side="right") - 1
+    np.clip(idx, 0, len(known_days) - 1, out=idx)
+    return known_rates[idx]
+
+
+def rates_on(from_currency: str, to_currency: str, days: np.ndarray) -> np.ndarray:
+    """
+    As-of rates for an array of epoch days (latest rate on or before each day).
+    Tries the direct pair, then its inverse, then a cross through a tracked
+    base (e.g. EUR→USD = PEN→USD / PEN→EUR).
+    """
+    if from_currency == to_currency:
+        return np.ones(len(days), dtype=np.float64)
+
+    direct = _series(from_currency, to_currency)
+    if direct is not None:
+        return _as_of(direct, days)
+    inverse = _series(to_currency, from_currency)
+    if inverse is not None:
+        return 1.0 / _as_of(inverse, days)
+    for base in TRACKED_CURRENCIES:
+        if base in (from_currency, to_currency):
+            continue
+        to_leg, from_leg = _series(base, to_currency), _series(base, from_currency)
+        if to_leg is not None and from_leg is not None:
+            return _as_of(to_leg, days) / _as_of(from_leg, days)
+
+    return np.full(len(days), get_exchange_rate(from_currency, to_currency), dtype=np.float64)
+
+
+def rate_on(from_currency: str, to_currency: str, day: date) -> float:
+    return float(rates_on(from_currency, to_currency, to_epoch_days([day]))[0])
+
+
+def convert_batch(
+    amounts: Sequence[float],
+    currencies: Sequence[str],
+    dates: Optional[Sequence] = None,
+    to_currency: str = "USD",
+) -> np.ndarray:
+    """
+    Convert a column of amounts to to_currency in one pass per currency.
+
+    With dates (ISO strings or date objects), each amount converts at the rate
+    in force on its own date; without, everything converts at today's rate.
+    Codes with no rate at all convert as UNKNOWN_CURRENCY_AS (logged once).
+    """
+    out = np.asarray(amounts, dtype=np.float64).copy()
+    if out.size == 0:
+        return out
+    cur = np.asarray(currencies, dtype=object)
+    days = to_epoch_days(dates) if dates is not None else None
+
+    for code in set(cur.tolist()):
+        if code == to_currency:
+            continue
+        mask = cur == code
+        try:
+            out[mask] *= _rates(code, to_currency, None if days is None else days[mask])
+        except ExchangeRateUnavailable:
+            # Unknown code ("S/", a typo): counted as PEN, as before per-pair
+            # rates, rather than failing every dashboard that includes the row
+            _warn_unknown(code)
+            if to_currency != UNKNOWN_CURRENCY_AS:
+                out[mask] *= _rates(UNKNOWN_CURRENCY_AS, to_currency,
+                                    None if days is None else days[mask])
+    return out
+
+
+def _rates(from_currency: str, to_currency: str, days: Optional[np.ndarray]):
+    if days is None:
+        return get_exchange_rate(from_currency, to_currency)
+    return rates_on(from_currency, to_currency, days)
+
+
+def _warn_unknown(code: str) -> None:
+    with _lock:
+        if code in _unknown_warned:
+            return
+        _unknown_warned.add(code)
+    logger.warning("No exchange rate for currency %r — converting it as %s", code, UNKNOWN_CURRENCY_AS)
+
+
+# ── Recording ─────────────────────────────────────────────────────────────────
+
+def record_daily_rates(from_currency: str, rates: dict[str, float], day: Optional[date] = None) -> None:
+    """Upsert today's rates for from_currency → each tracked quote currency."""
+    day = day or datetime.utcnow().date()
+    quotes = {
+        q: float(r) for q, r in rates.items()
+        if q in TRACKED_CURRENCIES and q != from_currency
+    }
+    if not quotes:
+        return
+
+    with Session(engine) as session:
+        existing = {
+            row.to_currency: row
+            for row in session.exec(
+                select(DailyRate).where(
+                    DailyRate.from_currency == from_currency,
+                    DailyRate.to_currency.in_(list(quotes)),
+                    DailyRate.rate_date == day,
+                )
+            ).all()
+        }
+        for quote, rate in quotes.items():
+            row = existing.get(quote)
+            if row:
+                row.rate = rate
+                row.fetched_at = datetime.utcnow()
+            else:
+                row = DailyRate(from_currency=from_currency, to_currency=quote,
+                                rate_date=day, rate=rate)
+            session.add(row)
+        session.commit()
+
+    _invalidate([(from_currency, q) for q in quotes])
+    logger.info("Recorded %d daily rate(s) for %s on %s", len(quotes), from_currency, day)
+
+
+def refresh_daily_rates() -> None:
+    """Scheduler hook: fetch and record today's rates for every tracked base.
+    Always hits the API — get_exchange_rate only fetches when its 24 h cache
+    is stale, which can skip a calendar day."""
+    for base in TRACKED_CURRENCIES:
+        if base != "USD":
+            try:
+                fetch_exchange_rate(base, "USD")
+            except Exception as exc:
+                logger.warning("Daily rate refresh failed for %s: %s", base, exc)
@@ -0,0 +1,264 @@
+"""
+Merchant normalization: many raw descriptions → one canonical merchant.
+
+"WONG SAN ISIDRO", "WONG.PE" and "COMPRA EN WONG 0231" all normalize to the
+key "WONG" and map to one Merchant row. Keys that don't match exactly are
+fuzzy-matched (difflib ratio >= FUZZY_THRESHOLD) against canonical keys that
+share their first three characters; anything still unmatched becomes a new
+merchant. Every key seen is stored in MerchantAlias so the next lookup is an
+exact dict hit.
+
+Merchants are per user: a merchant's name is built from a description, and
+descriptions are user data ("TRANSF JUAN PEREZ"). A user's key resolves
+against their own merchants and the shared seed merchants (SHARED_MERCHANTS,
+user_id NULL) — vetted brand names, the only ones shared between users. The
+mapping lives in memory in MerchantIndex, loaded once from the
+merchant/merchantalias tables. New transactions get merchant_id at insert
+time (sync_job, transactions router); seed merchants are created and existing
+rows mapped by rebuild_mapping(), which the scheduler process runs once at
+startup (main.py) — after migrations/0011 reset the mapping that is every
+row — or by hand with:
+
+    python -m services.merchants --seed --backfill
+
+Per-user monthly spend per merchant is maintained by a database trigger
+(migrations/0004_merchants.sql) and read by GET /api/dashboard/top-merchants.
+"""
+import argparse
+import difflib
+import logging
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from database import engine
+from models import Merchant, MerchantAlias, Transaction
+
+logger = logging.getLogger(__name__)
+
+FUZZY_THRESHOLD = 0.88
+MAX_KEY_TOKENS  = 3
+SHARED = 0      # MerchantIndex scope of the seed merchants (user_id NULL)
+
+# Vetted brand names shared by every user (--seed). Anything else a user's
+# descriptions produce stays theirs.
+SHARED_MERCHANTS = (
+    "Wong", "Plaza Vea", "Tottus", "Metro", "Vivanda", "Mass", "Tambo", "Oxxo",
+    "Inkafarma", "Mifarma", "Rappi", "PedidosYa", "Uber", "Uber Eats", "Cabify",
+    "Netflix", "Spotify", "Disney Plus", "Amazon", "Apple", "Google", "Starbucks",
+    "KFC", "Bembos", "Promart", "Sodimac", "Saga Falabella", "Ripley", "Oechsle",
+    "Cineplanet", "Cinemark", "LATAM", "Sky Airline", "Claro", "Movistar", "Entel",
+    "Bitel", "Luz del Sur", "Sedapal",
+)
+
+# Payment processor / POS prefixes: "DLC*NETFLIX", "PAYU*RAPPI", "IZI *BODEGA"
+_PROCESSOR_PREFIX = re.compile(r"^[A-Z0-9]{2,10}\s?\*\s?")
+_DOMAIN_SUFFIX    = re.compile(r"\.(?:COM|NET|ORG|PE)(?:\.PE)?\b")
+_LEADING_WORDS    = re.compile(r"^(?:(?:COMPRA|CONSUMO|PAGO|POS|EN|CON|TARJETA)\s+)+")
+# Lima districts / Peruvian cities and company-type suffixes that vary per branch
+_NOISE = re.compile(
+    r"\b(?:SAN ISIDRO|SAN BORJA|SAN MIGUEL|JESUS MARIA|LA MOLINA|MAGDALENA|"
+    r"MIRAFLORES|SURCO|SURQUILLO|BARRANCO|LINCE|CALLAO|CHORRILLOS|LIMA|"
+    r"AREQUIPA|CUSCO|TRUJILLO|PIURA|PERU|PE|SAC|SA|SRL|EIRL|S A C|S A)\b"
+)
+_NON_ALPHA = re.compile(r"[^A-Z ]+")
+_SPACES    = re.compile(r"\s+")
+
+
+def normalize_key(description: str) -> str:
+    """Raw description → canonical lookup key ('Wong.pe San Isidro' → 'WONG')."""
+    text = unicodedata.normalize("NFKD", description.upper())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).strip()
+    text = _PROCESSOR_PREFIX.sub("", text)
+    text = _DOMAIN_SUFFIX.sub(" ", text)
+    text = _NON_ALPHA.sub(" ", text)
+    text = _SPACES.sub(" ", text).strip()
+    text = _LEADING_WORDS.sub("", text)
+    stripped = _SPACES.sub(" ", _NOISE.sub(" ", text)).strip()
+    tokens = (stripped or text).split()[:MAX_KEY_TOKENS]
+    return " ".join(tokens)
+
+
+def display_name(key: str) -> str:
+    return key.title()
+
+
+class MerchantIndex:
+    """Keys are indexed per scope: a user id, or SHARED for the seed merchants."""
+
+    def __init__(self):
+        self.aliases: dict[tuple[int, str], int] = {}                   # (scope, key) → merchant id
+        self.blocks: dict[tuple[int, str], list[tuple[str, int]]] = {}  # (scope, key[:3]) → canonical keys
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def _add_canonical(self, scope: int, key: str, merchant_id: int) -> None:
+        self.aliases[(scope, key)] = merchant_id
+        self.blocks.setdefault((scope, key[:3]), []).append((key, merchant_id))
+
+    def load(self) -> None:
+        with Session(engine) as session:
+            merchants = session.exec(select(Merchant.user_id, Merchant.key, Merchant.id)).all()
+            aliases = session.exec(
+                select(MerchantAlias.user_id, MerchantAlias.key, MerchantAlias.merchant_id)
+            ).all()
+        with self._lock:
+            self.aliases, self.blocks = {}, {}
+            for user_id, key, merchant_id in merchants:
+                self._add_canonical(user_id or SHARED, key, merchant_id)
+            for user_id, key, merchant_id in aliases:
+                self.aliases[(user_id or SHARED, key)] = merchant_id
+            self.loaded = True
+        logger.info("Merchant index loaded: %d merchants, %d aliases", len(merchants), len(self.aliases))
+
+    def _lookup(self, user_id: int, key: str) -> Optional[int]:
+        merchant_id = self.aliases.get((user_id, key))
+        return merchant_id if merchant_id is not None else self.aliases.get((SHARED, key))
+
+    def _fuzzy(self, user_id: int, key: str) -> Optional[int]:
+        best_id, best_ratio = None, FUZZY_THRESHOLD
+        for scope in (SHARED, user_id):
+            for candidate, merchant_id in self.blocks.get((scope, key[:3]), ()):
+                ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+                if ratio >= best_ratio:
+                    best_id, best_ratio = merchant_id, ratio
+        return best_id
+
+    def _persist(self, user_id: int, key: str, merchant_id: Optional[int]) -> Optional[int]:
+        """Store a new alias of the user's (and a new merchant of theirs if
+        merchant_id is None). Returns the id."""
+        with Session(engine) as session:
+            try:
+                if merchant_id is None:
+                    merchant = Merchant(user_id=user_id, name=display_name(key), key=key)
+                    session.add(merchant)
+                    session.flush()
+                    merchant_id = merchant.id
+                session.add(MerchantAlias(user_id=user_id, key=key, merchant_id=merchant_id))
+                session.commit()
+            except IntegrityError:
+                # Another worker created it first — use theirs
+                session.rollback()
+                existing = session.exec(select(MerchantAlias.merchant_id).where(
+                    MerchantAlias.user_id == user_id, MerchantAlias.key == key,
+                )).first()
+                if existing is None:
+                    existing = session.exec(select(Merchant.id).where(
+                        Merchant.user_id == user_id, Merchant.key == key,
+                    )).first()
+                merchant_id = existing
+        return merchant_id
+
+    def resolve(self, user_id: int, description: str) -> Optional[int]:
+        """Merchant id for one of user_id's raw descriptions, creating the
+        merchant if it's new."""
+        key = normalize_key(description or "")
+        if not key:
+            return None
+        if not self.loaded:
+            self.load()
+
+        merchant_id = self._lookup(user_id, key)
+        if merchant_id is not None:
+            return merchant_id
+
+        with self._lock:
+            merchant_id = self._lookup(user_id, key)
+            if merchant_id is not None:
+                return merchant_id
+            matched = self._fuzzy(user_id, key)
+            merchant_id = self._persist(user_id, key, matched)
+            if merchant_id is None:
+                return None
+            if matched is None:
+                self._add_canonical(user_id, key, merchant_id)
+            else:
+                self.aliases[(user_id, key)] = merchant_id
+            return merchant_id
+
+
+merchant_index = MerchantIndex()
+
+
+def resolve_merchant(user_id: int, description: str) -> Optional[int]:
+    """Never raises — a missing merchant_id only means the row is left out of merchant stats."""
+    try:
+        return merchant_index.resolve(user_id, description)
+    except Exception as exc:
+        logger.error("Merchant resolution failed for %r: %s", description, exc)
+        return None
+
+
+def seed_shared() -> int:
+    """Create the SHARED_MERCHANTS that don't exist yet. Returns how many."""
+    with Session(engine) as session:
+        existing = set(session.exec(select(Merchant.key).where(Merchant.user_id.is_(None))).all())
+        created = 0
+        for name in SHARED_MERCHANTS:
+            key = normalize_key(name)
+            if key and key not in existing:
+                session.add(Merchant(user_id=None, name=name, key=key))
+                existing.add(key)
+                created += 1
+        session.commit()
+    merchant_index.load()
+    logger.info("Seeded %d shared merchant(s)", created)
+    return created
+
+
+def backfill(batch_size: int = 500) -> int:
+    """Assign merchant_id to every transaction that doesn't have one (bypasses RLS)."""
+    updated = 0
+    with Session(engine) as session:
+        pairs = session.exec(
+            select(Transaction.user_id, Transaction.description)
+            .where(Transaction.merchant_id.is_(None))
+            .distinct()
+        ).all()
+        logger.info("Backfilling merchants for %d distinct (user, description) pair(s)", len(pairs))
+        for i, (user_id, description) in enumerate(pairs, start=1):
+            merchant_id = resolve_merchant(user_id, description)
+            if merchant_id is None:
+                continue
+            result = session.exec(
+                Transaction.__table__.update()
+                .where(Transaction.user_id == user_id, Transaction.description == description,
+                       Transaction.merchant_id.is_(None))
+                .values(merchant_id=merchant_id)
+            )
+            updated += result.rowcount or 0
+            if i % batch_size == 0:
+                session.commit()
+        session.commit()
+    logger.info("Merchant backfill done — %d transaction(s) updated", updated)
+    return updated
+
+
+def rebuild_mapping() -> int:
+    """seed_shared() then backfill(). Cheap when every row already has its
+    merchant. Never raises — safe to call from the scheduler."""
+    try:
+        seed_shared()
+        return backfill()
+    except Exception as exc:
+        logger.error("Merchant mapping rebuild failed: %s", exc)
+        return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Merchant normalization tools.")
+    parser.add_argument("--seed", action="store_true", help="create the shared seed merchants")
+    parser.add_argument("--backfill", action="store_true", help="map existing transactions to merchants")
+    parser.add_argument("--key", metavar="DESCRIPTION", help="print the normalized key for a description")
+    args = parser.parse_args()
+    if args.key:
+        print(normalize_key(args.key))
+    if args.seed:
+        seed_shared()
+    if args.backfill:
+        backfill()
@@ -0,0 +1,285 @@
+"""
+In-process metrics in the Prometheus text exposition format (served at /metrics).
+
+Deliberately dependency-free and cheap enough to leave on: a metric update is
+one lock, one dict lookup and (for histograms) one bisect. Label sets are kept
+small and bounded — routes are labelled by their template (/api/transactions/{txn_id}),
+never by the raw path.
+
+What is recorded:
+  http_request_duration_seconds   latency per route/method (MetricsMiddleware)
+  http_request_postgrest_calls    PostgREST round trips per request (httpx hook)
+  http_request_db_queries         SQLAlchemy statements per request (cursor events)
+  postgrest_requests_total / db_queries_total   the same, process-wide
+  exchange_rate_lookups_total     get_exchange_rate by result: hit/miss/stale/fallback
+  sync_stage_duration_seconds     gmail_list, gmail_metadata, gmail_get, decode,
+                                  preprocess, extraction, db_write
+  anthropic_tokens_total          input/output tokens per model
+  sync_cycle_duration_seconds     one scheduler tick of due syncs (sync_job.run_due_syncs)
+  scheduled_syncs_total / sync_due_backlog   syncs started by priority, due users left over
+  sse_connections / sse_events_total   open /api/events streams, events pushed
+
+sync_stage() and count_for_run() also feed the run being recorded by
+track_run(), which sync_job turns into a SyncRun history row.
+
+NOTE: like services.dashboard_cache, values are per process — with several
+uvicorn workers scrape each one (or aggregate with a sidecar).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_REGISTRY: list["_Metric"] = []
+
+# When set, /metrics and the other operator endpoints require
+# "Authorization: Bearer <METRICS_TOKEN>" (auth.require_metrics_token)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS   = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+CYCLE_BUCKETS   = (1, 10, 30, 60, 300, 900, 1800, 3600, 7200)
+COUNT_BUCKETS   = (0, 1, 2, 3, 4, 6, 8, 12, 20, 50)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._samples(items)
+        return lines
+
+    def _samples(self, items) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]   # counts, sum, count
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _samples(self, items) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in _REGISTRY for line in metric.render()) + "\n"
+
+
+# ── Metric definitions ────────────────────────────────────────────────────────
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "API request latency.",
+                         ("route", "method"))
+HTTP_REQUESTS = Counter("http_requests_total", "API requests by status class.",
+                        ("route", "method", "status"))
+REQUEST_POSTGREST = Histogram("http_request_postgrest_calls", "PostgREST round trips per API request.",
+                              ("route",), COUNT_BUCKETS)
+REQUEST_DB = Histogram("http_request_db_queries", "SQLAlchemy statements per API request.",
+                       ("route",), COUNT_BUCKETS)
+POSTGREST_REQUESTS = Counter("postgrest_requests_total", "PostgREST HTTP requests.", ("method",))
+DB_QUERIES = Counter("db_queries_total", "SQLAlchemy statements executed.")
+FX_LOOKUPS = Counter("exchange_rate_lookups_total",
+                     "get_exchange_rate results (hit = fresh DB cache, miss = API fetch).", ("result",))
+SYNC_STAGE = Histogram("sync_stage_duration_seconds", "Time per sync pipeline stage call.",
+                       ("stage",), STAGE_BUCKETS)
+ANTHROPIC_TOKENS = Counter("anthropic_tokens_total", "Anthropic tokens used.", ("model", "type"))
+SYNC_CYCLE = Histogram("sync_cycle_duration_seconds", "Duration of one scheduler tick of due user syncs.",
+                       buckets=CYCLE_BUCKETS)
+SYNC_CYCLE_LAST = Gauge("sync_cycle_last_completed_timestamp_seconds",
+                        "Unix time the last scheduler tick finished.")
+SCHEDULED_SYNCS = Counter("scheduled_syncs_total",
+                          "Scheduled user syncs started (connected = dashboard open).", ("priority",))
+SYNC_DUE_BACKLOG = Gauge("sync_due_backlog", "Due users left for the next tick by the rate cap.")
+SSE_CONNECTIONS = Gauge("sse_connections", "Open /api/events streams.")
+SSE_EVENTS = Counter("sse_events_total", "Change events published to open streams.", ("type",))
+
+
+# ── Per-request round-trip counting ───────────────────────────────────────────
+# The middleware puts a fresh [postgrest, db] list in the context; sync
+# endpoints run in a threadpool with a copy of the context, so they increment
+# the same list.
+
+_request_counts: ContextVar[Optional[list]] = ContextVar("request_counts", default=None)
+
+
+def _on_postgrest_request(request) -> None:
+    POSTGREST_REQUESTS.inc(method=request.method)
+    counts = _request_counts.get()
+    if counts is not None:
+        counts[0] += 1
+
+
+def _on_db_query(*_) -> None:
+    DB_QUERIES.inc()
+    counts = _request_counts.get()
+    if counts is not None:
+        counts[1] += 1
+
+
+def instrument_postgrest(client) -> None:
+    """Count every PostgREST call made through a supabase-py client."""
+    session = getattr(getattr(client, "postgrest", None), "session", None)
+    if session is not None:
+        session.event_hooks["request"].append(_on_postgrest_request)
+
+
+def instrument_engine(engine) -> None:
+    """Count every statement executed through a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _on_db_query)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: latency, status and round trips per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        counts = [0, 0]
+        token = _request_counts.set(counts)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _request_counts.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(elapsed, route=route, method=method)
+            HTTP_REQUESTS.inc(route=route, method=method, status=f"{status[0] // 100}xx")
+            REQUEST_POSTGREST.observe(counts[0], route=route)
+            REQUEST_DB.observe(counts[1], route=route)
+
+
+# ── Per-sync-run accumulation ─────────────────────────────────────────────────
+# A sync runs on one thread (fetch_bank_emails is a generator consumed by the
+# sync loop), so a context variable scopes stage times and counters to it.
+
+_current_run: ContextVar[Optional[dict]] = ContextVar("sync_run", default=None)
+
+
+@contextmanager
+def track_run() -> Iterator[dict]:
+    """Collect {"stages": {stage: seconds}, "counters": {name: n}} for one sync."""
+    run = {"stages": defaultdict(float), "counters": defaultdict(float)}
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def count_for_run(name: str, amount: float = 1) -> None:
+    run = _current_run.get()
+    if run is not None:
+        run["counters"][name] += amount
+
+
+@contextmanager
+def sync_stage(stage: str) -> Iterator[None]:
+    """Time one call of a sync stage into the histogram and the current run."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        SYNC_STAGE.observe(elapsed, stage=stage)
+        run = _current_run.get()
+        if run is not None:
+            run["stages"][stage] += elapsed
@@ -0,0 +1,99 @@
+"""
+Daily partition maintenance for transaction and processedemail
+(migrations/0007_partitioning.sql).
+
+  - creates the month partitions of both tables from the start of the widest
+    sync window up to PARTITION_MONTHS_AHEAD months ahead, so new rows — and
+    backfilled ones — never pile up in the default partitions
+  - compacts processedemail: a row processed more than
+    PROCESSED_EMAIL_RETENTION_DAYS ago belongs to an email at least that old,
+    which no sync (days_back ≤ MAX_DAYS_BACK) will list again, so whole
+    expired months are dropped and the stragglers of the current edge month
+    deleted, along with their processedemail_key rows (migrations/0012).
+    The sync dedupe set stays a few months deep instead of growing forever.
+
+Transaction partitions are never dropped.
+
+On SQLite (local dev) there are no partitions; only the row retention runs.
+
+Usage (from backend/):
+    python -m services.partitions      # run once, print what changed
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of SyncRequest.days_back (routers/sync.py)
+MAX_DAYS_BACK = 180
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# A week of slack over MAX_DAYS_BACK for Gmail's newer_than rounding and time zones
+PROCESSED_EMAIL_RETENTION_DAYS = max(
+    int(os.getenv("PROCESSED_EMAIL_RETENTION_DAYS", str(MAX_DAYS_BACK + 7))), MAX_DAYS_BACK,
+)
+
+# (table, partition key column)
+PARTITIONED_TABLES = (("transaction", "date"), ("processedemail", "processed_at"))
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _is_partitioned(conn, table: str) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"),
+        {"t": f'public."{table}"'},
+    ).scalar() is True
+
+
+def maintain_partitions(eng: Engine = engine, today: date | None = None) -> dict:
+    """Create upcoming partitions and compact processedemail. Returns counts."""
+    today = today or date.today()
+    cutoff = datetime.combine(today - timedelta(days=PROCESSED_EMAIL_RETENTION_DAYS), datetime.min.time())
+    result = {"partitions_created": 0, "partitions_dropped": 0, "rows_deleted": 0}
+
+    with eng.begin() as conn:
+        if eng.dialect.name == "postgresql":
+            first = (today - timedelta(days=MAX_DAYS_BACK)).replace(day=1)
+            last = _add_months(today, PARTITION_MONTHS_AHEAD)
+            for table, key_col in PARTITIONED_TABLES:
+                if not _is_partitioned(conn, table):
+                    logger.warning("%s is not partitioned yet — run migrations/0007", table)
+                    continue
+                result["partitions_created"] += conn.execute(
+                    text("SELECT public.ensure_month_partitions(:t, :k, :first, :last)"),
+                    {"t": table, "k": key_col, "first": first, "last": last},
+                ).scalar() or 0
+            if _is_partitioned(conn, "processedemail"):
+                result["partitions_dropped"] = conn.execute(
+                    text("SELECT public.drop_month_partitions_before('processedemail', :cutoff)"),
+                    {"cutoff": cutoff.date()},
+                ).scalar() or 0
+
+        # Dropped partitions don't fire processedemail's delete trigger (0012)
+        conn.execute(
+            text("DELETE FROM processedemail_key WHERE processed_at < :cutoff"), {"cutoff": cutoff},
+        )
+        # Rows of the month straddling the cutoff (and anything in default)
+        result["rows_deleted"] = conn.execute(
+            text("DELETE FROM processedemail WHERE processed_at < :cutoff"), {"cutoff": cutoff},
+        ).rowcount
+
+    logger.info("Partition maintenance: %d created, %d processedemail month(s) dropped, "
+                "%d row(s) older than %s deleted", result["partitions_created"],
+                result["partitions_dropped"], result["rows_deleted"], cutoff.date())
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    print(maintain_partitions())
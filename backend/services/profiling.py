@@ -0,0 +1,274 @@
+"""
+On-demand sampling profiles of single API requests and sync runs.
+
+Disabled unless PROFILE_TOKEN is set. Then:
+
+  - a request carrying `X-Profile-Token: <PROFILE_TOKEN>` (or
+    `?profile_token=<PROFILE_TOKEN>`) is profiled by ProfilingMiddleware;
+    the response gets an `X-Profile-Id` header naming the stored profile
+    (streamed responses are passed through as they go and get none — find
+    them in GET /api/profiles)
+  - run_sync_for_user(user, profile=True) profiles that sync
+
+Profiles are stack samples taken every PROFILE_INTERVAL_MS with
+sys._current_frames(), stored in PROFILE_DIR in the "collapsed stacks"
+format (one `frame;frame;frame count` line per stack) that flamegraph.pl,
+speedscope and inferno read directly, plus a small .json with metadata.
+Download them with GET /api/profiles (routers/profiling.py). Retention: at
+most PROFILE_MAX_FILES profiles, none older than PROFILE_MAX_AGE_DAYS.
+
+Sampling rather than cProfile because our routes are sync functions that
+FastAPI runs on threadpool workers — a cProfile enabled in the middleware
+would only see the event loop. A request profile therefore samples every busy
+thread (idle workers are dropped) and prefixes each stack with the thread
+name; under concurrent traffic other requests show up too, so profile on a
+quiet replica when you can. Sync profiles sample only the syncing thread.
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN        = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR          = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS  = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES    = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_MAX_AGE_DAYS = float(os.getenv("PROFILE_MAX_AGE_DAYS", "7"))
+
+PROFILE_SUFFIX = ".collapsed"
+_NAME_RE = re.compile(r"^[\w.-]+$")
+
+# Top frames of a thread that is waiting for work, not doing any
+_IDLE_FRAMES = {
+    ("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"), ("base_events.py", "_run_once"),
+    ("thread.py", "_worker"),
+}
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix):
+            return filename[len(prefix):].lstrip(os.sep)
+    return filename
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+class StackSampler:
+    """Background thread counting the call stacks of other threads."""
+
+    def __init__(self, interval_s: float, thread_id: Optional[int] = None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id          # None = every busy thread
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+            for tid, frame in frames.items():
+                if tid == me or (self.thread_id is not None and tid != self.thread_id):
+                    continue
+                if self.thread_id is None and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if self.thread_id is None:
+                    stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+# ── Storage ───────────────────────────────────────────────────────────────────
+
+def _prune() -> None:
+    try:
+        entries = sorted(
+            (e for e in os.scandir(PROFILE_DIR) if e.name.endswith(PROFILE_SUFFIX)),
+            key=lambda e: e.stat().st_mtime, reverse=True,
+        )
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - PROFILE_MAX_AGE_DAYS * 86400
+    for i, entry in enumerate(entries):
+        if i >= PROFILE_MAX_FILES or entry.stat().st_mtime < cutoff:
+            base = entry.path[:-len(PROFILE_SUFFIX)]
+            for path in (entry.path, base + ".json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def _save(sampler: StackSampler, kind: str, label: str, duration_s: float, extra: dict) -> str:
+    slug = re.sub(r"[^\w.-]+", "_", label).strip("_")[:60] or kind
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{kind}-{slug}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, name + PROFILE_SUFFIX), "w") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    meta = {
+        "id": name, "kind": kind, "label": label, "duration_s": round(duration_s, 4),
+        "samples": sampler.samples, "interval_ms": sampler.interval_s * 1000,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra,
+    }
+    with open(os.path.join(PROFILE_DIR, name + ".json"), "w") as f:
+        json.dump(meta, f)
+    _prune()
+    logger.info("Stored %s profile %s (%.2fs, %d samples)", kind, name, duration_s, sampler.samples)
+    return name
+
+
+def _save_quietly(sampler: StackSampler, kind: str, label: str, duration_s: float,
+                  extra: dict) -> str:
+    """_save, but a full disk never fails the request or sync being profiled."""
+    try:
+        return _save(sampler, kind, label, duration_s, extra)
+    except OSError as exc:
+        logger.error("Could not store %s profile: %s", kind, exc)
+        return ""
+
+
+def list_profiles() -> list[dict]:
+    """Metadata of stored profiles, newest first."""
+    out = []
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    for n in names:
+        try:
+            with open(os.path.join(PROFILE_DIR, n)) as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(out, key=lambda m: m["id"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored profile, or None (ids are validated — no path traversal)."""
+    if not _NAME_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.isfile(path) else None
+
+
+@contextmanager
+def profile_current_thread(kind: str, label: str) -> Iterator[dict]:
+    """
+    Sample the calling thread for the duration of the block. The yielded dict
+    gets "profile_id" once the profile is stored; extra keys put in it before
+    the block ends are saved with the metadata.
+    """
+    result: dict = {}
+    sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, thread_id=threading.get_ident())
+    t0 = time.perf_counter()
+    try:
+        with sampler:
+            yield result
+    finally:
+        result["profile_id"] = _save_quietly(sampler, kind, label, time.perf_counter() - t0,
+                                             dict(result))
+
+
+# ── Request middleware ────────────────────────────────────────────────────────
+
+# Responses sent as they are produced; holding them back for X-Profile-Id
+# would stall the stream (GET /api/events) until it ends
+_STREAMING_TYPES = (b"text/event-stream",)
+
+
+def _requested(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    token = b""
+    for key, value in scope.get("headers", []):
+        if key == b"x-profile-token":
+            token = value
+            break
+    if not token:
+        match = re.search(rb"(?:^|&)profile_token=([^&]*)", scope.get("query_string", b""))
+        token = match.group(1) if match else b""
+    # Bytes: compare_digest rejects non-ASCII str
+    return bool(token) and hmac.compare_digest(token, PROFILE_TOKEN.encode())
+
+
+def _is_streaming(message) -> bool:
+    for key, value in message.get("headers", []):
+        if key.lower() == b"content-type":
+            return value.split(b";")[0].strip().lower() in _STREAMING_TYPES
+    return False
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: profile requests that carry the profile token."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope['method']} {scope['path']}"
+        status = [500]
+        pending: list = []
+        streaming = [False]
+
+        async def send_wrapper(message):
+            # Held back until the profile is stored so X-Profile-Id can be set —
+            # except streams, which pass straight through without the header
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                streaming[0] = _is_streaming(message)
+            if streaming[0]:
+                await send(message)
+            else:
+                pending.append(message)
+
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+        t0 = time.perf_counter()
+        try:
+            with sampler:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            profile_id = _save_quietly(sampler, "request", label, time.perf_counter() - t0,
+                                       {"status": status[0]})
+            for message in pending:
+                if message["type"] == "http.response.start" and profile_id:
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-profile-id", profile_id.encode())]}
+                await send(message)
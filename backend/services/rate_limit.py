@@ -0,0 +1,229 @@
+"""
+Shared client-side throttling and retry for external APIs (Gmail, Anthropic).
+
+Token buckets pace calls to each API's published quota so bulk syncs run at
+the highest sustained rate without tripping 429s:
+
+  gmail      per-user quota units/second (messages.get/list cost 5 units;
+             Gmail's per-user limit is 250 units/s) — one bucket per user
+  anthropic  requests/minute and input tokens/minute for the whole process
+
+call_with_retry() retries 429 / 5xx / connection errors with exponential
+backoff and full jitter, honouring Retry-After when the server sends one (the
+wait is also applied to the bucket, so other threads back off too). When the
+attempts are exhausted it raises TransientAPIError — callers must treat that
+as "try again next sync", never as "processed with 0 transactions".
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from services.metrics import count_for_run
+
+logger = logging.getLogger(__name__)
+
+GMAIL_UNITS_PER_SECOND  = float(os.getenv("GMAIL_UNITS_PER_SECOND", "250"))
+ANTHROPIC_RPM           = float(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "50"))
+ANTHROPIC_ITPM          = float(os.getenv("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "30000"))
+MAX_ATTEMPTS            = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+BASE_DELAY              = float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+MAX_DELAY               = float(os.getenv("RETRY_MAX_DELAY", "60"))
+
+GMAIL_COST_GET  = 5
+GMAIL_COST_LIST = 5
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+_GMAIL_RATE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class TransientAPIError(Exception):
+    """A retryable failure that outlived its retries — retry on the next sync."""
+
+    def __init__(self, api: str, cause: BaseException):
+        super().__init__(f"{api}: {cause}")
+        self.api = api
+        self.cause = cause
+
+
+class TokenBucket:
+    """Classic token bucket; acquire() blocks until enough tokens are available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate                # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited_s = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, sleeping as needed. Returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)   # oversized requests wait for a full bucket
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.waited_s += waited
+                    return waited
+                delay = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Server asked us to back off (Retry-After): block every caller for a while."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+# ── Buckets ───────────────────────────────────────────────────────────────────
+
+_buckets: dict[tuple, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(api: str, key: Any = None) -> TokenBucket:
+    with _buckets_lock:
+        b = _buckets.get((api, key))
+        if b is None:
+            if api == "gmail":
+                b = TokenBucket(GMAIL_UNITS_PER_SECOND, GMAIL_UNITS_PER_SECOND)
+            elif api == "anthropic":
+                b = TokenBucket(ANTHROPIC_RPM / 60.0, max(1.0, ANTHROPIC_RPM / 6))
+            elif api == "anthropic_tokens":
+                b = TokenBucket(ANTHROPIC_ITPM / 60.0, ANTHROPIC_ITPM / 6)
+            else:
+                raise ValueError(f"Unknown API bucket: {api}")
+            _buckets[(api, key)] = b
+        return b
+
+
+# ── Error classification ──────────────────────────────────────────────────────
+
+def _status_and_headers(exc: BaseException) -> tuple[Optional[int], dict]:
+    # googleapiclient.errors.HttpError: .resp is an httplib2 Response (dict-like headers + .status)
+    resp = getattr(exc, "resp", None)
+    if resp is not None and hasattr(resp, "status"):
+        return int(resp.status), {k.lower(): v for k, v in dict(resp).items()}
+    # anthropic.APIStatusError: .status_code + .response (httpx)
+    status = getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    headers = {k.lower(): v for k, v in response.headers.items()} if response is not None else {}
+    return status, headers
+
+
+def _gmail_rate_reason(exc: BaseException) -> bool:
+    details = getattr(exc, "error_details", None) or []
+    return any(isinstance(d, dict) and d.get("reason") in _GMAIL_RATE_REASONS for d in details) \
+        or "rateLimitExceeded" in str(exc)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    name = type(exc).__name__
+    if name in ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError",
+                "ServerNotFoundError", "timeout"):
+        return True
+    status, _ = _status_and_headers(exc)
+    if status in _RETRYABLE_STATUS:
+        return True
+    return status == 403 and _gmail_rate_reason(exc)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    _, headers = _status_and_headers(exc)
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            return None   # HTTP-date form; fall back to backoff
+    return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+
+# ── Stats ─────────────────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, float]] = {}
+
+
+def _count(api: str, field: str, value: float = 1) -> None:
+    with _stats_lock:
+        s = _stats.setdefault(api, {"calls": 0, "retries": 0, "exhausted": 0, "backoff_s": 0.0})
+        s[field] += value
+
+
+def stats() -> dict:
+    with _stats_lock:
+        out = {api: dict(s) for api, s in _stats.items()}
+    with _buckets_lock:
+        for (api, _), b in _buckets.items():
+            name = "anthropic" if api == "anthropic_tokens" else api
+            out.setdefault(name, {}).setdefault("throttled_s", 0.0)
+            out[name]["throttled_s"] += round(b.waited_s, 3)
+    return out
+
+
+# ── Retry ─────────────────────────────────────────────────────────────────────
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    api: str,
+    cost: float = 1.0,
+    key: Any = None,
+    tokens: float = 0.0,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> Any:
+    """
+    Run fn() under api's bucket(s), retrying retryable failures.
+    Non-retryable exceptions propagate unchanged; exhausted retries raise
+    TransientAPIError.
+    """
+    b = bucket(api, key)
+    token_bucket = bucket("anthropic_tokens") if api == "anthropic" and tokens else None
+    for attempt in range(max_attempts):
+        b.acquire(cost)
+        if token_bucket is not None:
+            token_bucket.acquire(tokens)
+        _count(api, "calls")
+        try:
+            return fn()
+        except Exception as exc:
+            if not is_retryable(exc):
+                raise
+            if attempt == max_attempts - 1:
+                _count(api, "exhausted")
+                raise TransientAPIError(api, exc) from exc
+            server_wait = retry_after(exc)
+            delay = backoff_delay(attempt)
+            if server_wait is not None:
+                delay = max(delay, server_wait)
+                b.pause(server_wait)
+            _count(api, "retries")
+            count_for_run("retries")
+            _count(api, "backoff_s", delay)
+            logger.warning("%s call failed (%s), retry %d/%d in %.1fs",
+                           api, exc, attempt + 1, max_attempts - 1, delay)
+            time.sleep(delay)
@@ -0,0 +1,251 @@
+"""
+Adaptive per-user sync scheduling (replaces the global 6-hourly sync_all).
+
+Every user has a SyncSchedule row with the time of their next sync. After
+each sync the next one is set from:
+
+  mail rate    an exponentially time-weighted average of new bank emails per
+               day (τ = SYNC_RATE_TAU_DAYS), so the interval is the time in
+               which SYNC_TARGET_EMAILS new emails are expected, clamped to
+               [SYNC_MIN_INTERVAL_MIN, SYNC_MAX_INTERVAL_H]
+  activity     last authenticated request (touch(), written at most every
+               SYNC_ACTIVITY_WRITE_S per user); users idle for more than
+               SYNC_INACTIVE_AFTER_DAYS get the interval doubled per idle
+               period, up to SYNC_INACTIVE_MAX_INTERVAL_H
+  jitter       ±SYNC_JITTER of the interval, so users that synced together
+               drift apart instead of hitting Gmail/Anthropic in one herd
+  errors       a sync where every email failed, or the token refresh hit a
+               transient error, leaves the rate alone and is retried after
+               SYNC_ERROR_BACKOFF_MIN, doubling per failed sync; only a
+               missing or revoked refresh token waits SYNC_INACTIVE_MAX_INTERVAL_H
+
+Each scheduled sync lists the Gmail window back to the last successful sync,
+or to the oldest window a sync left failed/deferred mail in (a day of
+margin, at most SCHEDULED_DAYS_BACK).
+
+The scheduler tick (sync_job.run_due_syncs, every SYNC_TICK_S) hands due
+users to a pool of SYNC_MAX_CONCURRENT sync threads and returns, starting at
+most SYNC_MAX_PER_MINUTE syncs per minute across all users. Users with a
+dashboard open (services.events) go first and are due every
+SYNC_CONNECTED_INTERVAL_MIN regardless of their schedule; then the most
+overdue. Users not started because of the cap stay due for the next tick.
+
+NOTE: "dashboard open" is per process, like services.events — with several
+workers only streams held by the scheduler's process boost their users.
+"""
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from database import engine
+from models import SyncSchedule, User
+
+logger = logging.getLogger(__name__)
+
+SYNC_TICK_S                 = int(os.getenv("SYNC_TICK_S", "60"))
+SYNC_MAX_PER_MINUTE         = float(os.getenv("SYNC_MAX_PER_MINUTE", "10"))
+SYNC_TARGET_EMAILS          = float(os.getenv("SYNC_TARGET_EMAILS", "1"))
+SYNC_MIN_INTERVAL_S         = float(os.getenv("SYNC_MIN_INTERVAL_MIN", "30")) * 60
+SYNC_MAX_INTERVAL_S         = float(os.getenv("SYNC_MAX_INTERVAL_H", "24")) * 3600
+SYNC_INACTIVE_MAX_INTERVAL_S = float(os.getenv("SYNC_INACTIVE_MAX_INTERVAL_H", "72")) * 3600
+SYNC_INACTIVE_AFTER_DAYS    = float(os.getenv("SYNC_INACTIVE_AFTER_DAYS", "7"))
+SYNC_CONNECTED_INTERVAL_S   = float(os.getenv("SYNC_CONNECTED_INTERVAL_MIN", "10")) * 60
+SYNC_RATE_TAU_DAYS          = float(os.getenv("SYNC_RATE_TAU_DAYS", "7"))
+SYNC_JITTER                 = float(os.getenv("SYNC_JITTER", "0.2"))
+SYNC_ACTIVITY_WRITE_S       = float(os.getenv("SYNC_ACTIVITY_WRITE_S", "600"))
+SYNC_ERROR_BACKOFF_S        = float(os.getenv("SYNC_ERROR_BACKOFF_MIN", "15")) * 60
+
+# Rate assumed before a user's first sync: one email a day
+DEFAULT_RATE_PER_DAY = 1.0
+# Widest Gmail window of a scheduled sync (the old fixed days_back)
+SCHEDULED_DAYS_BACK = 7
+# New schedules are spread over at most this (the old fixed cadence), so no
+# one waits longer for their first scheduled sync than before
+FIRST_SYNC_SPREAD_S = 6 * 3600
+
+
+# ── Interval policy ───────────────────────────────────────────────────────────
+
+def next_interval(rate_per_day: float, last_active_at: Optional[datetime],
+                  now: datetime) -> float:
+    """Seconds until the next sync, before jitter."""
+    if rate_per_day > 0:
+        interval = SYNC_TARGET_EMAILS / rate_per_day * 86400
+    else:
+        interval = SYNC_MAX_INTERVAL_S
+    interval = min(max(interval, SYNC_MIN_INTERVAL_S), SYNC_MAX_INTERVAL_S)
+
+    idle_days = (now - last_active_at).total_seconds() / 86400 if last_active_at else math.inf
+    if idle_days > SYNC_INACTIVE_AFTER_DAYS:
+        periods = (min(idle_days, 10 * SYNC_INACTIVE_AFTER_DAYS) // SYNC_INACTIVE_AFTER_DAYS)
+        interval = min(interval * 2 ** periods, SYNC_INACTIVE_MAX_INTERVAL_S)
+    return interval
+
+
+def days_back_for(last_synced_at: Optional[datetime], now: datetime,
+                  unprocessed_since: Optional[datetime] = None) -> int:
+    """Gmail window for a scheduled sync: back to the last successful sync,
+    or to the oldest window with mail still unprocessed, plus a day of
+    margin, so frequent syncs list only recent mail and never drop mail a
+    failed or deferred run left behind."""
+    if last_synced_at is None:
+        return SCHEDULED_DAYS_BACK
+    since = min(last_synced_at, unprocessed_since or last_synced_at)
+    days = math.ceil((now - since).total_seconds() / 86400) + 1
+    return min(max(days, 1), SCHEDULED_DAYS_BACK)
+
+
+def backoff_interval(failed_syncs: int, normal_s: float) -> float:
+    """Pause after the failed_syncs-th consecutive sync where every email
+    failed: SYNC_ERROR_BACKOFF_MIN, doubling, never longer than the normal
+    interval."""
+    return min(SYNC_ERROR_BACKOFF_S * 2 ** min(failed_syncs - 1, 16), normal_s)
+
+
+def jittered(interval: float) -> float:
+    return interval * random.uniform(1 - SYNC_JITTER, 1 + SYNC_JITTER)
+
+
+def updated_rate(prev_rate: float, new_emails: int, elapsed_s: float) -> float:
+    """Fold one sync's count into the time-weighted emails/day average."""
+    elapsed_days = max(elapsed_s, 60.0) / 86400
+    weight = 1 - math.exp(-elapsed_days / SYNC_RATE_TAU_DAYS)
+    return prev_rate + weight * (new_emails / elapsed_days - prev_rate)
+
+
+# ── Activity ──────────────────────────────────────────────────────────────────
+
+_last_touch: dict[int, float] = {}
+_touch_lock = threading.Lock()
+
+
+def touch(user_id: int) -> None:
+    """Note an authenticated request; hits the database at most every
+    SYNC_ACTIVITY_WRITE_S per user and process. Never raises."""
+    now = time.monotonic()
+    with _touch_lock:
+        if now - _last_touch.get(user_id, -math.inf) < SYNC_ACTIVITY_WRITE_S:
+            return
+        _last_touch[user_id] = now
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                update(SyncSchedule)
+                .where(SyncSchedule.user_id == user_id)
+                .values(last_active_at=datetime.utcnow())
+            )
+    except Exception as exc:
+        logger.error("Could not record activity for user %d: %s", user_id, exc)
+
+
+# ── Schedule rows ─────────────────────────────────────────────────────────────
+
+def ensure_schedules(now: Optional[datetime] = None) -> int:
+    """Create schedule rows for syncable users that have none. First syncs are
+    spread uniformly over FIRST_SYNC_SPREAD_S. Returns the number created."""
+    now = now or datetime.utcnow()
+    with Session(engine) as session:
+        missing = session.exec(
+            select(User.id, User.last_sync_at)
+            .outerjoin(SyncSchedule, SyncSchedule.user_id == User.id)
+            .where(SyncSchedule.id == None, User.encrypted_refresh_token != None)  # noqa: E711
+        ).all()
+        first = next_interval(DEFAULT_RATE_PER_DAY, now, now)
+        for user_id, last_sync_at in missing:
+            session.add(SyncSchedule(
+                user_id=user_id,
+                next_sync_at=now + timedelta(seconds=random.uniform(0, min(first, FIRST_SYNC_SPREAD_S))),
+                interval_s=first,
+                mail_rate_per_day=DEFAULT_RATE_PER_DAY,
+                last_synced_at=last_sync_at,
+                last_active_at=now,
+            ))
+        session.commit()
+    return len(missing)
+
+
+def due_user_ids(connected: set[int], now: Optional[datetime] = None) -> list[int]:
+    """Users to sync now, best first: open dashboards not synced for
+    SYNC_CONNECTED_INTERVAL_S, then everyone past next_sync_at, most overdue first."""
+    now = now or datetime.utcnow()
+    boost_before = now - timedelta(seconds=SYNC_CONNECTED_INTERVAL_S)
+    conditions = [SyncSchedule.next_sync_at <= now]
+    if connected:
+        conditions.append(and_(SyncSchedule.user_id.in_(connected), SyncSchedule.failed_syncs == 0, or_(
+            SyncSchedule.last_synced_at == None, SyncSchedule.last_synced_at <= boost_before,  # noqa: E711
+        )))
+    with Session(engine) as session:
+        rows = session.exec(
+            select(SyncSchedule.user_id, SyncSchedule.next_sync_at).where(or_(*conditions))
+        ).all()
+    rows.sort(key=lambda r: (r[0] not in connected, r[1]))
+    return [user_id for user_id, _ in rows]
+
+
+def scheduled_days_back(user_id: int, now: Optional[datetime] = None) -> int:
+    """days_back_for the user's schedule row (SCHEDULED_DAYS_BACK without one)."""
+    now = now or datetime.utcnow()
+    with Session(engine) as session:
+        row = session.exec(
+            select(SyncSchedule.last_synced_at, SyncSchedule.unprocessed_since)
+            .where(SyncSchedule.user_id == user_id)
+        ).first()
+    if row is None:
+        return SCHEDULED_DAYS_BACK
+    last_synced_at, unprocessed_since = row
+    return days_back_for(last_synced_at, now, unprocessed_since)
+
+
+def record_sync(user_id: int, summary: dict, days_back: int = SCHEDULED_DAYS_BACK,
+                now: Optional[datetime] = None) -> None:
+    """Update the mail rate and set the next sync after a run. Never raises.
+    Wider manual syncs (days_back > SCHEDULED_DAYS_BACK) also find old mail,
+    so they reschedule without feeding the rate."""
+    now = now or datetime.utcnow()
+    try:
+        with Session(engine) as session:
+            sched = session.exec(select(SyncSchedule).where(SyncSchedule.user_id == user_id)).first()
+            if sched is None:
+                sched = SyncSchedule(user_id=user_id, next_sync_at=now, last_active_at=now)
+            handled = summary.get("emails_processed", 0) + summary.get("emails_triaged_out", 0)
+            left = summary.get("errors", 0) + summary.get("emails_deferred", 0)
+            if summary.get("error") == "no_credentials":
+                # No refresh token, or Google revoked it: nothing will change
+                # until the user reconnects; look again much later
+                interval = SYNC_INACTIVE_MAX_INTERVAL_S
+            elif summary.get("error") or (summary.get("errors", 0) and not handled):
+                # Token refresh blip, or every email failed (Gmail/Anthropic
+                # trouble): nothing to learn about the mail rate; retry after a
+                # growing pause. last_synced_at stays, so the retry lists the
+                # whole window again; due_user_ids skips the open-dashboard
+                # boost while failed_syncs > 0.
+                sched.failed_syncs += 1
+                interval = backoff_interval(
+                    sched.failed_syncs, next_interval(sched.mail_rate_per_day, sched.last_active_at, now),
+                )
+            else:
+                # Deferred/failed emails are still unprocessed and will be
+                # listed again — they are not new mail of this window
+                if sched.last_synced_at is not None and days_back <= SCHEDULED_DAYS_BACK:
+                    elapsed = (now - sched.last_synced_at).total_seconds()
+                    sched.mail_rate_per_day = updated_rate(sched.mail_rate_per_day, handled, elapsed)
+                sched.last_synced_at = now
+                # This run listed any older leftovers again; what it left is
+                # somewhere in its own window, which the next sync must cover
+                sched.unprocessed_since = now - timedelta(days=days_back) if left else None
+                sched.failed_syncs = 0
+                interval = next_interval(sched.mail_rate_per_day, sched.last_active_at, now)
+            sched.interval_s = interval
+            sched.next_sync_at = now + timedelta(seconds=jittered(interval))
+            session.add(sched)
+            session.commit()
+    except Exception as exc:
+        logger.error("Could not reschedule sync for user %d: %s", user_id, exc)
@@ -25,24 +25,32 @@ auth.uid() works natively in RLS policies with no set_config needed.
 """
 
 import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Optional
 
-_supabase: Client | None = None
+from services.metrics import instrument_postgrest
 
+if TYPE_CHECKING:   # supabase is imported on first use — it is slow to import
+    from supabase import Client
 
-def get_base_client() -> Client:
+_supabase: Optional["Client"] = None
+
+
+def get_base_client() -> "Client":
     """Return the shared Supabase client (lazily initialized)."""
     global _supabase
     if _supabase is None:
+        from supabase import create_client
+
         url = os.environ["SUPABASE_URL"]
         # Service role key: bypasses Supabase Auth JWT verification.
         # NEVER expose this key to the frontend.
         key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
         _supabase = create_client(url, key)
+        instrument_postgrest(_supabase)   # round trips per request on /metrics
     return _supabase
 
 
-def get_supabase_for_user(user_id: int) -> Client:
+def get_supabase_for_user(user_id: int) -> "Client":
     """
     Return the Supabase client with the current user's ID set as a Postgres GUC.
 
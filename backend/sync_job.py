@@ -15,115 +15,300 @@ short-lived Supabase JWT at sync-trigger time and use get_supabase_for_user()
 here instead of direct SQLAlchemy access.
 """
 import logging
-from datetime import datetime, date as date_type
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date as date_type, timedelta
+from typing import Optional
 
+from sqlalchemy import and_, or_, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from database import engine
 from extract_transactions import extract_transactions
-from fetch_emails import fetch_bank_emails
-from models import ProcessedEmail, Transaction, User
+from fetch_emails import build_window_query, fetch_bank_emails
+from models import CATEGORIES, ProcessedEmail, SyncBackfill, SyncRun, Transaction, User
+from services import categorizer, sync_schedule
+from services.dashboard_cache import invalidate_user
+from services.email_preprocess import prepare_email
+from services.events import bus, publish_transactions
+from services.rate_limit import TransientAPIError
+from services.merchants import resolve_merchant
+from services.metrics import SCHEDULED_SYNCS, SYNC_DUE_BACKLOG, count_for_run, sync_stage, track_run
+from services.profiling import profile_current_thread
 
 logger = logging.getLogger(__name__)
 
 
-def run_sync_for_user(user: User, days_back: int = 7) -> dict:
+def run_sync_for_user(user: User, days_back: int = 7, profile: bool = False) -> dict:
     """
     Sync emails for a single user. Returns a summary dict.
     Never raises — safe to call from scheduler threads.
+
+    Every run is recorded as a SyncRun row (counts, per-stage seconds,
+    retries, tokens). profile=True also stores a sampling profile of the run
+    (services.profiling, download via /api/profiles) and adds its id to the
+    summary as "profile_id".
+    """
+    started_at = datetime.utcnow()
+    with track_run() as run:
+        if not profile:
+            summary = _sync_user(user, days_back)
+        else:
+            with profile_current_thread("sync", f"user{user.id}-{days_back}d") as prof:
+                summary = _sync_user(user, days_back)
+                prof["summary"] = summary
+            summary = {**summary, "profile_id": prof.get("profile_id", "")}
+    _record_run(user, days_back, started_at, summary, run)
+    sync_schedule.record_sync(user.id, summary, days_back)
+    return summary
+
+
+def _record_run(user: User, days_back: int, started_at: datetime, summary: dict, run: dict) -> None:
+    """Persist the SyncRun history row. Never raises — history is best effort."""
+    counters = run["counters"]
+    finished_at = datetime.utcnow()
+    if summary.get("error"):
+        status = summary["error"]
+    else:
+        status = "ok" if not summary.get("errors") else f"errors={summary['errors']}"
+    try:
+        with Session(engine) as session:
+            session.add(SyncRun(
+                user_id=user.id,
+                started_at=started_at,
+                finished_at=finished_at,
+                duration_s=round((finished_at - started_at).total_seconds(), 3),
+                status=status,
+                days_back=days_back,
+                emails_listed=int(counters["emails_listed"]),
+                emails_skipped=int(counters["emails_already_processed"]) + summary.get("emails_skipped", 0),
+                emails_triaged_out=summary.get("emails_triaged_out", 0),
+                emails_processed=summary.get("emails_processed", 0),
+                emails_deferred=summary.get("emails_deferred", 0),
+                transactions_added=summary.get("transactions_added", 0),
+                errors=summary.get("errors", 0),
+                retries=int(counters["retries"]),
+                tokens_input=int(counters["tokens_input"]),
+                tokens_output=int(counters["tokens_output"]),
+                stage_seconds={stage: round(s, 4) for stage, s in run["stages"].items()},
+            ))
+            session.commit()
+    except Exception as exc:
+        logger.error("Failed to record sync run for user %d: %s", user.id, exc)
+
+
+def _claim_email(session: Session, user_id: int, email_id: str) -> bool:
+    """
+    False if a concurrent sync already recorded email_id. processedemail_key
+    (migrations/0012) rejects the second insert at commit anyway; on Postgres
+    the email is also locked for the rest of the transaction and checked
+    again, so a concurrent sync skips it before paying for extraction. The
+    check is a separate statement so it sees whatever the lock holder committed.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return True
+    params = {"uid": user_id, "eid": email_id}
+    session.execute(text("SELECT pg_advisory_xact_lock(CAST(:uid AS integer), hashtext(:eid))"), params)
+    return session.execute(text(
+        "SELECT 1 FROM processedemail WHERE user_id = :uid AND email_id = :eid LIMIT 1"
+    ), params).first() is None
+
+
+def _new_tally() -> dict:
+    """Counters and committed rows of one sync (or one backfill window)."""
+    return {
+        "emails_processed":   0,
+        "emails_skipped":     0,
+        "emails_triaged_out": 0,
+        "emails_deferred":    0,
+        "transactions_added": 0,
+        "errors":             0,
+        "recategorized":      0,
+        "est_tokens_saved":   0,
+        "learned": [],   # (description, LLM category) for the categorizer
+        "added":   [],   # committed rows, for the dashboard change event
+    }
+
+
+def _process_email(session: Session, user: User, email: dict, tally: dict) -> str:
     """
+    Triage, extract and persist one listed email, counting into tally.
+    Returns the outcome: "triaged_out", "processed", "skipped" (a concurrent
+    sync recorded it first), "deferred" (rate-limited — left unprocessed for
+    the next sync) or "error".
+    """
+    email_id: str = email["id"]
+
+    # Marketing / security notices: marked processed without download or extraction
+    if not email["transactional"]:
+        if not _claim_email(session, user.id, email_id):
+            session.rollback()
+            tally["emails_skipped"] += 1
+            return "skipped"
+        session.add(ProcessedEmail(user_id=user.id, email_id=email_id, transaction_count=0))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            tally["emails_skipped"] += 1
+            return "skipped"
+        tally["emails_triaged_out"] += 1
+        return "triaged_out"
+
+    # Strip boilerplate before it costs input tokens
+    with sync_stage("preprocess"):
+        prepare_email(email)
+    tally["est_tokens_saved"] += email["est_tokens_before"] - email["est_tokens_after"]
+
+    # Extract with Claude
+    try:
+        with sync_stage("extraction"):
+            txns = extract_transactions(
+                email_body=email["body"],
+                email_subject=email["subject"],
+                include_category=categorizer.MODE != "local",
+                email_sender=email.get("from", ""),
+            )
+    except TransientAPIError as exc:
+        # Rate-limited / 5xx past all retries: leave unprocessed for the next sync
+        logger.warning("Extraction deferred email %s user %d: %s", email_id, user.id, exc)
+        tally["emails_deferred"] += 1
+        return "deferred"
+    except Exception as exc:
+        logger.error("Extraction failed email %s user %d: %s", email_id, user.id, exc)
+        tally["errors"] += 1
+        return "error"
+
+    # The LLM's own labels, before the local model touches them — only these
+    # (and user corrections) are training signal, never the model's output
+    llm_labels = [
+        (str(td.get("description", "")), td["category"])
+        for td in txns if td.get("category") in CATEGORIES
+    ] if categorizer.MODE != "local" else []
+    try:
+        tally["recategorized"] += categorizer.apply_to_extracted(user.id, txns)
+    except Exception as exc:
+        logger.error("Local categorizer failed email %s user %d: %s", email_id, user.id, exc)
+
+    if not _claim_email(session, user.id, email_id):
+        session.rollback()
+        tally["emails_skipped"] += 1
+        return "skipped"
+
+    # Persist transactions
+    count = 0
+    rows: list[dict] = []
+    for td in txns:
+        try:
+            txn_date = td.get("date")
+            if isinstance(txn_date, str):
+                txn_date = date_type.fromisoformat(txn_date)
+            description = str(td.get("description", ""))
+            txn = Transaction(
+                user_id=user.id,
+                date=txn_date,
+                description=description,
+                amount=float(td.get("amount", 0)),
+                currency=str(td.get("currency", "PEN")),
+                category=str(td.get("category", "other")),
+                category_source=td.get("category_source", "llm"),
+                bank=str(td.get("bank", "")),
+                email_id=email_id,
+                merchant_id=resolve_merchant(user.id, description),
+            )
+            session.add(txn)
+            rows.append({"date": txn.date, "amount": txn.amount,
+                         "currency": txn.currency, "category": txn.category})
+            count += 1
+        except Exception as exc:
+            logger.error("Failed to save txn from email %s: %s", email_id, exc)
+
+    session.add(ProcessedEmail(
+        user_id=user.id,
+        email_id=email_id,
+        transaction_count=count,
+    ))
+    try:
+        with sync_stage("db_write"):
+            session.commit()
+    except IntegrityError:
+        # A concurrent sync for this user (manual + scheduled) committed
+        # the same email first — processedemail_key (migrations/0012).
+        session.rollback()
+        tally["emails_skipped"] += 1
+        return "skipped"
+    tally["emails_processed"] += 1
+    tally["transactions_added"] += count
+    tally["added"].extend(rows)
+    tally["learned"].extend(llm_labels)
+    logger.info("  ✓ Email %s → %d txn(s) for user %d", email_id, count, user.id)
+    return "processed"
+
+
+def _publish_committed(user: User, tally: dict) -> None:
+    """Cache invalidation, change event and categorizer updates for tally's rows."""
+    if not tally["transactions_added"]:
+        return
+    invalidate_user(user.id)
+    publish_transactions(user.id, "sync", added=tally["added"])
+    # Incremental retrain: only if the model is already in memory — a cold
+    # model picks these rows up from the table when it is first trained.
+    if categorizer.categorizer.trained:
+        for description, category in tally["learned"]:
+            categorizer.categorizer.learn(user.id, description, category)
+
+
+def _sync_user(user: User, days_back: int) -> dict:
     logger.info("⏱  Sync starting for user %d (%s)", user.id, user.email)
     start = datetime.utcnow()
-
-    emails_processed = 0
-    emails_skipped   = 0
-    txns_added       = 0
-    errors           = 0
+    tally = _new_tally()
 
     try:
         # Import here to avoid circular dependency
-        from auth import get_user_gmail_credentials
+        from auth import TokenRefreshFailed, get_user_gmail_credentials, get_user_gmail_service
 
-        creds = get_user_gmail_credentials(user)
+        try:
+            creds = get_user_gmail_credentials(user)
+        except TokenRefreshFailed:
+            return {"error": "token_refresh_failed", "transactions_added": 0}
         if not creds:
             logger.warning("No valid Gmail credentials for user %d — skipping", user.id)
             return {"error": "no_credentials", "transactions_added": 0}
 
         with Session(engine) as session:
-            for email in fetch_bank_emails(credentials=creds, days_back=days_back):
-                email_id: str = email["id"]
-
-                # Deduplication: per-user
-                existing = session.exec(
-                    select(ProcessedEmail).where(
-                        ProcessedEmail.user_id == user.id,
-                        ProcessedEmail.email_id == email_id,
-                    )
-                ).first()
-                if existing:
-                    emails_skipped += 1
-                    continue
-
-                # Extract with Claude
-                try:
-                    txns = extract_transactions(
-                        email_body=email["body"],
-                        email_subject=email["subject"],
-                    )
-                except Exception as exc:
-                    logger.error("Extraction failed email %s user %d: %s", email_id, user.id, exc)
-                    errors += 1
-                    continue
-
-                # Persist transactions
-                count = 0
-                for td in txns:
-                    try:
-                        txn_date = td.get("date")
-                        if isinstance(txn_date, str):
-                            txn_date = date_type.fromisoformat(txn_date)
-                        session.add(Transaction(
-                            user_id=user.id,
-                            date=txn_date,
-                            description=str(td.get("description", "")),
-                            amount=float(td.get("amount", 0)),
-                            currency=str(td.get("currency", "PEN")),
-                            category=str(td.get("category", "other")),
-                            bank=str(td.get("bank", "")),
-                            email_id=email_id,
-                        ))
-                        count += 1
-                    except Exception as exc:
-                        logger.error("Failed to save txn from email %s: %s", email_id, exc)
-
-                session.add(ProcessedEmail(
-                    user_id=user.id,
-                    email_id=email_id,
-                    transaction_count=count,
-                ))
-                session.commit()
-                emails_processed += 1
-                txns_added += count
-                logger.info("  ✓ Email %s → %d txn(s) for user %d", email_id, count, user.id)
+            # Already-processed ids are excluded before any metadata/full download
+            processed_ids = set(session.exec(
+                select(ProcessedEmail.email_id).where(ProcessedEmail.user_id == user.id)
+            ).all())
+
+            for email in fetch_bank_emails(credentials=creds, days_back=days_back,
+                                           exclude_ids=processed_ids, user_id=user.id,
+                                           service=get_user_gmail_service(user, creds)):
+                _process_email(session, user, email, tally)
 
             # Update user sync status
             db_user = session.get(User, user.id)
             if db_user:
                 db_user.last_sync_at     = datetime.utcnow()
-                db_user.last_sync_status = "ok" if errors == 0 else f"errors={errors}"
+                db_user.last_sync_status = "ok" if tally["errors"] == 0 else f"errors={tally['errors']}"
                 session.add(db_user)
                 session.commit()
 
     except Exception as exc:
         logger.error("Sync top-level error for user %d: %s", user.id, exc)
-        errors += 1
+        tally["errors"] += 1
+
+    _publish_committed(user, tally)
 
     elapsed = (datetime.utcnow() - start).total_seconds()
+    txns_added = tally["transactions_added"]
     summary = {
-        "emails_processed":   emails_processed,
-        "emails_skipped":     emails_skipped,
-        "transactions_added": txns_added,
-        "errors":             errors,
+        **{k: v for k, v in tally.items() if k not in ("learned", "added")},
         "duration_seconds":   round(elapsed, 2),
         "message":            f"Sync complete · {txns_added} new transaction(s)",
     }
@@ -132,7 +317,7 @@ def run_sync_for_user(user: User, days_back: int = 7) -> dict:
 
 
 def run_sync_all_users(days_back: int = 7) -> None:
-    """Called by the scheduler every 6 hours — syncs every user."""
+    """Syncs every user now, regardless of their schedule (benchmarks, manual runs)."""
     with Session(engine) as session:
         users = session.exec(select(User)).all()
 
@@ -140,3 +325,313 @@ def run_sync_all_users(days_back: int = 7) -> None:
     for user in users:
         if user.encrypted_refresh_token:
             run_sync_for_user(user, days_back=days_back)
+
+
+
+# Scheduled syncs run on their own bounded pool: run on the scheduler thread,
+# one tick lasted as long as all its syncs, APScheduler (max_instances=1)
+# skipped the ticks in between, and SYNC_MAX_PER_MINUTE was never reached.
+SYNC_MAX_CONCURRENT = int(os.getenv("SYNC_MAX_CONCURRENT", "4"))
+
+# Start times of scheduled syncs in the last minute, for SYNC_MAX_PER_MINUTE
+_recent_starts: deque = deque()
+_sync_pool: Optional[ThreadPoolExecutor] = None
+_in_flight: set[int] = set()
+_in_flight_lock = threading.Lock()
+
+
+def _run_scheduled(user: User, days_back: int) -> None:
+    try:
+        run_sync_for_user(user, days_back=days_back)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(user.id)
+
+
+def run_due_syncs() -> int:
+    """
+    Called by the scheduler every SYNC_TICK_S — hands the users that are due
+    (services.sync_schedule), open dashboards first, to the sync pool without
+    starting more than SYNC_MAX_PER_MINUTE syncs in any minute or running more
+    than SYNC_MAX_CONCURRENT at once. Returns immediately with how many started;
+    users still syncing from an earlier tick are not started twice.
+    """
+    global _sync_pool
+    if _sync_pool is None:
+        _sync_pool = ThreadPoolExecutor(max_workers=SYNC_MAX_CONCURRENT, thread_name_prefix="sync")
+
+    sync_schedule.ensure_schedules()
+    connected = bus.connected_users()
+    due = sync_schedule.due_user_ids(connected)
+
+    started = running = 0
+    for user_id in due:
+        with _in_flight_lock:
+            busy = user_id in _in_flight
+            full = len(_in_flight) >= SYNC_MAX_CONCURRENT
+        if busy:
+            running += 1
+            continue
+        if full:
+            break   # the rest stay due for the next tick
+        now = time.monotonic()
+        while _recent_starts and now - _recent_starts[0] >= 60:
+            _recent_starts.popleft()
+        if len(_recent_starts) >= sync_schedule.SYNC_MAX_PER_MINUTE:
+            break
+        with Session(engine) as session:
+            user = session.get(User, user_id)
+        if user is None or not user.encrypted_refresh_token:
+            continue
+        _recent_starts.append(now)
+        with _in_flight_lock:
+            _in_flight.add(user_id)
+        priority = "connected" if user_id in connected else "due"
+        SCHEDULED_SYNCS.inc(priority=priority)
+        _sync_pool.submit(
+            _run_scheduled, user, sync_schedule.scheduled_days_back(user_id),
+        )
+        started += 1
+
+    SYNC_DUE_BACKLOG.set(max(len(due) - started - running, 0))
+    if due:
+        logger.info("⏰ Scheduled sync: started %d of %d due user(s), %d still running",
+                    started, len(due), running)
+    return started
+
+
+def shutdown_scheduled_syncs() -> None:
+    """Stop taking scheduled syncs; running ones finish in the background."""
+    if _sync_pool is not None:
+        _sync_pool.shutdown(wait=False, cancel_futures=True)
+
+# ── Backfill ──────────────────────────────────────────────────────────────────
+# A days_back=180 sync lists the whole range in one loop with every processed
+# id in memory, and if it dies halfway the next run lists it all again. A
+# backfill walks the range newest-first in BACKFILL_WINDOW_DAYS windows and
+# checkpoints (window, Gmail page token) in SyncBackfill after every page, so
+# a restart, an expired token or a rate-limit pause resumes at the page it
+# stopped on; emails of that page already processed are skipped by the
+# per-page lookup. Memory stays flat: no id set is preloaded and committed
+# rows are published page by page. Each run stops after BACKFILL_RUN_BUDGET_S
+# and resume_backfills() (scheduler) picks it up again.
+
+BACKFILL_WINDOW_DAYS  = int(os.getenv("BACKFILL_WINDOW_DAYS", "14"))
+BACKFILL_RUN_BUDGET_S = float(os.getenv("BACKFILL_RUN_BUDGET_S", "600"))
+# A "running" checkpoint not updated for this long belongs to a dead process
+BACKFILL_STALE_S      = float(os.getenv("BACKFILL_STALE_S", "900"))
+# Runs that retry a page with failed emails before the backfill moves past them
+BACKFILL_PAGE_ATTEMPTS = int(os.getenv("BACKFILL_PAGE_ATTEMPTS", "3"))
+
+
+class _PageIncomplete(Exception):
+    """Raised from on_page to stop listing before an incomplete page is checkpointed."""
+
+
+def _claimable(now: datetime):
+    stale = now - timedelta(seconds=BACKFILL_STALE_S)
+    return or_(SyncBackfill.status.in_(("queued", "paused")),
+               and_(SyncBackfill.status == "running", SyncBackfill.updated_at < stale))
+
+
+def start_backfill(user: User, days_back: int) -> SyncBackfill:
+    """The user's unfinished backfill as it stands, else a new one over days_back."""
+    now = datetime.utcnow()
+    with Session(engine, expire_on_commit=False) as session:
+        job = session.exec(select(SyncBackfill).where(SyncBackfill.user_id == user.id)).first()
+        if job is not None and job.status != "done":
+            return job
+        job = job or SyncBackfill(user_id=user.id, range_start=now, window_end=now)
+        job.sqlmodel_update({
+            "status": "queued", "days_back": days_back, "window_days": BACKFILL_WINDOW_DAYS,
+            "range_start": now - timedelta(days=days_back), "window_end": now, "page_token": None,
+            "windows_done": 0, "windows_total": math.ceil(days_back / BACKFILL_WINDOW_DAYS),
+            "emails_listed": 0, "emails_processed": 0, "emails_failed": 0, "page_attempts": 0,
+            "transactions_added": 0, "active_seconds": 0.0, "last_error": None,
+            "started_at": now, "updated_at": now, "finished_at": None,
+        })
+        session.add(job)
+        try:
+            session.commit()
+        except IntegrityError:
+            # A concurrent request created it first — ux_syncbackfill_user_id
+            session.rollback()
+            job = session.exec(select(SyncBackfill).where(SyncBackfill.user_id == user.id)).one()
+        return job
+
+
+def _claim_backfill(user_id: int) -> bool:
+    """Atomically mark the user's backfill running; False if there is none to
+    run or a live process holds it."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(SyncBackfill)
+            .where(SyncBackfill.user_id == user_id, _claimable(now))
+            .values(status="running", updated_at=now)
+        )
+    return result.rowcount == 1
+
+
+def _save_backfill(job: SyncBackfill) -> None:
+    job.updated_at = datetime.utcnow()
+    with Session(engine, expire_on_commit=False) as session:
+        session.add(job)
+        session.commit()
+
+
+def run_backfill(user: User, budget_s: float = BACKFILL_RUN_BUDGET_S) -> dict:
+    """
+    Continue the user's backfill for up to budget_s seconds. Never raises.
+    Returns the run summary ({"claimed": False} when there is nothing to run
+    or another process is running it). Each run is recorded as a SyncRun.
+    """
+    if not _claim_backfill(user.id):
+        return {"claimed": False}
+    with Session(engine, expire_on_commit=False) as session:
+        job = session.exec(select(SyncBackfill).where(SyncBackfill.user_id == user.id)).one()
+
+    started_at = datetime.utcnow()
+    with track_run() as run:
+        summary = _backfill_user(user, job, budget_s, run)
+    _record_run(user, job.days_back, started_at, summary, run)
+    return summary
+
+
+def _backfill_user(user: User, job: SyncBackfill, budget_s: float, run: dict) -> dict:
+    logger.info("⏱  Backfill resuming for user %d at window %d/%d", user.id,
+                job.windows_done + 1, job.windows_total)
+    t0 = last = time.monotonic()
+    listed_before = job.emails_listed
+    totals = _new_tally()
+    stop = None   # why this run ended before the backfill did
+
+    def account(tally: dict) -> None:
+        # Fold a page's counts into the run totals and the checkpoint
+        nonlocal last
+        now = time.monotonic()
+        job.active_seconds += now - last
+        last = now
+        job.emails_listed = listed_before + int(run["counters"]["emails_listed"])
+        job.emails_processed += tally["emails_processed"] + tally["emails_triaged_out"]
+        job.transactions_added += tally["transactions_added"]
+        _publish_committed(user, tally)
+        for key, value in tally.items():
+            if key not in ("learned", "added"):
+                totals[key] += value
+        tally.update(_new_tally())
+
+    try:
+        from auth import TokenRefreshFailed, get_user_gmail_credentials, get_user_gmail_service
+
+        try:
+            creds = get_user_gmail_credentials(user)
+        except TokenRefreshFailed:
+            creds, stop = None, "token_refresh_failed"
+        if not creds and stop is None:
+            stop = "no_credentials"
+        service = get_user_gmail_service(user, creds) if creds else None
+
+        while stop is None and job.windows_done < job.windows_total:
+            after = max(job.window_end - timedelta(days=job.window_days), job.range_start)
+            tally = _new_tally()
+            page_errors: list[str] = []   # ids of this page whose extraction failed
+
+            def on_page(next_token, failed_ids):
+                account(tally)
+                failed = failed_ids + page_errors
+                page_errors.clear()
+                if failed:
+                    job.page_attempts += 1
+                    if job.page_attempts < BACKFILL_PAGE_ATTEMPTS:
+                        # Keep the checkpoint on this page: the next run lists it
+                        # again and retries only the emails still unprocessed
+                        raise _PageIncomplete(f"{len(failed)} email(s) failed on this page")
+                    logger.error("Backfill user %d: giving up on %d email(s) after %d attempts: %s",
+                                 user.id, len(failed), job.page_attempts, ", ".join(failed))
+                    job.emails_failed += len(failed)
+                job.page_attempts = 0
+                job.page_token = next_token
+                if next_token is None:   # window finished
+                    job.window_end, job.windows_done = after, job.windows_done + 1
+                _save_backfill(job)
+
+            with Session(engine) as session:
+                def is_processed(ids: list[str]) -> set[str]:
+                    return set(session.exec(
+                        select(ProcessedEmail.email_id)
+                        .where(ProcessedEmail.user_id == user.id, ProcessedEmail.email_id.in_(ids))
+                    ).all())
+
+                try:
+                    for email in fetch_bank_emails(
+                        credentials=creds, user_id=user.id, service=service,
+                        query=build_window_query(after, job.window_end),
+                        page_token=job.page_token, is_processed=is_processed, on_page=on_page,
+                    ):
+                        if time.monotonic() - t0 > budget_s:
+                            stop = "time_budget"
+                            break
+                        outcome = _process_email(session, user, email, tally)
+                        if outcome == "deferred":
+                            # Throttled: stop before the page is checkpointed so the
+                            # deferred email is retried when the backfill resumes
+                            stop = "rate_limited"
+                            break
+                        if outcome == "error":
+                            page_errors.append(email["id"])
+                except _PageIncomplete as exc:
+                    logger.warning("Backfill user %d: %s — retrying the page on the next run", user.id, exc)
+                    stop = "incomplete_page"
+                except Exception as exc:
+                    if job.page_token and getattr(getattr(exc, "resp", None), "status", None) == 400:
+                        # Gmail no longer accepts the saved page token: redo the window
+                        logger.warning("Backfill page token rejected for user %d — restarting window", user.id)
+                        job.page_token = None
+                    logger.error("Backfill error for user %d: %s", user.id, exc)
+                    stop = str(exc)[:500]
+                finally:
+                    account(tally)   # rows of a page cut short
+
+    except Exception as exc:
+        logger.error("Backfill top-level error for user %d: %s", user.id, exc)
+        stop = str(exc)[:500]
+
+    if job.windows_done >= job.windows_total:
+        job.status, job.finished_at, job.last_error = "done", datetime.utcnow(), None
+    else:
+        job.status = "paused"
+        job.last_error = None if stop == "time_budget" else stop
+    try:
+        _save_backfill(job)
+    except Exception as exc:
+        logger.error("Could not checkpoint backfill for user %d: %s", user.id, exc)
+
+    elapsed = time.monotonic() - t0
+    summary = {
+        **{k: v for k, v in totals.items() if k not in ("learned", "added")},
+        "duration_seconds":   round(elapsed, 2),
+        "backfill_status":    job.status,
+        "windows_done":       job.windows_done,
+        "windows_total":      job.windows_total,
+        "message":            f"Backfill {job.status} · {totals['transactions_added']} new transaction(s)",
+    }
+    if stop not in (None, "time_budget"):
+        summary["error"] = stop if stop in ("no_credentials", "token_refresh_failed", "rate_limited", "incomplete_page") else "backfill_error"
+    logger.info("✅ Backfill run done in %.1fs for user %d — %s", elapsed, user.id, summary)
+    return summary
+
+
+def resume_backfills() -> None:
+    """Called by the scheduler — continues every queued, paused or abandoned backfill."""
+    with Session(engine) as session:
+        users = session.exec(
+            select(User).join(SyncBackfill, SyncBackfill.user_id == User.id)
+            .where(_claimable(datetime.utcnow()))
+        ).all()
+
+    if users:
+        logger.info("⏰ Resuming %d backfill(s)", len(users))
+    for user in users:
+        if user.encrypted_refresh_token:
+            run_backfill(user)
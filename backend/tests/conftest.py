@@ -0,0 +1,19 @@
+"""Point the legacy SQLModel engine at a throwaway SQLite file before any
+test module imports database.py."""
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+
+@pytest.fixture
+def db():
+    import models  # noqa: F401 — registers the tables
+    from database import create_db_and_tables, engine
+    from sqlmodel import SQLModel
+
+    create_db_and_tables()
+    yield engine
+    SQLModel.metadata.drop_all(engine)
@@ -0,0 +1,60 @@
+"""services.analytics bucketing and range aggregation.
+Run from backend/: python -m pytest tests"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from services import analytics, fx_rates
+
+
+@pytest.fixture(autouse=True)
+def fixed_rate(monkeypatch):
+    monkeypatch.setattr(fx_rates, "get_exchange_rate", lambda base, target: 0.25)
+
+
+def _days(*isos):
+    return fx_rates.to_epoch_days(list(isos))
+
+
+def test_weeks_start_on_monday():
+    # 2025-03-09 is a Sunday, 2025-03-10 a Monday
+    sun, mon, next_sun = analytics.bucket_index(_days("2025-03-09", "2025-03-10", "2025-03-16"), "week")
+    assert mon == next_sun == sun + 1
+    assert analytics.bucket_starts(int(mon), 1, "week") == ["2025-03-10"]
+
+
+@pytest.mark.parametrize("bucket, start", [
+    ("day", "2025-05-17"), ("month", "2025-05-01"), ("quarter", "2025-04-01"),
+])
+def test_bucket_starts_round_trip(bucket, start):
+    idx = int(analytics.bucket_index(_days("2025-05-17"), bucket)[0])
+    assert analytics.bucket_starts(idx, 1, bucket) == [start]
+
+
+def test_bucket_count():
+    assert analytics.bucket_count(date(2025, 1, 15), date(2025, 3, 1), "month") == 3
+    assert analytics.bucket_count(date(2025, 1, 1), date(2025, 12, 31), "quarter") == 4
+
+
+def test_aggregate_fills_gaps_and_splits_groups():
+    rows = [
+        {"date": "2025-01-10", "amount": -40.0, "currency": "PEN", "category": "groceries"},
+        {"date": "2025-01-20", "amount": 1000.0, "currency": "USD", "category": "salary"},
+        {"date": "2025-03-05", "amount": -20.0, "currency": "USD", "category": "transport"},
+    ]
+    out = analytics.aggregate(rows, date(2025, 1, 1), date(2025, 3, 31), "month", group_by="category")
+    assert out["buckets"] == ["2025-01-01", "2025-02-01", "2025-03-01"]
+    assert out["totals"]["income"] == [1000.0, 0.0, 0.0]
+    assert out["totals"]["expenses"] == [10.0, 0.0, 20.0]
+    assert out["totals"]["net"] == [990.0, 0.0, -20.0]
+    series = {s["key"]: s for s in out["series"]}
+    assert out["series"][0]["key"] == "transport"        # largest spend first
+    assert series["groceries"]["expenses"] == [10.0, 0.0, 0.0]
+    assert series["salary"]["income"] == [1000.0, 0.0, 0.0]
+
+
+def test_aggregate_empty():
+    out = analytics.aggregate([], date(2025, 1, 1), date(2025, 1, 7), "day")
+    assert len(out["buckets"]) == 7
+    assert np.allclose(out["totals"]["net"], 0)
@@ -0,0 +1,54 @@
+"""services.categorizer: training sources and the per-user model LRU.
+Run from backend/: python -m pytest tests"""
+from datetime import date
+
+import pytest
+from sqlmodel import Session
+
+from models import Transaction
+from services import categorizer as cat
+
+
+def _pairs(user_id: int, n: int = 6):
+    return [(user_id, f"TRANSF YAPE {i}", "transfer") for i in range(n)]
+
+
+def test_lru_evicts_least_recently_used():
+    model = cat.Categorizer(max_user_models=2)
+    model.fit(_pairs(1) + _pairs(2))
+    model.predict("TRANSF YAPE", user_id=1)          # 1 is now the most recent
+    model.learn(3, "PLAZA VEA", "groceries")
+    assert list(model.user_models) == [1, 3]
+    assert model.evicted == {2}
+
+
+def test_evicted_user_is_not_updated_until_restored():
+    model = cat.Categorizer(max_user_models=1)
+    model.fit(_pairs(1) + _pairs(2))
+    assert model.evicted == {2}
+    model.learn(2, "PLAZA VEA", "groceries")
+    assert 2 not in model.user_models
+
+    model.restore_user(2, _pairs(2))
+    assert model.user_models[2].examples == 6
+    assert model.evicted == {1}
+
+
+def test_apply_marks_model_labels(monkeypatch):
+    model = cat.Categorizer()
+    model.fit(_pairs(1, 20))
+    monkeypatch.setattr(cat, "categorizer", model)
+    monkeypatch.setattr(cat, "MODE", "local")
+    txns = [{"description": "TRANSF YAPE 3", "category": "other"}]
+    assert cat.apply_to_extracted(1, txns) == 1
+    assert txns[0]["category_source"] == "model"
+
+
+def test_load_pairs_skips_model_labels(db):
+    with Session(db) as session:
+        for source, category in (("llm", "groceries"), ("user", "transfer"), ("model", "restaurants")):
+            session.add(Transaction(user_id=1, date=date(2025, 1, 1), description=f"X {source}",
+                                    amount=-1.0, category=category, category_source=source, bank="BCP"))
+        session.commit()
+    assert sorted(c for _, _, c in cat.load_pairs()) == ["groceries", "transfer"]
+    assert cat.load_pairs(user_id=2) == []
@@ -0,0 +1,78 @@
+"""services.dashboard_cache: LRU bounds, invalidation and generations.
+Run from backend/: python -m pytest tests"""
+from services.dashboard_cache import DashboardCache, cache_key
+
+
+def _key(user_id: int, endpoint: str = "summary", month: int = 1):
+    return cache_key(user_id, endpoint, month, 2025, "r1")
+
+
+def test_evicts_least_recently_used_entry():
+    cache = DashboardCache(max_entries=2, max_bytes=1 << 20)
+    cache.put(_key(1, month=1), {"a": 1})
+    cache.put(_key(1, month=2), {"a": 2})
+    assert cache.get(_key(1, month=1)) == {"a": 1}     # month 2 is now the oldest
+    cache.put(_key(1, month=3), {"a": 3})
+    assert cache.get(_key(1, month=2)) is None
+    assert cache.get(_key(1, month=1)) == {"a": 1}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_bound():
+    cache = DashboardCache(max_entries=100, max_bytes=40)
+    cache.put(_key(1, month=1), "x" * 20)
+    cache.put(_key(1, month=2), "y" * 20)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= 40
+    cache.put(_key(1, month=3), "z" * 100)               # larger than the cache: not stored
+    assert cache.get(_key(1, month=3)) is None
+
+
+def test_invalidate_user_by_endpoint():
+    cache = DashboardCache(max_entries=10, max_bytes=1 << 20)
+    cache.put(_key(1, "summary"), 1)
+    cache.put(_key(1, "budget-status"), 2)
+    cache.put(_key(2, "summary"), 3)
+    assert cache.invalidate_user(1, endpoints=["budget-status"]) == 1
+    assert cache.get(_key(1, "summary")) == 1
+    assert cache.invalidate_user(1) == 1
+    assert cache.get(_key(1, "summary")) is None
+    assert cache.get(_key(2, "summary")) == 3
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = DashboardCache(max_entries=10, max_bytes=1 << 20)
+    generation = cache.generation(1)
+    cache.invalidate_user(1)                               # a write lands mid-compute
+    cache.put(_key(1), "stale", generation)
+    assert cache.get(_key(1)) is None
+    cache.put(_key(1), "fresh", cache.generation(1))
+    assert cache.get(_key(1)) == "fresh"
+
+
+def test_get_or_compute_does_not_store_across_invalidation():
+    cache = DashboardCache(max_entries=10, max_bytes=1 << 20)
+
+    def compute():
+        cache.invalidate_user(1)
+        return "stale"
+
+    assert cache.get_or_compute(_key(1), compute) == "stale"
+    assert cache.get(_key(1)) is None
+
+
+def test_clear_invalidates_pending_puts():
+    cache = DashboardCache(max_entries=10, max_bytes=1 << 20)
+    cache.put(_key(1), 1)
+    generation = cache.generation(1)
+    cache.clear()
+    cache.put(_key(1), 2, generation)
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_computes_every_time():
+    cache = DashboardCache(max_entries=0)
+    calls = []
+    cache.get_or_compute(_key(1), lambda: calls.append(1))
+    cache.get_or_compute(_key(1), lambda: calls.append(1))
+    assert len(calls) == 2
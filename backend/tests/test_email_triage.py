@@ -0,0 +1,15 @@
+"""services.email_triage.classify. Run from backend/: python -m pytest tests"""
+import pytest
+
+from services import email_triage
+
+
+@pytest.mark.parametrize("sender, subject, snippet, expected", [
+    ("alertas@bcp.com.pe", "Consumo con tu tarjeta", "", (True, "generic:transactional")),
+    ("alertas@bcp.com.pe", "Constancia de transferencia", "", (True, "bcp.com.pe:transactional")),
+    ("avisos@bbva.pe", "Ofertas de la semana", "", (False, "generic:skip")),
+    ("avisos@bbva.pe", "Ofertas", "Consumo de S/ 25.00", (True, "generic:transactional")),
+    ("news@interbank.pe", "Hola", "", (True, "default")),
+])
+def test_classify(sender, subject, snippet, expected):
+    assert email_triage.classify(sender, subject, snippet) == expected
@@ -0,0 +1,54 @@
+"""services.events.transaction_deltas. Run from backend/: python -m pytest tests"""
+from datetime import date
+
+import pytest
+
+from services import events, fx_rates
+
+PEN_TO_USD = 0.25
+
+
+@pytest.fixture(autouse=True)
+def fixed_rate(monkeypatch):
+    monkeypatch.setattr(fx_rates, "get_exchange_rate", lambda base, target: PEN_TO_USD)
+
+
+def _row(**kw):
+    return {"date": date(2025, 3, 14), "amount": -40.0, "currency": "PEN", "category": "groceries", **kw}
+
+
+def test_pen_expense():
+    deltas = events.transaction_deltas(added=[_row()])
+    assert list(deltas) == ["2025-03"]
+    d = deltas["2025-03"]
+    assert d["count"] == 1
+    assert d["pen"] == {"income": 0.0, "expenses": -40.0, "net": -40.0}
+    assert d["usd"] == {"income": 0.0, "expenses": 0.0, "net": 0.0}
+    assert d["total_usd"] == {"income": 0.0, "expenses": -10.0, "net": -10.0}
+    assert d["by_category"] == {"groceries": 10.0}
+
+
+def test_usd_income():
+    deltas = events.transaction_deltas(added=[_row(amount=1200.0, currency="USD", category="income",
+                                                   date="2025-04-01")])
+    d = deltas["2025-04"]
+    assert d["count"] == 1
+    assert d["usd"] == {"income": 1200.0, "expenses": 0.0, "net": 1200.0}
+    assert d["pen"] == {"income": 0.0, "expenses": 0.0, "net": 0.0}
+    assert d["total_usd"] == {"income": 1200.0, "expenses": 0.0, "net": 1200.0}
+    assert d["by_category"] == {}
+
+
+def test_category_only_edit_moves_spend():
+    before = _row()
+    deltas = events.transaction_deltas(added=[_row(category="restaurants")], removed=[before])
+    d = deltas["2025-03"]
+    assert d["count"] == 0
+    assert d["total_usd"] == {"income": 0.0, "expenses": 0.0, "net": 0.0}
+    assert d["by_category"] == {"groceries": -10.0, "restaurants": 10.0}
+
+
+def test_description_only_edit_is_empty():
+    before = _row(description="WONG SAN ISIDRO")
+    after = _row(description="Wong")
+    assert events.transaction_deltas(added=[after], removed=[before]) == {}
@@ -0,0 +1,33 @@
+"""extract_transactions._fast_output_problem: when the fast model's output is
+escalated. Run from backend/: python -m pytest tests"""
+import json
+
+import pytest
+
+from extract_transactions import _fast_output_problem
+
+REQUIRED = {"date", "description", "amount", "currency", "bank"}
+
+
+def _txn(**kw):
+    return {"date": "2025-03-14", "description": "WONG", "amount": -40.0,
+            "currency": "PEN", "bank": "BCP", **kw}
+
+
+@pytest.mark.parametrize("raw, expected_amounts, problem", [
+    (json.dumps([_txn()]), 1, None),
+    ("```json\n" + json.dumps([_txn()]) + "\n```", 1, None),
+    ("[]", 0, None),
+    ("[]", 1, "empty_output"),
+    ("not json", 1, "invalid_json"),
+    (json.dumps(_txn()), 1, "not_a_list"),
+    (json.dumps([{"date": "2025-03-14"}]), 1, "missing_fields"),
+    (json.dumps([_txn(date="14/03/2025")]), 1, "bad_date"),
+    (json.dumps([_txn(amount="40")]), 1, "bad_amount"),
+    (json.dumps([_txn(amount=True)]), 1, "bad_amount"),
+    (json.dumps([_txn(currency="EUR")]), 1, "bad_currency"),
+    (json.dumps([_txn(description=" ")]), 1, "empty_description"),
+    (json.dumps([_txn(currency=["PEN"])]), 1, "bad_field_type"),
+])
+def test_fast_output_problem(raw, expected_amounts, problem):
+    assert _fast_output_problem(raw, REQUIRED, expected_amounts) == problem
@@ -0,0 +1,51 @@
+"""services.fx_rates.convert_batch over the real lookup chain, API down.
+Run from backend/: python -m pytest tests"""
+import httpx
+import numpy as np
+import pytest
+
+from services import exchange_rate, fx_rates
+
+
+@pytest.fixture(autouse=True)
+def api_down(db, monkeypatch):
+    calls = []
+
+    def fail(url, **kw):
+        calls.append(url)
+        raise httpx.ConnectError("offline")
+
+    monkeypatch.setattr(httpx, "get", fail)
+    monkeypatch.setattr(exchange_rate, "_api_failed_at", {})
+    monkeypatch.setattr(exchange_rate, "_unavailable_at", {})
+    with fx_rates._lock:
+        fx_rates._index.clear()
+    return calls
+
+
+def test_known_pair_uses_fallback_rate():
+    out = fx_rates.convert_batch([100.0, 5.0], ["PEN", "USD"])
+    np.testing.assert_allclose(out, [27.0, 5.0])
+
+
+def test_unknown_currency_converts_as_pen():
+    out = fx_rates.convert_batch([100.0, 100.0, 10.0], ["PEN", "S/", "USD"])
+    np.testing.assert_allclose(out, [27.0, 27.0, 10.0])
+
+
+def test_unknown_currency_with_dates():
+    out = fx_rates.convert_batch([100.0, 100.0], ["EUR", "USD"], dates=["2025-01-02", "2025-01-03"])
+    np.testing.assert_allclose(out, [27.0, 100.0])
+
+
+def test_unknown_currency_to_pen_is_unchanged():
+    out = fx_rates.convert_batch([100.0], ["S/"], to_currency="PEN")
+    np.testing.assert_allclose(out, [100.0])
+
+
+def test_misses_are_cached(api_down):
+    fx_rates.convert_batch([1.0], ["S/"])
+    fx_rates.convert_batch([1.0], ["S/"])
+    assert sum("S/" in url for url in api_down) == 1
+    with pytest.raises(exchange_rate.ExchangeRateUnavailable):
+        exchange_rate.get_exchange_rate("S/", "USD")
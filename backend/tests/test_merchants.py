@@ -0,0 +1,19 @@
+"""services.merchants.normalize_key. Run from backend/: python -m pytest tests"""
+import pytest
+
+from services.merchants import normalize_key
+
+
+@pytest.mark.parametrize("description", [
+    "WONG SAN ISIDRO", "Wong.pe", "COMPRA EN WONG 0231", "Wóng Miraflores",
+])
+def test_normalize_key_merges_branches(description):
+    assert normalize_key(description) == "WONG"
+
+
+def test_normalize_key_strips_processor_prefix():
+    assert normalize_key("PAYU*NETFLIX.COM") == "NETFLIX"
+
+
+def test_normalize_key_empty():
+    assert normalize_key("  0231  ") == ""
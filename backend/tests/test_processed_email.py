@@ -0,0 +1,40 @@
+"""(user_id, email_id) uniqueness of processedemail through processedemail_key.
+Run from backend/: python -m pytest tests"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from models import ProcessedEmail, ProcessedEmailKey
+from services import partitions
+
+
+def _add(engine, email_id: str, processed_at: datetime | None = None) -> None:
+    with Session(engine) as session:
+        session.add(ProcessedEmail(user_id=1, email_id=email_id,
+                                   processed_at=processed_at or datetime.utcnow()))
+        session.commit()
+
+
+def test_duplicate_insert_fails(db):
+    _add(db, "m1")
+    with pytest.raises(IntegrityError):
+        _add(db, "m1")
+
+
+def test_delete_frees_the_key(db):
+    _add(db, "m1")
+    with Session(db) as session:
+        session.delete(session.exec(select(ProcessedEmail)).one())
+        session.commit()
+    _add(db, "m1")
+
+
+def test_retention_prunes_keys(db):
+    old = datetime.utcnow() - timedelta(days=partitions.PROCESSED_EMAIL_RETENTION_DAYS + 30)
+    _add(db, "old", processed_at=old)
+    _add(db, "new")
+    partitions.maintain_partitions(db, today=date.today())
+    with Session(db) as session:
+        assert session.exec(select(ProcessedEmailKey.email_id)).all() == ["new"]
@@ -0,0 +1,124 @@
+"""services.sync_schedule interval, window and error policy.
+Run from backend/: python -m pytest tests"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from models import SyncSchedule
+from services import sync_schedule as ss
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(ss, "jittered", lambda interval: interval)
+
+
+def _schedule(engine, **kw) -> SyncSchedule:
+    with Session(engine) as session:
+        sched = SyncSchedule(user_id=1, next_sync_at=NOW, last_active_at=NOW, **kw)
+        session.add(sched)
+        session.commit()
+        session.refresh(sched)
+        return sched
+
+
+def _load(engine) -> SyncSchedule:
+    with Session(engine) as session:
+        return session.exec(select(SyncSchedule).where(SyncSchedule.user_id == 1)).one()
+
+
+# ── Pure policy ──────────────────────────────────────────────────────────────
+
+def test_updated_rate_moves_towards_observed():
+    rate = ss.updated_rate(1.0, new_emails=10, elapsed_s=86400)
+    assert 1.0 < rate < 10.0
+    assert ss.updated_rate(4.0, new_emails=4, elapsed_s=86400) == pytest.approx(4.0)
+
+
+def test_updated_rate_floors_elapsed():
+    # A sync seconds after the previous one must not read as thousands/day
+    assert ss.updated_rate(1.0, 1, 1.0) == ss.updated_rate(1.0, 1, 60.0)
+
+
+def test_days_back_for():
+    assert ss.days_back_for(None, NOW) == ss.SCHEDULED_DAYS_BACK
+    assert ss.days_back_for(NOW - timedelta(hours=2), NOW) == 2
+    assert ss.days_back_for(NOW - timedelta(days=30), NOW) == ss.SCHEDULED_DAYS_BACK
+
+
+def test_days_back_for_covers_unprocessed_mail():
+    assert ss.days_back_for(NOW - timedelta(hours=2), NOW,
+                            unprocessed_since=NOW - timedelta(days=4)) == 5
+
+
+def test_backoff_interval_doubles_up_to_normal():
+    base = ss.SYNC_ERROR_BACKOFF_S
+    assert ss.backoff_interval(1, 86400) == base
+    assert ss.backoff_interval(2, 86400) == 2 * base
+    assert ss.backoff_interval(50, 86400) == 86400
+
+
+# ── record_sync ──────────────────────────────────────────────────────────────
+
+def test_success_moves_window_and_resets_failures(db):
+    _schedule(db, last_synced_at=NOW - timedelta(hours=6), failed_syncs=3)
+    ss.record_sync(1, {"emails_processed": 2, "errors": 0}, days_back=1, now=NOW)
+    sched = _load(db)
+    assert sched.last_synced_at == NOW
+    assert sched.failed_syncs == 0
+    assert sched.unprocessed_since is None
+    assert sched.next_sync_at > NOW
+
+
+def test_failed_sync_keeps_window_and_backs_off(db):
+    # First 7-day sync fails entirely: the retry must list the 7 days again
+    _schedule(db)
+    ss.record_sync(1, {"emails_processed": 0, "errors": 5}, days_back=7, now=NOW)
+    sched = _load(db)
+    assert sched.last_synced_at is None
+    assert sched.failed_syncs == 1
+    assert sched.next_sync_at == NOW + timedelta(seconds=ss.SYNC_ERROR_BACKOFF_S)
+    retry = NOW + timedelta(minutes=15)
+    assert ss.scheduled_days_back(1, now=retry) == ss.SCHEDULED_DAYS_BACK
+
+
+def test_partial_sync_keeps_leftovers_in_window(db):
+    _schedule(db, last_synced_at=NOW - timedelta(days=6))
+    ss.record_sync(1, {"emails_processed": 3, "emails_deferred": 2}, days_back=7, now=NOW)
+    sched = _load(db)
+    assert sched.last_synced_at == NOW
+    assert sched.unprocessed_since == NOW - timedelta(days=7)
+    assert ss.scheduled_days_back(1, now=NOW + timedelta(hours=1)) == ss.SCHEDULED_DAYS_BACK
+
+    ss.record_sync(1, {"emails_processed": 2}, days_back=7, now=NOW + timedelta(hours=1))
+    assert _load(db).unprocessed_since is None
+    assert ss.scheduled_days_back(1, now=NOW + timedelta(hours=2)) == 2
+
+
+def test_transient_token_failure_backs_off(db):
+    _schedule(db, last_synced_at=NOW - timedelta(hours=6))
+    ss.record_sync(1, {"error": "token_refresh_failed"}, now=NOW)
+    sched = _load(db)
+    assert sched.failed_syncs == 1
+    assert sched.last_synced_at == NOW - timedelta(hours=6)
+    assert sched.next_sync_at == NOW + timedelta(seconds=ss.SYNC_ERROR_BACKOFF_S)
+
+
+def test_revoked_token_waits_long(db):
+    _schedule(db, last_synced_at=NOW - timedelta(hours=6))
+    ss.record_sync(1, {"error": "no_credentials"}, now=NOW)
+    assert _load(db).next_sync_at == NOW + timedelta(seconds=ss.SYNC_INACTIVE_MAX_INTERVAL_S)
+
+
+def test_connected_boost_skipped_while_backing_off(db):
+    _schedule(db, last_synced_at=NOW - timedelta(days=1), failed_syncs=1)
+    with Session(db) as session:
+        sched = session.exec(select(SyncSchedule)).one()
+        sched.next_sync_at = NOW + timedelta(minutes=10)
+        session.add(sched)
+        session.commit()
+    assert ss.due_user_ids({1}, now=NOW) == []
+    assert ss.due_user_ids({1}, now=NOW + timedelta(minutes=10)) == [1]
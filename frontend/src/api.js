@@ -95,3 +95,56 @@ export const getExchangeRate = () =>
 // ── Sync ──────────────────────────────────────────────────────────────────────
 export const triggerSync = (daysBack = 7) =>
   api.post('/sync', { days_back: daysBack }).then((r) => r.data)
+
+// Large ranges run as a checkpointed background backfill; poll for progress
+export const startBackfill = (daysBack = 180) =>
+  api.post('/sync/backfill', { days_back: daysBack }).then((r) => r.data)
+
+export const getBackfill = () =>
+  api.get('/sync/backfill').then((r) => r.data).catch((err) => {
+    if (err.response?.status === 404) return null
+    throw err
+  })
+
+// ── Live updates ──────────────────────────────────────────────────────────────
+// Server-Sent Events of data changes. EventSource can't send headers, so the
+// URL carries a short-lived stream ticket (never the session token), fetched
+// again for every (re)connect. handlers: { eventName: (data) => … };
+// 'error' fires when the connection drops, then it reconnects by itself.
+const STREAM_RETRY_MS = 3000
+
+export const openEventStream = (handlers) => {
+  let source = null
+  let retry = null
+  let closed = false
+
+  const connect = async () => {
+    let query = ''
+    if (getToken()) {
+      try {
+        const { ticket } = await api.post('/events/ticket').then((r) => r.data)
+        query = `?ticket=${encodeURIComponent(ticket)}`
+      } catch {
+        if (!closed) retry = setTimeout(connect, STREAM_RETRY_MS)
+        return
+      }
+    }
+    if (closed) return
+    source = new EventSource(`${BACKEND_URL}/api/events${query}`, { withCredentials: true })
+    Object.entries(handlers).forEach(([type, fn]) =>
+      source.addEventListener(type, (e) => fn(e.data ? JSON.parse(e.data) : {}))
+    )
+    // The browser's own reconnect would reuse the (by then expired) ticket
+    source.addEventListener('error', () => {
+      source.close()
+      if (!closed) retry = setTimeout(connect, STREAM_RETRY_MS)
+    })
+  }
+
+  connect()
+  return () => {
+    closed = true
+    clearTimeout(retry)
+    source?.close()
+  }
+}
@@ -2,12 +2,15 @@ import { useCallback, useEffect, useRef, useState } from 'react'
 import { Link } from 'react-router-dom'
 import toast from 'react-hot-toast'
 import {
+  getBackfill,
   getBudgetStatus,
   getByCategory,
   getExchangeRate,
   getMonthlyTrend,
   getSummary,
   getTransactions,
+  openEventStream,
+  startBackfill,
   triggerSync,
 } from '../api'
 import CategoryBarChart from '../components/CategoryBarChart'
@@ -36,6 +39,14 @@ const fmtAmount = (tx) => {
     : `${sign}S/${abs.toFixed(2)}`
 }
 
+// "~2 h 5 min" / "~4 min" / "<1 min"
+const fmtEta = (seconds) => {
+  if (seconds == null) return null
+  const mins = Math.round(seconds / 60)
+  if (mins < 1) return '<1 min'
+  return mins >= 60 ? `~${Math.floor(mins / 60)} h ${mins % 60} min` : `~${mins} min`
+}
+
 const MONTHS = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
 const FULL_MONTHS = ['January','February','March','April','May','June','July','August','September','October','November','December']
 
@@ -266,6 +277,54 @@ function TxRow({ tx }) {
   )
 }
 
+// ─── Live update helpers ──────────────────────────────────────────────────────
+// Apply the per-month deltas pushed on /api/events (see backend services/events.py)
+const round2 = (n) => Math.round(n * 100) / 100
+const monthKey = (month, year) => `${year}-${String(month).padStart(2, '0')}`
+
+const addTotals = (base, delta) => ({
+  income:   round2((base?.income ?? 0) + delta.income),
+  expenses: round2((base?.expenses ?? 0) + delta.expenses),
+  net:      round2((base?.net ?? 0) + delta.net),
+})
+
+const applySummaryDelta = (summary, d) => summary && {
+  ...summary,
+  pen:       addTotals(summary.pen, d.pen),
+  usd:       addTotals(summary.usd, d.usd),
+  total_usd: addTotals(summary.total_usd, d.total_usd),
+  transaction_count: summary.transaction_count + d.count,
+}
+
+const applyCategoryDelta = (rows, byCat) => {
+  const totals = Object.fromEntries(rows.map((r) => [r.category, r.total]))
+  Object.entries(byCat).forEach(([c, v]) => { totals[c] = round2((totals[c] ?? 0) + v) })
+  return Object.entries(totals)
+    .filter(([, total]) => total > 0.005)
+    .map(([category, total]) => ({ category, total }))
+    .sort((a, b) => b.total - a.total)
+}
+
+const withSpent = (b, spent) => ({
+  ...b,
+  spent: round2(spent),
+  percentage: b.limit > 0 ? Math.round((spent / b.limit) * 1000) / 10 : 0,
+})
+
+const applyTrendDeltas = (trend, deltas, year) => {
+  const byMonth = Object.fromEntries(trend.map((t) => [t.month_num, t.expenses]))
+  Object.entries(deltas).forEach(([key, d]) => {
+    const [y, m] = key.split('-').map(Number)
+    if (y !== year) return
+    const spent = Object.values(d.by_category).reduce((a, v) => a + v, 0)
+    byMonth[m] = round2((byMonth[m] ?? 0) + spent)
+  })
+  return Object.entries(byMonth)
+    .map(([m, expenses]) => ({ month: MONTHS[m - 1], month_num: Number(m), expenses }))
+    .filter((t) => t.expenses > 0.005)
+    .sort((a, b) => a.month_num - b.month_num)
+}
+
 // ─── Currency helpers ─────────────────────────────────────────────────────────
 function useCurrencyPref() {
   const [pref, setPref] = useState(() => localStorage.getItem('preferred_currency') || 'USD')
@@ -298,6 +357,7 @@ export default function Dashboard() {
   const [syncing,        setSyncing]        = useState(false)
   const [syncMenuOpen,   setSyncMenuOpen]   = useState(false)
   const [syncResult,     setSyncResult]     = useState(null) // { txns_added, days_back }
+  const [backfill,       setBackfill]       = useState(null) // GET /sync/backfill
   const syncMenuRef = useRef(null)
 
   // Close sync menu on outside click
@@ -375,12 +435,119 @@ export default function Dashboard() {
     fetchRateInfo()
   }, [fetchSummary, fetchCharts, fetchBudgets, fetchRateInfo])
 
+  const fetchRecent = useCallback(async () => {
+    try {
+      setRecentTxns(((await getTransactions({ month, year })) ?? []).slice(0, 5))
+    } catch { /* the next full refresh catches up */ }
+  }, [month, year])
+
+  // Latest view state for the long-lived event stream handlers
+  const viewRef = useRef({})
+  viewRef.current = {
+    month, year, byCategory, rate: summary?.exchange_rate,
+    fetchSummary, fetchCharts, fetchBudgets, fetchRecent,
+  }
+  const streamRef = useRef({ live: false, lost: false, syncEvents: 0 })
+
+  // Live updates: patch only the panels of the months a change touched
+  useEffect(() => {
+    const refetchAll = () => {
+      const v = viewRef.current
+      v.fetchSummary()
+      v.fetchCharts()
+      v.fetchBudgets()
+    }
+    return openEventStream({
+      ready: () => {
+        // Events sent while disconnected are lost — catch up once
+        if (streamRef.current.lost) refetchAll()
+        streamRef.current = { ...streamRef.current, live: true, lost: false }
+      },
+      error: () => {
+        if (streamRef.current.live) streamRef.current = { ...streamRef.current, live: false, lost: true }
+      },
+      resync: refetchAll,
+      transactions: (evt) => {
+        if (evt.source === 'sync') streamRef.current.syncEvents += 1
+        const v = viewRef.current
+        if (evt.exchange_rate !== v.rate) {
+          refetchAll()
+          return
+        }
+        setTrend((t) => applyTrendDeltas(t, evt.deltas, v.year))
+        const d = evt.deltas[monthKey(v.month, v.year)]
+        if (!d) return
+        setSummary((s) => applySummaryDelta(s, d))
+        setByCategory((c) => applyCategoryDelta(c, d.by_category))
+        setBudgetStatus((bs) => bs.map((b) =>
+          d.by_category[b.category] ? withSpent(b, b.spent + d.by_category[b.category]) : b
+        ))
+        v.fetchRecent()
+      },
+      budgets: ({ action, budget }) => {
+        const spentFor = (c) => viewRef.current.byCategory.find((r) => r.category === c)?.total ?? 0
+        setBudgetStatus((bs) => {
+          const rest = bs.filter((b) => b.category !== budget.category)
+          if (action === 'deleted') return rest
+          const prev = bs.find((b) => b.category === budget.category)
+          const next = withSpent(
+            { category: budget.category, limit: budget.limit, currency: 'USD' },
+            prev?.spent ?? spentFor(budget.category),
+          )
+          return prev ? bs.map((b) => (b === prev ? next : b)) : [...rest, next]
+        })
+      },
+    })
+  }, [])
+
+  // Backfill progress: poll while one is unfinished, refresh once it completes
+  const backfillActive = backfill && backfill.status !== 'done'
+  useEffect(() => {
+    let cancelled = false
+    const poll = async () => {
+      try {
+        const next = await getBackfill()
+        if (cancelled) return
+        setBackfill((prev) => {
+          if (prev && prev.status !== 'done' && next?.status === 'done') {
+            toast.success(`Backfill complete · ${next.transactions_added} new transaction${next.transactions_added !== 1 ? 's' : ''}`)
+            if (!streamRef.current.live) {
+              const v = viewRef.current
+              v.fetchSummary()
+              v.fetchCharts()
+              v.fetchBudgets()
+            }
+          }
+          return next
+        })
+      } catch {
+        // Keep the last known progress; the next poll retries
+      }
+    }
+    poll()
+    if (!backfillActive) return () => { cancelled = true }
+    const id = setInterval(poll, 5000)
+    return () => { cancelled = true; clearInterval(id) }
+  }, [backfillActive])
+
+  const handleBackfill = async (daysBack) => {
+    setSyncMenuOpen(false)
+    setSyncResult(null)
+    try {
+      setBackfill(await startBackfill(daysBack))
+      toast.success('Backfill started — you can keep using the app')
+    } catch {
+      toast.error('Could not start backfill')
+    }
+  }
+
   const handleSync = async (daysBack = 7) => {
     setSyncMenuOpen(false)
     setSyncing(true)
     setSyncResult(null)
     const label = daysBack === 7 ? '7 days' : daysBack === 30 ? '30 days' : daysBack === 90 ? '3 months' : '6 months'
     const tid = toast.loading(`Syncing last ${label}…`)
+    const syncEventsBefore = streamRef.current.syncEvents
     try {
       const res = await triggerSync(daysBack)
       const added = res.transactions_added ?? 0
@@ -389,9 +556,14 @@ export default function Dashboard() {
         : res.message ?? 'Sync complete · no new transactions'
       toast.success(msg, { id: tid })
       setSyncResult({ txns_added: added, days_back: daysBack })
-      fetchSummary()
-      fetchCharts()
-      fetchBudgets()
+      // Skip the refetch only if this stream actually received the sync's
+      // deltas — events are per process, and the sync may have run elsewhere
+      const applied = streamRef.current.live && streamRef.current.syncEvents > syncEventsBefore
+      if (!applied) {
+        fetchSummary()
+        fetchCharts()
+        fetchBudgets()
+      }
     } catch {
       toast.error('Sync failed', { id: tid })
     } finally {
@@ -528,7 +700,7 @@ export default function Dashboard() {
                 ].map(({ label, days, fast }) => (
                   <button
                     key={days}
-                    onClick={() => handleSync(days)}
+                    onClick={() => (days >= 90 ? handleBackfill(days) : handleSync(days))}
                     className="w-full text-left px-3 py-2 text-xs text-slate-300 hover:bg-slate-800 hover:text-slate-100 transition-colors flex items-center justify-between group"
                   >
                     <span>{label}</span>
@@ -540,6 +712,7 @@ export default function Dashboard() {
                 <div className="border-t border-slate-800 mt-1 px-3 py-2">
                   <p className="text-[10px] text-slate-600">
                     Already-processed emails are skipped — no duplicate charges.
+                    3+ months run in the background and resume if interrupted.
                   </p>
                 </div>
               </div>
@@ -561,6 +734,26 @@ export default function Dashboard() {
         </div>
       )}
 
+      {/* ── Backfill Progress ───────────────────────────────────────── */}
+      {backfillActive && (
+        <div className="px-4 py-3 rounded-xl border border-brand-500/20 bg-brand-500/5 space-y-2 animate-slide-up">
+          <div className="flex items-center justify-between gap-3 text-xs">
+            <p className="text-brand-400">
+              {backfill.status === 'paused' && backfill.last_error
+                ? `Backfill paused (${backfill.last_error === 'no_credentials' ? 'reconnect Gmail' : backfill.last_error === 'rate_limited' ? 'rate limited' : 'error'}) — resumes automatically`
+                : `Backfilling last ${backfill.days_back} days · ${backfill.transactions_added} transaction${backfill.transactions_added !== 1 ? 's' : ''} found`}
+            </p>
+            <p className="text-slate-500 tabular-nums">
+              {backfill.percent}%
+              {backfill.eta_seconds != null ? ` · ${fmtEta(backfill.eta_seconds)} left` : ' · estimating…'}
+            </p>
+          </div>
+          <div className="h-1.5 rounded-full bg-slate-800 overflow-hidden">
+            <div className="h-full bg-brand-500 transition-all" style={{ width: `${backfill.percent}%` }} />
+          </div>
+        </div>
+      )}
+
       {/* ── Summary Cards ───────────────────────────────────────────── */}
       <div className="grid grid-cols-2 lg:grid-cols-4 gap-3">
         <SummaryCard